@@ -0,0 +1,421 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import pdist, squareform
+
+from synthetic_corpus import (CLASSIFIED_DATA_FOLDER_NAME, DEFAULT_TOPIC_FLAG_DENSITY, RAW_DATA_FOLDER_NAME,
+                              ensure_synthetic_corpus)
+
+REPO_ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for subfolder in ('', 'pagerank_reviews', 'recommendation', 'topic_classification', 'topic_indicativeness_scores'):
+    sys.path.append(os.path.join(REPO_ROOT_PATH, subfolder))
+from classify_reviews_topics import CLASSIFIER_NUM_FEATURES, classify_reviews  # noqa: E402
+from corpus_store import TOPICS_COLUMNS, load_reviews_corpus  # noqa: E402
+from evaluate_pagerank_results import TOPICS, calculate_differences, calculate_differences_vectorized  # noqa: E402
+from extract_topics_tfidf import dimensionality_reduction, preprocess_reviews  # noqa: E402
+from indicativeness_results import calculate_indicativeness_matrix  # noqa: E402
+from pagerank_reviews_graph import (build_reviews_graph, calculate_pagerank_scores,  # noqa: E402
+                                    extract_topic_sentiment_vectors_for_single_hotel)
+from ranking_service import generate_random_user_rankings, generate_synthetic_sentiment_data  # noqa: E402
+from rerank_hotels_based_on_indicativeness import calculate_weighted_scores  # noqa: E402
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_RESULTS_FOLDER = os.path.join(BENCHMARKS_FOLDER, 'results')
+BENCHMARK_BASELINE_PATH = os.path.join(BENCHMARKS_FOLDER, 'baseline.json')
+DEFAULT_SCALES = ((10, 200), (20, 1000), (20, 5000))
+DEFAULT_REPEATS = 3
+MAX_DENSE_GRAPH_REVIEWS = 1000
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.01
+MIN_REGRESSION_RSS_MB = 16.0
+
+
+class SkipBenchmark(Exception):
+    """
+    Raised by the preparation of a benchmark case that does not apply at the scale of the corpus.
+    """
+
+
+def read_hotels_reviews(data_folder: str) -> list[pd.DataFrame]:
+    """
+    Reads the data files of a corpus folder, one dataframe per hotel.
+    :param data_folder: path to folder of hotel data files.
+    :return: reviews of each hotel, in file name order.
+    """
+
+    return [pd.read_csv(os.path.join(data_folder, file_name)) for file_name in sorted(os.listdir(data_folder))]
+
+
+# Each benchmark case prepares its inputs from a corpus folder (untimed), and returns the function to time.
+def prepare_load_reviews_corpus(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks building the corpus store of the topic-classified data files from scratch (a cold cache every run).
+    """
+
+    def run() -> object:
+        with tempfile.TemporaryDirectory() as cache_folder:
+            return load_reviews_corpus(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME),
+                                       cache_folder=cache_folder)
+
+    return run
+
+
+def prepare_classify_reviews(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks tagging all the raw reviews with a (random) linear topic classifier.
+    """
+
+    reviews_df = pd.concat(read_hotels_reviews(os.path.join(corpus_folder, RAW_DATA_FOLDER_NAME)), ignore_index=True)
+    rng = np.random.default_rng(0)
+    classifier = {'coefficients': rng.normal(0, 0.1, size=(len(TOPICS_COLUMNS), CLASSIFIER_NUM_FEATURES)),
+                  'intercepts': np.full(len(TOPICS_COLUMNS), -0.5)}
+    return lambda: classify_reviews(reviews_df, classifier)
+
+
+def prepare_calculate_indicativeness_matrix(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the hotel x topic indicativeness matrix of the whole corpus.
+    """
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        corpus_df = load_reviews_corpus(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME),
+                                        cache_folder=cache_folder)
+    return lambda: calculate_indicativeness_matrix(corpus_df, TOPICS)
+
+
+def get_dense_similarity_matrix(corpus_folder: str, max_dense_graph_reviews: int) -> np.ndarray:
+    """
+    Calculates the review similarity matrix of the first hotel of the corpus, as the networkx mode of
+    `calculate_pagerank_scores` does.
+    """
+
+    hotel_reviews_df = pd.read_csv(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME,
+                                                sorted(os.listdir(os.path.join(corpus_folder,
+                                                                               CLASSIFIED_DATA_FOLDER_NAME)))[0]))
+    if len(hotel_reviews_df) > max_dense_graph_reviews:
+        raise SkipBenchmark(f"{len(hotel_reviews_df)} reviews per hotel exceed the dense graph limit of "
+                            f"{max_dense_graph_reviews}")
+    normalized_topic_matrix = extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df)
+    return 1 - squareform(pdist(normalized_topic_matrix, 'cosine'))
+
+
+def prepare_build_reviews_graph(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks building the networkx reviews graph of a single hotel.
+    """
+
+    similarity_matrix = get_dense_similarity_matrix(corpus_folder, max_dense_graph_reviews)
+    return lambda: build_reviews_graph(similarity_matrix)
+
+
+def prepare_nx_pagerank(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the networkx PageRank of the reviews graph of a single hotel.
+    """
+
+    G = build_reviews_graph(get_dense_similarity_matrix(corpus_folder, max_dense_graph_reviews))
+    return lambda: nx.pagerank(G, weight='weight')
+
+
+def prepare_calculate_pagerank_scores(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the PageRank scores of the reviews of every hotel, in the configured graph construction mode.
+    """
+
+    hotels_reviews_dfs = read_hotels_reviews(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME))
+    return lambda: [calculate_pagerank_scores(hotel_reviews_df) for hotel_reviews_df in hotels_reviews_dfs]
+
+
+def prepare_preprocess_reviews(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks tokenizing, cleaning and lemmatizing the sentences of all the raw reviews.
+    """
+
+    return lambda: preprocess_reviews(os.path.join(corpus_folder, RAW_DATA_FOLDER_NAME))
+
+
+def prepare_dimensionality_reduction(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the TF-IDF + SVD of the review sentences. The sentences are split and lower-cased directly, so that the
+    benchmark does not depend on `preprocess_reviews`.
+    """
+
+    sentences = []
+    for hotel_reviews_df in read_hotels_reviews(os.path.join(corpus_folder, RAW_DATA_FOLDER_NAME)):
+        for reviews in (hotel_reviews_df['Positive Reviews'], hotel_reviews_df['Negative Reviews']):
+            sentences.extend(sentence.strip().lower() for review in reviews.dropna()
+                             for sentence in review.split('.') if sentence.strip())
+    return lambda: dimensionality_reduction(sentences)
+
+
+def prepare_calculate_differences(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the differences between the indicativeness of all the reviews and of the top / random 10 reviews.
+    """
+
+    hotels_reviews_dfs = read_hotels_reviews(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME))
+    return lambda: calculate_differences(hotels_reviews_dfs)
+
+
+def prepare_calculate_differences_vectorized(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the vectorized differences, on the same work as `calculate_differences` (the top / random 10 reviews,
+    with 100 random subsets per hotel).
+    """
+
+    hotels_reviews_dfs = read_hotels_reviews(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME))
+    return lambda: calculate_differences_vectorized(hotels_reviews_dfs)
+
+
+def prepare_calculate_weighted_scores(corpus_folder: str, max_dense_graph_reviews: int) -> Callable[[], object]:
+    """
+    Benchmarks the weighted scores of a catalog of hotels x reviews per hotel synthetic hotels (the scale at which
+    the reranker would score reviews-level data), for a batch of 100 user rankings.
+    """
+
+    num_reviews = sum(map(len, read_hotels_reviews(os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME))))
+    sentiment_data = generate_synthetic_sentiment_data(num_reviews)
+    user_rankings = generate_random_user_rankings(100)
+    return lambda: [calculate_weighted_scores(sentiment_data, user_ranking) for user_ranking in user_rankings]
+
+
+BENCHMARK_CASES = {
+    'load_reviews_corpus': prepare_load_reviews_corpus,
+    'classify_reviews': prepare_classify_reviews,
+    'calculate_indicativeness_matrix': prepare_calculate_indicativeness_matrix,
+    'build_reviews_graph': prepare_build_reviews_graph,
+    'nx.pagerank': prepare_nx_pagerank,
+    'calculate_pagerank_scores': prepare_calculate_pagerank_scores,
+    'preprocess_reviews': prepare_preprocess_reviews,
+    'dimensionality_reduction': prepare_dimensionality_reduction,
+    'calculate_differences': prepare_calculate_differences,
+    'calculate_differences_vectorized': prepare_calculate_differences_vectorized,
+    'calculate_weighted_scores': prepare_calculate_weighted_scores
+}
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Gets the peak resident set size of the current process.
+    :return: the peak RSS, in MB.
+    """
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes on Linux.
+    return peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10
+
+
+def describe_error(error: Exception) -> str:
+    """
+    Describes an error on a single line (e.g. the missing resource of NLTK lookup errors, whose messages are framed by
+    lines of stars).
+    :param error: the error a benchmark case failed with.
+    :return: the type of the error and the first line of its message.
+    """
+
+    message_lines = [line.strip() for line in str(error).splitlines() if line.strip().strip('*')]
+    return f"{type(error).__name__}: {message_lines[0] if message_lines else ''}"
+
+
+def run_benchmark_case(case_name: str, corpus_folder: str, repeats: int, max_dense_graph_reviews: int) -> dict:
+    """
+    Runs a benchmark case: prepares its inputs (untimed), then times it repeats times. Meant to run in a fresh
+    process, so that the peak RSS is that of this case alone.
+    :param case_name: name of the benchmark case (a key of BENCHMARK_CASES).
+    :param corpus_folder: path of the synthetic corpus folder.
+    :param repeats: number of timed runs.
+    :param max_dense_graph_reviews: number of reviews per hotel above which the networkx graph cases are skipped.
+    :return: the wall time of each run (in seconds), the peak RSS before and after the runs (in MB); or the reason
+     the case was skipped, or the error it failed with.
+    """
+
+    try:
+        run = BENCHMARK_CASES[case_name](corpus_folder, max_dense_graph_reviews)
+    except SkipBenchmark as e:
+        return {'skipped': str(e)}
+    except Exception as e:
+        return {'error': describe_error(e)}
+
+    prepared_rss_mb = get_peak_rss_mb()
+    run_seconds = []
+    try:
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            run()
+            run_seconds.append(time.perf_counter() - start_time)
+    except Exception as e:
+        return {'error': describe_error(e)}
+
+    return {'run_seconds': run_seconds, 'prepared_rss_mb': prepared_rss_mb, 'peak_rss_mb': get_peak_rss_mb()}
+
+
+def run_benchmarks(
+        scales: list[tuple[int, int]],
+        case_names: list[str],
+        topic_flag_density: float = DEFAULT_TOPIC_FLAG_DENSITY,
+        repeats: int = DEFAULT_REPEATS,
+        max_dense_graph_reviews: int = MAX_DENSE_GRAPH_REVIEWS,
+        seed: int = 0
+) -> dict:
+    """
+    Runs the benchmark cases on synthetic corpora of the given scales, each case in its own process.
+    :param scales: (number of hotels, number of reviews per hotel) of each corpus.
+    :param case_names: names of the benchmark cases to run.
+    :param topic_flag_density: probability of each (topic, sentiment) flag of a review to be set.
+    :param repeats: number of timed runs of each case.
+    :param max_dense_graph_reviews: number of reviews per hotel above which the networkx graph cases are skipped.
+    :param seed: seed of the corpora generator.
+    :return: the benchmark results: the environment, and a record per (case, scale) with its best and median wall
+     times and its peak RSS.
+    """
+
+    records = []
+    for num_hotels, reviews_per_hotel in scales:
+        corpus_folder = ensure_synthetic_corpus(num_hotels, reviews_per_hotel, topic_flag_density, seed)
+        for case_name in case_names:
+            # The spawn context starts each case from a fresh interpreter, whose peak RSS is not inherited.
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                case_result = executor.submit(run_benchmark_case, case_name, corpus_folder, repeats,
+                                              max_dense_graph_reviews).result()
+
+            record = {'case': case_name, 'hotels': num_hotels, 'reviews_per_hotel': reviews_per_hotel,
+                      'topic_flag_density': topic_flag_density}
+            if 'run_seconds' in case_result:
+                record.update({
+                    'best_seconds': min(case_result['run_seconds']),
+                    'median_seconds': float(np.median(case_result['run_seconds'])),
+                    'peak_rss_mb': case_result['peak_rss_mb'],
+                    'run_rss_increase_mb': case_result['peak_rss_mb'] - case_result['prepared_rss_mb']
+                })
+            else:
+                record.update(case_result)
+            records.append(record)
+            print_benchmark_record(record)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                        'networkx': nx.__version__},
+        'repeats': repeats,
+        'records': records
+    }
+
+
+def get_record_key(record: dict) -> tuple:
+    """
+    Gets the key matching a benchmark record with the record of the same case and corpus in another run.
+    :param record: benchmark record.
+    :return: (case, number of hotels, number of reviews per hotel, topic flag density).
+    """
+
+    return record['case'], record['hotels'], record['reviews_per_hotel'], record['topic_flag_density']
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> list[str]:
+    """
+    Compares benchmark results with a baseline run. A case regresses if its best wall time or its peak RSS grew by
+    more than the tolerance, and by more than MIN_REGRESSION_SECONDS / MIN_REGRESSION_RSS_MB (differences below which
+    are noise). Cases that failed or were skipped in either run are not compared.
+    :param results: benchmark results (see `run_benchmarks`).
+    :param baseline: benchmark results of the baseline run.
+    :param tolerance: allowed relative growth.
+    :return: a description of each regression.
+    """
+
+    baseline_records = {get_record_key(record): record for record in baseline['records']}
+    regressions = []
+    for record in results['records']:
+        baseline_record = baseline_records.get(get_record_key(record), {})
+        if 'best_seconds' not in record or 'best_seconds' not in baseline_record:
+            continue
+        for measure, min_difference in (('best_seconds', MIN_REGRESSION_SECONDS),
+                                        ('peak_rss_mb', MIN_REGRESSION_RSS_MB)):
+            value, baseline_value = record[measure], baseline_record[measure]
+            if value > baseline_value * (1 + tolerance) and value - baseline_value > min_difference:
+                regressions.append(f"{record['case']} ({record['hotels']} hotels x {record['reviews_per_hotel']} "
+                                   f"reviews): {measure} {baseline_value:.3f} -> {value:.3f}")
+    return regressions
+
+
+def print_benchmark_record(record: dict) -> None:
+    """
+    Prints a benchmark record as a single line.
+    :param record: benchmark record.
+    """
+
+    scale = f"{record['hotels']} x {record['reviews_per_hotel']}"
+    if 'best_seconds' in record:
+        outcome = f"{record['best_seconds']:>10.3f} s{record['peak_rss_mb']:>10.0f} MB"
+    else:
+        outcome = f"  skipped: {record['skipped']}" if 'skipped' in record else f"  error: {record['error']}"
+    print(f"{record['case']:<34}{scale:>14}{outcome}")
+
+
+def parse_scale(scale: str) -> tuple[int, int]:
+    """
+    Parses a corpus scale given on the command line.
+    :param scale: number of hotels and number of reviews per hotel, e.g. '20x1000'.
+    :return: (number of hotels, number of reviews per hotel).
+    """
+
+    num_hotels, reviews_per_hotel = scale.lower().split('x')
+    return int(num_hotels), int(reviews_per_hotel)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the pipeline stages on synthetic corpora of growing scale, '
+                                                 'and compares the wall times and peak RSS with a baseline.')
+    parser.add_argument('--scales', nargs='+', type=parse_scale,
+                        default=list(DEFAULT_SCALES),
+                        help='corpus scales, as <hotels>x<reviews per hotel>')
+    parser.add_argument('--cases', nargs='+', choices=list(BENCHMARK_CASES), default=list(BENCHMARK_CASES),
+                        help='benchmark cases to run')
+    parser.add_argument('--topic-flag-density', type=float, default=DEFAULT_TOPIC_FLAG_DENSITY,
+                        help='probability of each (topic, sentiment) flag of a review to be set')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='number of timed runs of each case')
+    parser.add_argument('--max-dense-graph-reviews', type=int, default=MAX_DENSE_GRAPH_REVIEWS,
+                        help='number of reviews per hotel above which the networkx graph cases are skipped')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the corpora generator')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_PATH, help='path of the baseline results')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the baseline instead of comparing with it')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='relative growth of a wall time or peak RSS reported as a regression')
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmarks(args.scales, args.cases, args.topic_flag_density, args.repeats,
+                                       args.max_dense_graph_reviews, args.seed)
+
+    os.makedirs(BENCHMARK_RESULTS_FOLDER, exist_ok=True)
+    results_path = os.path.join(BENCHMARK_RESULTS_FOLDER, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(results_path, 'w', encoding='utf-8') as results_file:
+        json.dump(benchmark_results, results_file, indent=2)
+    print(f"Saved the results to {results_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(benchmark_results, baseline_file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            regressions = compare_to_baseline(benchmark_results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+    else:
+        print(f"No baseline at {args.baseline} (store one with --save-baseline).")
@@ -0,0 +1,192 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import TOPICS_COLUMNS  # noqa: E402
+
+SYNTHETIC_CORPORA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+RAW_DATA_FOLDER_NAME = 'data'
+CLASSIFIED_DATA_FOLDER_NAME = 'data_topic_classified'
+RAW_REVIEWS_COLUMNS = ['Review Title', 'Negative Reviews', 'Positive Reviews', 'Rating', 'Stay Date', 'Review Date',
+                       'Room Type', 'Number of Nights', 'Traveler Type', 'Overall Average Rating']
+DEFAULT_TOPIC_FLAG_DENSITY = 0.14
+TOPIC_WORDS = {
+    'Room amenities': ['room', 'bed', 'bathroom', 'shower', 'pillow', 'balcony', 'view', 'towels', 'wardrobe'],
+    'Hotel amenities': ['pool', 'gym', 'lobby', 'elevator', 'parking', 'spa', 'wifi', 'terrace', 'facilities'],
+    'Staff': ['staff', 'reception', 'receptionist', 'manager', 'service', 'concierge', 'housekeeping', 'team'],
+    'Food and beverages': ['breakfast', 'coffee', 'restaurant', 'bar', 'dinner', 'buffet', 'food', 'drinks'],
+    'Location': ['location', 'station', 'metro', 'center', 'airport', 'beach', 'neighborhood', 'walk', 'shops']
+}
+SENTIMENT_WORDS = {
+    'positive': ['great', 'clean', 'friendly', 'excellent', 'comfortable', 'lovely', 'helpful', 'perfect', 'quiet'],
+    'negative': ['dirty', 'noisy', 'rude', 'small', 'old', 'slow', 'broken', 'expensive', 'cold']
+}
+FILLER_WORDS = ['the', 'was', 'very', 'really', 'and', 'we', 'our', 'stay', 'hotel', 'would', 'again', 'night']
+REVIEW_TITLES = [(9.0, 'Exceptional'), (8.0, 'Wonderful'), (7.0, 'Very Good'), (6.0, 'Good'), (5.0, 'Pleasant'),
+                 (4.0, 'Fair'), (3.0, 'Disappointing'), (0.0, 'Bad')]
+ROOM_TYPES = ['King Room', 'Queen Room', 'Superior City View Room', 'Standard Double Room', 'Twin Room',
+              'Deluxe Double Room', 'Family Room', 'Bed in 6-Bed Dormitory Room']
+TRAVELER_TYPES = ['Couple', 'Solo traveler', 'Family', 'Group']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+MISSING_TEXT_PROBABILITY = 0.5
+
+
+def get_synthetic_corpus_folder(num_hotels: int, reviews_per_hotel: int, topic_flag_density: float, seed: int) -> str:
+    """
+    Gets the folder of a synthetic corpus, named after its generation parameters.
+    :param num_hotels: number of hotels.
+    :param reviews_per_hotel: number of reviews of each hotel.
+    :param topic_flag_density: probability of each (topic, sentiment) flag of a review to be set.
+    :param seed: seed of the random generator.
+    :return: path of the corpus folder.
+    """
+
+    return os.path.join(SYNTHETIC_CORPORA_FOLDER,
+                        f"hotels_{num_hotels}_reviews_{reviews_per_hotel}_density_{topic_flag_density:g}_seed_{seed}")
+
+
+def generate_review_text(rng: np.random.Generator, topics: list[str], sentiment: str) -> str | float:
+    """
+    Generates the positive or negative text of a review, with one sentence per topic the review discusses with this
+    sentiment, so that the text agrees with the topic flags of the review.
+    :param rng: random generator.
+    :param topics: topics the review discusses with this sentiment.
+    :param sentiment: 'positive' or 'negative'.
+    :return: the review text; or NaN (as an empty text is read back) for a review without topics of this sentiment,
+     with probability MISSING_TEXT_PROBABILITY.
+    """
+
+    if not topics and rng.random() < MISSING_TEXT_PROBABILITY:
+        return np.nan
+
+    sentences = []
+    for topic in topics or [None]:
+        words = rng.choice(FILLER_WORDS, size=rng.integers(2, 8)).tolist()
+        words.append(rng.choice(SENTIMENT_WORDS[sentiment]))
+        if topic is not None:
+            words.append(rng.choice(TOPIC_WORDS[topic]))
+        rng.shuffle(words)
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def generate_hotel_reviews(
+        rng: np.random.Generator,
+        num_reviews: int,
+        topic_flag_density: float = DEFAULT_TOPIC_FLAG_DENSITY
+) -> pd.DataFrame:
+    """
+    Generates the topic-classified reviews of a single hotel, in the format of the topic-classified data files.
+    :param rng: random generator.
+    :param num_reviews: number of reviews.
+    :param topic_flag_density: probability of each (topic, sentiment) flag of a review to be set.
+    :return: the reviews, with the raw columns followed by the 0/1 (topic, sentiment) columns.
+    """
+
+    topic_flags = (rng.random((num_reviews, len(TOPICS_COLUMNS))) < topic_flag_density).astype(np.int64)
+    flagged_topics = {sentiment: [[column.split(' - ')[0] for column, flag in zip(TOPICS_COLUMNS, review_flags)
+                                   if flag and column.endswith(sentiment)] for review_flags in topic_flags]
+                      for sentiment in SENTIMENT_WORDS}
+
+    # The rating leans towards the balance of positive and negative topics of the review.
+    topic_balance = topic_flags[:, 0::2].sum(axis=1) - topic_flags[:, 1::2].sum(axis=1)
+    ratings = np.clip(np.round(rng.normal(8.0 + topic_balance, 1.5), 0), 1, 10)
+    review_days = rng.integers(0, 3 * 365, size=num_reviews)
+    review_dates = pd.Timestamp('2021-01-01') + pd.to_timedelta(review_days, unit='D')
+    stay_dates = review_dates - pd.to_timedelta(rng.integers(1, 60, size=num_reviews), unit='D')
+
+    reviews_df = pd.DataFrame({
+        'Review Title': [next(title for threshold, title in REVIEW_TITLES if rating >= threshold)
+                         for rating in ratings],
+        'Negative Reviews': [generate_review_text(rng, topics, 'negative') for topics in flagged_topics['negative']],
+        'Positive Reviews': [generate_review_text(rng, topics, 'positive') for topics in flagged_topics['positive']],
+        'Rating': ratings,
+        'Stay Date': [f"{MONTHS[date.month - 1]} {date.year}" for date in stay_dates],
+        'Review Date': [f"{MONTHS[date.month - 1]} {date.day}, {date.year}" for date in review_dates],
+        'Room Type': rng.choice(ROOM_TYPES, size=num_reviews),
+        'Number of Nights': rng.geometric(0.45, size=num_reviews),
+        'Traveler Type': rng.choice(TRAVELER_TYPES, size=num_reviews),
+        'Overall Average Rating': round(float(ratings.mean()), 1)
+    })
+    return pd.concat([reviews_df, pd.DataFrame(topic_flags, columns=TOPICS_COLUMNS)], axis=1)
+
+
+def generate_synthetic_corpus(
+        output_folder: str,
+        num_hotels: int,
+        reviews_per_hotel: int,
+        topic_flag_density: float = DEFAULT_TOPIC_FLAG_DENSITY,
+        seed: int = 0
+) -> tuple[str, str]:
+    """
+    Writes a synthetic corpus in the layout of the repository: a raw data file per hotel in a 'data' folder, and its
+    topic-classified data file in a 'data_topic_classified' folder.
+    :param output_folder: path to the folder to write the corpus to.
+    :param num_hotels: number of hotels.
+    :param reviews_per_hotel: number of reviews of each hotel.
+    :param topic_flag_density: probability of each (topic, sentiment) flag of a review to be set.
+    :param seed: seed of the random generator.
+    :return: paths of the raw and topic-classified data folders.
+    """
+
+    rng = np.random.default_rng(seed)
+    raw_data_folder = os.path.join(output_folder, RAW_DATA_FOLDER_NAME)
+    classified_data_folder = os.path.join(output_folder, CLASSIFIED_DATA_FOLDER_NAME)
+    os.makedirs(raw_data_folder, exist_ok=True)
+    os.makedirs(classified_data_folder, exist_ok=True)
+
+    for hotel_index in range(num_hotels):
+        hotel_name = f"Synthetic_Hotel_{hotel_index:04d}"
+        hotel_reviews_df = generate_hotel_reviews(rng, reviews_per_hotel, topic_flag_density)
+        hotel_reviews_df[RAW_REVIEWS_COLUMNS].to_csv(os.path.join(raw_data_folder, f"reviews_{hotel_name}.csv"),
+                                                     index=False)
+        hotel_reviews_df.to_csv(os.path.join(classified_data_folder, f"processed_reviews_{hotel_name}.csv"),
+                                index=False)
+
+    return raw_data_folder, classified_data_folder
+
+
+def ensure_synthetic_corpus(
+        num_hotels: int,
+        reviews_per_hotel: int,
+        topic_flag_density: float = DEFAULT_TOPIC_FLAG_DENSITY,
+        seed: int = 0
+) -> str:
+    """
+    Gets a synthetic corpus, generating it on the first call (the corpus is deterministic given its parameters).
+    :param num_hotels: number of hotels.
+    :param reviews_per_hotel: number of reviews of each hotel.
+    :param topic_flag_density: probability of each (topic, sentiment) flag of a review to be set.
+    :param seed: seed of the random generator.
+    :return: path of the corpus folder.
+    """
+
+    corpus_folder = get_synthetic_corpus_folder(num_hotels, reviews_per_hotel, topic_flag_density, seed)
+    classified_data_folder = os.path.join(corpus_folder, CLASSIFIED_DATA_FOLDER_NAME)
+    if not os.path.isdir(classified_data_folder) or len(os.listdir(classified_data_folder)) != num_hotels:
+        generate_synthetic_corpus(corpus_folder, num_hotels, reviews_per_hotel, topic_flag_density, seed)
+    return corpus_folder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates a synthetic corpus of hotel reviews, in the format of the '
+                                                 'raw and topic-classified data files.')
+    parser.add_argument('--hotels', type=int, default=65, help='number of hotels')
+    parser.add_argument('--reviews-per-hotel', type=int, default=2500, help='number of reviews of each hotel')
+    parser.add_argument('--topic-flag-density', type=float, default=DEFAULT_TOPIC_FLAG_DENSITY,
+                        help='probability of each (topic, sentiment) flag of a review to be set')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    parser.add_argument('--output-folder', help='folder to write the corpus to (a folder named after the parameters '
+                                                'under benchmarks/corpora by default)')
+    args = parser.parse_args()
+
+    output_folder = args.output_folder or get_synthetic_corpus_folder(args.hotels, args.reviews_per_hotel,
+                                                                      args.topic_flag_density, args.seed)
+    for data_folder in generate_synthetic_corpus(output_folder, args.hotels, args.reviews_per_hotel,
+                                                 args.topic_flag_density, args.seed):
+        print(f"Wrote {args.hotels} data files to {data_folder}")
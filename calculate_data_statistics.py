@@ -1,7 +1,30 @@
-import matplotlib.pyplot as plt
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import os
+
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+from corpus_store import (HOTEL_NAME_COLUMN, SOURCE_FILE_COLUMN, hotel_name_from_file_name, iter_hotel_reviews,
+                          list_data_files, load_corpus_manifest, load_reviews_corpus)
+from plotting import enable_render_only, print_render_statuses, render_plots, show_or_close_figure
+from review_schema import (COLUMN_NAME_ALIASES, OVERALL_RATING_COLUMN, RATING_COLUMN, REVIEW_DATE_COLUMN,
+                           SCHEMA_COLUMNS, apply_review_schema, calculate_memory_footprint_report,
+                           normalize_review_spellings)
+
+STATISTICS_COLUMNS = ['Negative Reviews', 'Positive Reviews', 'Rating', 'Review Date', 'Traveler Type',
+                      'Overall Average Rating', *COLUMN_NAME_ALIASES]
+STATISTICS_TEXT_COLUMNS_DTYPES = {'Negative Reviews': str, 'Positive Reviews': str, 'Review Date': str,
+                                  'Traveler Type': str, 'Traveller Type': str}
+STREAMING_SCHEMA_COLUMNS = [REVIEW_DATE_COLUMN, RATING_COLUMN, OVERALL_RATING_COLUMN]
+RATING_SKETCH_BIN_EDGES = np.linspace(-0.05, 10.05, 102)
+REVIEW_LENGTH_BIN_EDGES = np.concatenate([[0], np.unique(np.round(2 ** np.arange(0, 16.25, 0.25)))])
+RATING_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+OVERALL_RATING_HISTOGRAM_PATH = os.path.join('plots', 'overall_ratings_histogram.png')
+PER_HOTEL_STATISTICS_PATH = os.path.join('plots', 'per_hotel_statistics.csv')
+
 
 def calculate_statistics(folder_path: str) -> dict[str, float]:
     """
@@ -19,29 +42,28 @@ def calculate_statistics(folder_path: str) -> dict[str, float]:
     min_rating = float('inf')
     total_file_size = 0
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(folder_path, filename)
-            df = pd.read_csv(file_path)
+    file_sizes = {file_name: file_size for file_name, (_, file_size) in list_data_files(folder_path).items()}
+    columns = [SOURCE_FILE_COLUMN, 'Negative Reviews', 'Positive Reviews', 'Overall Average Rating']
 
-            total_houses += 1
+    for _, df in iter_hotel_reviews(folder_path, columns=columns):
+        total_houses += 1
 
-            # Filter out rows where both 'Negative Reviews' and 'Positive Reviews' are empty
-            non_empty_reviews_df = df.dropna(subset=['Negative Reviews', 'Positive Reviews'], how='all')
-            num_reviews = len(non_empty_reviews_df)
+        # Filter out rows where both 'Negative Reviews' and 'Positive Reviews' are empty
+        non_empty_reviews_df = df.dropna(subset=['Negative Reviews', 'Positive Reviews'], how='all')
+        num_reviews = len(non_empty_reviews_df)
 
-            total_reviews += num_reviews
-            max_reviews = max(max_reviews, num_reviews)
-            min_reviews = min(min_reviews, num_reviews)
+        total_reviews += num_reviews
+        max_reviews = max(max_reviews, num_reviews)
+        min_reviews = min(min_reviews, num_reviews)
 
-            avg_rating = df['Overall Average Rating'].mean()
-            total_ratings += avg_rating
-            max_rating = max(max_rating, avg_rating)
-            min_rating = min(min_rating, avg_rating)
+        avg_rating = df['Overall Average Rating'].mean()
+        total_ratings += avg_rating
+        max_rating = max(max_rating, avg_rating)
+        min_rating = min(min_rating, avg_rating)
 
-            # Calculate file size in KB
-            file_size_kb = os.path.getsize(file_path) / 1024.0
-            total_file_size += file_size_kb
+        # Calculate file size in KB
+        file_size_kb = file_sizes[df[SOURCE_FILE_COLUMN].iloc[0]] / 1024.0
+        total_file_size += file_size_kb
 
     avg_reviews_per_house = total_reviews / total_houses if total_houses > 0 else 0
     avg_overall_rating = total_ratings / total_houses if total_houses > 0 else 0
@@ -59,6 +81,264 @@ def calculate_statistics(folder_path: str) -> dict[str, float]:
     }
 
 
+def calculate_hotel_statistics_streaming(file_path: str, chunk_size: int = 10000) -> dict:
+    """
+    Calculates the statistics of a single hotel data file by reading only the needed columns in chunks, and keeping
+    running aggregates whose size does not depend on the number of reviews: counts and sums, a fixed-width histogram of
+    the ratings (a mergeable sketch for approximate quantiles), a log-scale histogram of the review lengths, the review
+    date range and the number of reviews per traveler type.
+    :param file_path: path to hotel data file.
+    :param chunk_size: number of rows read at a time.
+    :return: dictionary with the running aggregates of the hotel (see `merge_statistics` and `summarize_statistics`).
+    """
+
+    hotel_statistics = {
+        'num_houses': 1,
+        'num_rows': 0,
+        'num_reviews': 0,
+        'min_reviews': float('inf'),
+        'max_reviews': 0,
+        'rating_histogram': np.zeros(len(RATING_SKETCH_BIN_EDGES) - 1, dtype=np.int64),
+        'rating_sum': 0.0,
+        'num_ratings': 0,
+        'review_length_histogram': np.zeros(len(REVIEW_LENGTH_BIN_EDGES) - 1, dtype=np.int64),
+        'review_length_sum': 0,
+        'max_review_length': 0,
+        'first_review_date': pd.NaT,
+        'last_review_date': pd.NaT,
+        'traveler_type_counts': Counter(),
+        'parse_errors': Counter(),
+        'overall_rating_sum': 0.0,
+        'num_overall_ratings': 0,
+        'house_overall_ratings': [],
+        'file_size_kb': os.path.getsize(file_path) / 1024.0
+    }
+
+    chunks = pd.read_csv(file_path, usecols=lambda column: column in STATISTICS_COLUMNS,
+                         dtype=STATISTICS_TEXT_COLUMNS_DTYPES, chunksize=chunk_size)
+    for chunk_df in chunks:
+        chunk_df, parse_errors = apply_review_schema(normalize_review_spellings(chunk_df), STREAMING_SCHEMA_COLUMNS)
+        hotel_statistics['parse_errors'].update(parse_errors)
+        hotel_statistics['num_rows'] += len(chunk_df)
+
+        # Count only rows where at least one of 'Negative Reviews' and 'Positive Reviews' is not empty.
+        non_empty_reviews = chunk_df[['Negative Reviews', 'Positive Reviews']].notna().any(axis=1)
+        hotel_statistics['num_reviews'] += int(non_empty_reviews.sum())
+
+        ratings = chunk_df['Rating'].dropna().to_numpy()
+        hotel_statistics['rating_histogram'] += np.histogram(ratings, bins=RATING_SKETCH_BIN_EDGES)[0]
+        hotel_statistics['rating_sum'] += float(ratings.sum())
+        hotel_statistics['num_ratings'] += len(ratings)
+
+        review_lengths = (chunk_df['Negative Reviews'].str.len().fillna(0)
+                          + chunk_df['Positive Reviews'].str.len().fillna(0))[non_empty_reviews].to_numpy(dtype=np.int64)
+        hotel_statistics['review_length_histogram'] += np.histogram(review_lengths, bins=REVIEW_LENGTH_BIN_EDGES)[0]
+        hotel_statistics['review_length_sum'] += int(review_lengths.sum())
+        hotel_statistics['max_review_length'] = max(hotel_statistics['max_review_length'],
+                                                    int(review_lengths.max(initial=0)))
+
+        review_dates = chunk_df[REVIEW_DATE_COLUMN]
+        hotel_statistics['first_review_date'] = pd.Series([hotel_statistics['first_review_date'],
+                                                           review_dates.min()]).min()
+        hotel_statistics['last_review_date'] = pd.Series([hotel_statistics['last_review_date'],
+                                                          review_dates.max()]).max()
+
+        traveler_types = chunk_df['Traveler Type'].dropna()
+        hotel_statistics['traveler_type_counts'].update(traveler_types.value_counts().to_dict())
+
+        overall_ratings = chunk_df['Overall Average Rating'].dropna()
+        hotel_statistics['overall_rating_sum'] += float(overall_ratings.sum())
+        hotel_statistics['num_overall_ratings'] += len(overall_ratings)
+
+    hotel_statistics['min_reviews'] = hotel_statistics['max_reviews'] = hotel_statistics['num_reviews']
+    if hotel_statistics['num_overall_ratings'] > 0:
+        hotel_statistics['house_overall_ratings'] = [
+            hotel_statistics['overall_rating_sum'] / hotel_statistics['num_overall_ratings']]
+
+    return hotel_statistics
+
+
+def merge_statistics(statistics: dict, other_statistics: dict) -> dict:
+    """
+    Merges the running aggregates of two sets of hotels.
+    :param statistics: running aggregates of the first set of hotels.
+    :param other_statistics: running aggregates of the second set of hotels.
+    :return: running aggregates of both sets of hotels.
+    """
+
+    return {
+        'num_houses': statistics['num_houses'] + other_statistics['num_houses'],
+        'num_rows': statistics['num_rows'] + other_statistics['num_rows'],
+        'num_reviews': statistics['num_reviews'] + other_statistics['num_reviews'],
+        'min_reviews': min(statistics['min_reviews'], other_statistics['min_reviews']),
+        'max_reviews': max(statistics['max_reviews'], other_statistics['max_reviews']),
+        'rating_histogram': statistics['rating_histogram'] + other_statistics['rating_histogram'],
+        'rating_sum': statistics['rating_sum'] + other_statistics['rating_sum'],
+        'num_ratings': statistics['num_ratings'] + other_statistics['num_ratings'],
+        'review_length_histogram': statistics['review_length_histogram'] + other_statistics['review_length_histogram'],
+        'review_length_sum': statistics['review_length_sum'] + other_statistics['review_length_sum'],
+        'max_review_length': max(statistics['max_review_length'], other_statistics['max_review_length']),
+        'first_review_date': pd.Series([statistics['first_review_date'], other_statistics['first_review_date']]).min(),
+        'last_review_date': pd.Series([statistics['last_review_date'], other_statistics['last_review_date']]).max(),
+        'traveler_type_counts': statistics['traveler_type_counts'] + other_statistics['traveler_type_counts'],
+        # Counter addition would drop the zero counts.
+        'parse_errors': Counter({
+            column: statistics['parse_errors'][column] + other_statistics['parse_errors'][column]
+            for column in statistics['parse_errors'].keys() | other_statistics['parse_errors'].keys()
+        }),
+        'overall_rating_sum': statistics['overall_rating_sum'] + other_statistics['overall_rating_sum'],
+        'num_overall_ratings': statistics['num_overall_ratings'] + other_statistics['num_overall_ratings'],
+        'house_overall_ratings': statistics['house_overall_ratings'] + other_statistics['house_overall_ratings'],
+        'file_size_kb': statistics['file_size_kb'] + other_statistics['file_size_kb']
+    }
+
+
+def approximate_quantiles(histogram: np.ndarray, bin_edges: np.ndarray, quantiles: tuple[float, ...]) -> list[float]:
+    """
+    Approximates quantiles from a histogram sketch, as the center of the bin containing each quantile.
+    The error is at most half the width of a bin (ratings on the 0.1 grid are exact, since their bins are centered).
+    :param histogram: number of values in each bin.
+    :param bin_edges: edges of the bins of the histogram.
+    :param quantiles: quantiles to approximate, in range [0, 1].
+    :return: approximated value of each quantile (nan for an empty histogram).
+    """
+
+    total_count = histogram.sum()
+    if total_count == 0:
+        return [float('nan')] * len(quantiles)
+
+    quantile_bins = np.searchsorted(np.cumsum(histogram), np.asarray(quantiles) * total_count)
+    quantile_bins = np.minimum(quantile_bins, len(histogram) - 1)
+    return ((bin_edges[quantile_bins] + bin_edges[quantile_bins + 1]) / 2).tolist()
+
+
+def summarize_statistics(statistics: dict) -> dict[str, float]:
+    """
+    Summarizes the running aggregates of a set of hotels into printable statistics.
+    :param statistics: running aggregates of a single hotel or of a set of hotels.
+    :return: dictionary with statistic of the datafiles, including those of `calculate_statistics`.
+    """
+
+    num_houses = statistics['num_houses']
+    summary = {
+        'Number of houses scraped': num_houses,
+        'Average reviews per house': statistics['num_reviews'] / num_houses if num_houses > 0 else 0,
+        'Max reviews per house': statistics['max_reviews'],
+        'Min reviews per house': statistics['min_reviews'],
+        'Average overall rating per house': np.mean(statistics['house_overall_ratings'])
+        if statistics['house_overall_ratings'] else 0,
+        'Max overall rating per house': max(statistics['house_overall_ratings'], default=0),
+        'Min overall rating per house': min(statistics['house_overall_ratings'], default=float('inf')),
+        'Average file size per house (in KB)': statistics['file_size_kb'] / num_houses if num_houses > 0 else 0,
+        'Average review rating': statistics['rating_sum'] / statistics['num_ratings']
+        if statistics['num_ratings'] > 0 else 0,
+        'Average review length (in characters)': statistics['review_length_sum'] / statistics['num_reviews']
+        if statistics['num_reviews'] > 0 else 0,
+        'Max review length (in characters)': statistics['max_review_length']
+    }
+
+    rating_quantiles = approximate_quantiles(statistics['rating_histogram'], RATING_SKETCH_BIN_EDGES,
+                                             RATING_QUANTILES)
+    for quantile, rating in zip(RATING_QUANTILES, rating_quantiles):
+        summary[f'Review rating quantile {quantile:.2f} (approx.)'] = rating
+
+    review_length_quantiles = approximate_quantiles(statistics['review_length_histogram'], REVIEW_LENGTH_BIN_EDGES,
+                                                    (0.5, 0.9))
+    summary['Median review length (approx.)'], summary['90th percentile review length (approx.)'] = \
+        review_length_quantiles
+
+    if not pd.isna(statistics['first_review_date']):
+        summary['First review date'] = statistics['first_review_date'].date()
+        summary['Last review date'] = statistics['last_review_date'].date()
+
+    for traveler_type, count in sorted(statistics['traveler_type_counts'].items()):
+        summary[f'Reviews by traveler type: {traveler_type}'] = count
+
+    for column, count in sorted(statistics['parse_errors'].items()):
+        summary[f'Unparsable values: {column}'] = count
+
+    return summary
+
+
+def calculate_statistics_streaming(
+        folder_path: str,
+        chunk_size: int = 10000,
+        num_workers: int | None = None
+) -> tuple[dict[str, dict], dict]:
+    """
+    Calculates the statistics of the data files from the given path in streaming mode: each file is read in chunks of
+    the needed columns only (see `calculate_hotel_statistics_streaming`), the files are processed in parallel, and the
+    per-hotel aggregates are merged into global ones. No hotel is ever fully held in memory.
+    :param folder_path: path to data files folder.
+    :param chunk_size: number of rows read at a time.
+    :param num_workers: number of worker processes (defaults to the number of CPUs).
+    :return: mapping between each data file and its running aggregates, and the merged aggregates of all the files.
+    """
+
+    file_names = sorted(file_name for file_name in os.listdir(folder_path) if file_name.endswith('.csv'))
+    file_paths = [os.path.join(folder_path, file_name) for file_name in file_names]
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        per_hotel_statistics = dict(zip(file_names, executor.map(calculate_hotel_statistics_streaming, file_paths,
+                                                                 [chunk_size] * len(file_paths))))
+
+    global_statistics = None
+    for hotel_statistics in per_hotel_statistics.values():
+        global_statistics = hotel_statistics if global_statistics is None \
+            else merge_statistics(global_statistics, hotel_statistics)
+
+    return per_hotel_statistics, global_statistics
+
+
+def save_per_hotel_statistics(
+        per_hotel_statistics: dict[str, dict],
+        output_path: str = PER_HOTEL_STATISTICS_PATH
+) -> pd.DataFrame:
+    """
+    Summarizes the running aggregates of each hotel (see `summarize_statistics`), and saves them as a .csv file.
+    :param per_hotel_statistics: mapping between each data file and its running aggregates.
+    :param output_path: path of the .csv file.
+    :return: dataframe with one row of statistics per hotel.
+    """
+
+    per_hotel_df = pd.DataFrame.from_dict(
+        {hotel_name_from_file_name(file_name): summarize_statistics(hotel_statistics)
+         for file_name, hotel_statistics in per_hotel_statistics.items()}, orient='index')
+    # The statistics over houses reduce to a single value per hotel.
+    per_hotel_df = per_hotel_df.drop(columns=['Number of houses scraped', 'Max reviews per house',
+                                              'Min reviews per house', 'Max overall rating per house',
+                                              'Min overall rating per house'])
+    per_hotel_df = per_hotel_df.rename(columns={'Average reviews per house': 'Number of reviews',
+                                                'Average overall rating per house': 'Overall rating',
+                                                'Average file size per house (in KB)': 'File size (in KB)'})
+    # A hotel without reviews of a traveler type has no column for it.
+    traveler_type_columns = [column for column in per_hotel_df.columns if column.startswith('Reviews by traveler type')]
+    per_hotel_df[traveler_type_columns] = per_hotel_df[traveler_type_columns].fillna(0).astype(np.int64)
+    per_hotel_df.to_csv(output_path, index_label=HOTEL_NAME_COLUMN, float_format='%.6g')
+    return per_hotel_df
+
+
+def calculate_schema_report(folder_path: str) -> tuple[pd.DataFrame, dict[str, int]]:
+    """
+    Compares the memory footprint of the typed columns of the data files from the given path before and after parsing
+    them with the review schema. Both are read from the corpus store: the typed columns, and the footprints of the raw
+    columns and the numbers of unparsable values recorded when each data file was added to the store.
+    :param folder_path: path to data files folder.
+    :return: memory footprint report (see `calculate_memory_footprint_report`); and mapping between each typed column
+     and its number of unparsable values.
+    """
+
+    manifest = load_corpus_manifest(folder_path)
+    raw_footprints = list(manifest['raw_footprints'].values())
+    columns = [column for column in SCHEMA_COLUMNS if any(column in footprints for footprints in raw_footprints)]
+    typed_df = load_reviews_corpus(folder_path, columns=columns)
+
+    parse_errors = {column: sum(file_parse_errors.get(column, 0)
+                                for file_parse_errors in manifest['parse_errors'].values())
+                    for column in columns}
+    return calculate_memory_footprint_report(raw_footprints, typed_df), parse_errors
+
+
 def plot_overall_rating_histogram(overall_ratings) -> None:
     """
     Plots histogram of the overall rating of accommodations.
@@ -69,24 +349,57 @@ def plot_overall_rating_histogram(overall_ratings) -> None:
     plt.title('Histogram of Overall Ratings of Houses')
     plt.xlabel('Overall Rating')
     plt.ylabel('Number of Accommodations')
-    plt.show()
+
+    plt.savefig(OVERALL_RATING_HISTOGRAM_PATH)
+    show_or_close_figure()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calculates the statistics of the scraped data files.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='read the data files in chunks, in parallel, and print richer statistics')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes in streaming mode')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='number of rows read at a time in streaming mode')
+    parser.add_argument('--render-only', action='store_true',
+                        help='render the plot headless, skipping it if its data is unchanged')
+    parser.add_argument('--schema-report', action='store_true',
+                        help='print the memory footprint of the typed columns before and after parsing them, and '
+                             'their numbers of unparsable values')
+    args = parser.parse_args()
+    if args.render_only:
+        enable_render_only()
+
     folder_path = 'data'
 
-    # Print statistics of data files.
-    stats = calculate_statistics(folder_path)
-    for key, value in stats.items():
-        print(f"{key}: {value:.2f}")
-
-    # Plot histogram of the overall average rating of accommodations .
-    overall_ratings = []
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(folder_path, filename)
-            df = pd.read_csv(file_path)
-            avg_rating = df['Overall Average Rating'].mean()
-            overall_ratings.append(avg_rating)
-
-    plot_overall_rating_histogram(overall_ratings)
+    if args.streaming:
+        per_hotel_statistics, global_statistics = calculate_statistics_streaming(folder_path, args.chunk_size,
+                                                                                 args.workers)
+        for key, value in summarize_statistics(global_statistics).items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+        save_per_hotel_statistics(per_hotel_statistics)
+        print(f"Saved the statistics of each hotel to {PER_HOTEL_STATISTICS_PATH}")
+
+        overall_ratings = list(global_statistics['house_overall_ratings'])
+
+    else:
+        # Print statistics of data files.
+        stats = calculate_statistics(folder_path)
+        for key, value in stats.items():
+            print(f"{key}: {value:.2f}")
+
+        # Plot histogram of the overall average rating of accommodations (read from the same cached corpus).
+        ratings_df = load_reviews_corpus(folder_path, columns=[HOTEL_NAME_COLUMN, 'Overall Average Rating'])
+        overall_ratings = ratings_df.groupby(HOTEL_NAME_COLUMN, sort=False,
+                                             observed=True)['Overall Average Rating'].mean().tolist()
+
+    if args.schema_report:
+        memory_footprint_report, parse_errors = calculate_schema_report(folder_path)
+        print(memory_footprint_report.to_string(formatters={'saving': '{:.1%}'.format}))
+        for column, count in parse_errors.items():
+            print(f"Unparsable values: {column}: {count}")
+
+    if args.render_only:
+        print_render_statuses(render_plots([('overall_ratings_histogram', plot_overall_rating_histogram,
+                                             (overall_ratings,))]))
+    else:
+        plot_overall_rating_histogram(overall_ratings)
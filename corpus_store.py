@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count_bytes_read, time_stage
+from review_schema import (CATEGORICAL_REVIEW_COLUMNS, apply_review_schema, calculate_column_footprints,
+                           normalize_review_spellings)
+
+REPO_ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER_PATH = os.path.join(REPO_ROOT_PATH, 'data')
+TOPIC_CLASSIFIED_DATA_FOLDER = os.path.join(REPO_ROOT_PATH, 'data_topic_classified')
+CORPUS_CACHE_FOLDER = os.path.join(REPO_ROOT_PATH, 'corpus_cache')
+
+HOTEL_NAME_COLUMN = 'Hotel Name'
+SOURCE_FILE_COLUMN = 'Source File'
+CATEGORICAL_COLUMNS = [HOTEL_NAME_COLUMN, SOURCE_FILE_COLUMN, *CATEGORICAL_REVIEW_COLUMNS]
+TOPICS_COLUMNS = [
+    'Room amenities - positive', 'Room amenities - negative',
+    'Hotel amenities - positive', 'Hotel amenities - negative',
+    'Staff - positive', 'Staff - negative',
+    'Food and beverages - positive', 'Food and beverages - negative',
+    'Location - positive', 'Location - negative'
+]
+DATA_FILE_PREFIXES = ('processed_reviews_', 'reviews_')
+CORPUS_STORE_VERSION = 4
+
+
+def hotel_name_from_file_name(file_name: str) -> str:
+    """
+    Extracts the hotel name from the name of its data file, e.g. 'processed_reviews_Hotel_Boss.csv' -> 'Hotel_Boss'.
+    :param file_name: name of a (raw or topic-classified) hotel reviews data file.
+    :return: name of the hotel.
+    """
+
+    hotel_name = os.path.splitext(os.path.basename(file_name))[0]
+    for prefix in DATA_FILE_PREFIXES:
+        if hotel_name.startswith(prefix):
+            return hotel_name[len(prefix):]
+    return hotel_name
+
+
+def list_data_files(folder_path: str) -> dict[str, tuple[int, int]]:
+    """
+    Lists the .csv data files of the given folder with their modification time and size.
+    :param folder_path: path to folder of hotel data files.
+    :return: mapping between each file name and its (mtime in ns, size in bytes), sorted by file name.
+    """
+
+    data_files = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.endswith('.csv'):
+            file_stat = os.stat(os.path.join(folder_path, file_name))
+            data_files[file_name] = (file_stat.st_mtime_ns, file_stat.st_size)
+    return data_files
+
+
+def read_hotel_reviews_file(folder_path: str, file_name: str) -> pd.DataFrame:
+    """
+    Reads a single hotel data file into the columnar layout of the corpus store.
+    :param folder_path: path to folder of hotel data files.
+    :param file_name: name of the hotel data file.
+    :return: reviews of the hotel, with normalized spellings (see `normalize_review_spellings`), and with the hotel
+     name and source file columns added.
+    """
+
+    with time_stage('read_csv'):
+        hotel_reviews_df = pd.read_csv(os.path.join(folder_path, file_name))
+    count_bytes_read(os.path.join(folder_path, file_name))
+    hotel_reviews_df = normalize_review_spellings(hotel_reviews_df)
+    hotel_reviews_df.insert(0, HOTEL_NAME_COLUMN, hotel_name_from_file_name(file_name))
+    hotel_reviews_df.insert(1, SOURCE_FILE_COLUMN, file_name)
+    return hotel_reviews_df
+
+
+def get_corpus_cache_paths(folder_path: str, cache_folder: str) -> tuple[str, str]:
+    """
+    Gets the paths of the cached store of the given data folder and of its manifest.
+    :param folder_path: path to folder of hotel data files.
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: path of the Parquet store and path of its JSON manifest.
+    """
+
+    absolute_folder_path = os.path.abspath(folder_path)
+    folder_hash = hashlib.sha1(absolute_folder_path.encode('utf-8')).hexdigest()[:8]
+    store_name = f"{os.path.basename(absolute_folder_path)}_{folder_hash}"
+    return (os.path.join(cache_folder, f"{store_name}.parquet"),
+            os.path.join(cache_folder, f"{store_name}.manifest.json"))
+
+
+def load_reviews_corpus(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        columns: list[str] | None = None,
+        cache_folder: str = CORPUS_CACHE_FOLDER
+) -> pd.DataFrame:
+    """
+    Loads all the hotel data files of the given folder as a single dataframe, through a Parquet store that is built on
+    the first call and reused as long as the data files are unchanged.
+    The store is invalidated per file by its modification time and size: only new or modified files are re-parsed,
+    and the rows of deleted files are dropped.
+    :param folder_path: path to folder of (raw or topic-classified) hotel data files.
+    :param columns: columns to load (all columns by default). Only these columns are read from the store.
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: reviews of all the hotels, with a categorical hotel name column, the typed columns of the review schema
+     (parsed once, when a data file is added to the store, see `apply_review_schema`), and int8 topic flags. The
+     British spellings of older data files are normalized ('Traveller Type' is renamed to 'Traveler Type', and
+     'Solo traveller' to 'Solo traveler', see `normalize_review_spellings`). An empty dataframe with the requested
+     columns if the folder has no data files.
+    """
+
+    store_path, manifest_path = get_corpus_cache_paths(folder_path, cache_folder)
+    data_files = list_data_files(folder_path)
+    if not data_files:
+        return pd.DataFrame(columns=columns)
+
+    cached_data_files, cached_parse_errors, cached_raw_footprints = {}, {}, {}
+    if os.path.exists(store_path) and os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+        # A store written by another version of the layout is rebuilt from scratch.
+        if manifest.get('version') == CORPUS_STORE_VERSION:
+            cached_data_files = {file_name: tuple(file_stat) for file_name, file_stat in manifest['files'].items()}
+            cached_parse_errors = manifest['parse_errors']
+            cached_raw_footprints = manifest['raw_footprints']
+
+    if cached_data_files == data_files:
+        count_bytes_read(store_path)
+        with time_stage('read_corpus_store'):
+            return pd.read_parquet(store_path, columns=columns)
+
+    unchanged_files = [file_name for file_name, file_stat in data_files.items()
+                       if cached_data_files.get(file_name) == file_stat]
+    changed_files = [file_name for file_name in data_files if file_name not in unchanged_files]
+
+    hotel_reviews_dfs = []
+    parse_errors = {file_name: cached_parse_errors[file_name] for file_name in unchanged_files}
+    raw_footprints = {file_name: cached_raw_footprints[file_name] for file_name in unchanged_files}
+    if unchanged_files:
+        count_bytes_read(store_path)
+        with time_stage('read_corpus_store'):
+            cached_corpus_df = pd.read_parquet(store_path, filters=[(SOURCE_FILE_COLUMN, 'in', unchanged_files)])
+        hotel_reviews_dfs.append(cached_corpus_df)
+    for file_name in changed_files:
+        raw_hotel_reviews_df = read_hotel_reviews_file(folder_path, file_name)
+        raw_footprints[file_name] = calculate_column_footprints(raw_hotel_reviews_df)
+        hotel_reviews_df, parse_errors[file_name] = apply_review_schema(raw_hotel_reviews_df)
+        hotel_reviews_dfs.append(hotel_reviews_df)
+
+    corpus_df = pd.concat(hotel_reviews_dfs, ignore_index=True)
+    if not corpus_df.empty:
+        # Keep the hotels grouped and in file name order, whichever files were re-parsed.
+        file_order = {file_name: i for i, file_name in enumerate(data_files)}
+        corpus_df = corpus_df.sort_values(SOURCE_FILE_COLUMN, key=lambda column: column.astype(str).map(file_order),
+                                          kind='stable', ignore_index=True)
+        corpus_df = convert_corpus_dtypes(corpus_df)
+
+    os.makedirs(cache_folder, exist_ok=True)
+    corpus_df.to_parquet(store_path, index=False)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump({'version': CORPUS_STORE_VERSION, 'files': data_files, 'parse_errors': parse_errors,
+                   'raw_footprints': raw_footprints}, manifest_file, indent=1)
+
+    return corpus_df if columns is None else corpus_df[columns]
+
+
+def load_corpus_manifest(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        cache_folder: str = CORPUS_CACHE_FOLDER
+) -> dict[str, dict]:
+    """
+    Loads the manifest of the corpus store of the given folder, updating the store first if the data files changed.
+    :param folder_path: path to folder of (raw or topic-classified) hotel data files.
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: mapping between 'files', 'parse_errors' and 'raw_footprints' and the (mtime, size), the numbers of
+     unparsable values of each schema column, and the footprints of the schema columns as read (see
+     `calculate_column_footprints`) of each data file.
+    """
+
+    if not list_data_files(folder_path):
+        return {'files': {}, 'parse_errors': {}, 'raw_footprints': {}}
+
+    load_reviews_corpus(folder_path, columns=[SOURCE_FILE_COLUMN], cache_folder=cache_folder)
+    with open(get_corpus_cache_paths(folder_path, cache_folder)[1], encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def load_corpus_parse_errors(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        cache_folder: str = CORPUS_CACHE_FOLDER
+) -> dict[str, dict[str, int]]:
+    """
+    Loads the numbers of values of each data file that could not be parsed when it was added to the corpus store.
+    :param folder_path: path to folder of (raw or topic-classified) hotel data files.
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: mapping between each data file and the number of unparsable values of each column of the review schema.
+    """
+
+    return load_corpus_manifest(folder_path, cache_folder)['parse_errors']
+
+
+def convert_corpus_dtypes(corpus_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the columns of the corpus to compact dtypes: categories for the hotel name, source file, room type and
+    traveler type, and int8 for the (topic, sentiment) flags.
+    :param corpus_df: reviews of all the hotels.
+    :return: the converted dataframe.
+    """
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in corpus_df.columns:
+            corpus_df[column] = corpus_df[column].astype('category')
+
+    topic_columns = [column for column in TOPICS_COLUMNS if column in corpus_df.columns]
+    corpus_df[topic_columns] = corpus_df[topic_columns].fillna(0).astype(np.int8)
+    return corpus_df
+
+
+def iter_hotel_reviews(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        columns: list[str] | None = None,
+        cache_folder: str = CORPUS_CACHE_FOLDER
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Iterates over the hotels of the given folder, reading them from the corpus store.
+    :param folder_path: path to folder of (raw or topic-classified) hotel data files.
+    :param columns: columns to load (all columns by default).
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: iterator of (hotel name, reviews dataframe of the hotel), where each dataframe has a fresh range index,
+     as if it was read from the hotel data file.
+    """
+
+    load_columns = None if columns is None else list(dict.fromkeys([HOTEL_NAME_COLUMN, *columns]))
+    corpus_df = load_reviews_corpus(folder_path, columns=load_columns, cache_folder=cache_folder)
+    if corpus_df.empty:
+        return
+
+    for hotel_name, hotel_reviews_df in corpus_df.groupby(HOTEL_NAME_COLUMN, sort=False, observed=True):
+        if columns is not None:
+            hotel_reviews_df = hotel_reviews_df[columns]
+        yield hotel_name, hotel_reviews_df.reset_index(drop=True)
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from corpus_store import HOTEL_NAME_COLUMN, TOPIC_CLASSIFIED_DATA_FOLDER, load_reviews_corpus
+
+HOTEL_LOCATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hotel_locations.csv')
+EARTH_RADIUS_KM = 6371.0
+HOTEL_ID_COLUMN = 'Hotel Id'
+CITY_COLUMN = 'City'
+LATITUDE_COLUMN = 'Latitude'
+LONGITUDE_COLUMN = 'Longitude'
+REVIEW_COUNT_COLUMN = 'Review Count'
+AVERAGE_RATING_COLUMN = 'Average Rating'
+DISTANCE_COLUMN = 'Distance (km)'
+
+
+def load_hotel_locations(hotel_locations_path: str = HOTEL_LOCATIONS_PATH) -> pd.DataFrame:
+    """
+    Loads the hotel locations table: the city and (approximate) coordinates of each hotel of the corpus and of the
+    reranker's catalog, as the scraped data carries no address.
+    :param hotel_locations_path: path of the hotel locations .csv file.
+    :return: one row per hotel, with its name, city, latitude and longitude.
+    """
+
+    hotel_locations = pd.read_csv(hotel_locations_path, dtype={HOTEL_NAME_COLUMN: str, CITY_COLUMN: str})
+    duplicated_hotels = hotel_locations.loc[hotel_locations[HOTEL_NAME_COLUMN].duplicated(), HOTEL_NAME_COLUMN]
+    if not duplicated_hotels.empty:
+        raise ValueError(f"Duplicated hotels in {hotel_locations_path}: {', '.join(duplicated_hotels)}")
+    return hotel_locations
+
+
+def build_hotel_metadata(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        hotel_locations_path: str = HOTEL_LOCATIONS_PATH
+) -> pd.DataFrame:
+    """
+    Builds the metadata table of the hotels of the corpus: city, coordinates, number of reviews and average rating.
+    :param folder_path: path to folder of (raw or topic-classified) hotel data files.
+    :param hotel_locations_path: path of the hotel locations .csv file, with the city and coordinates of each hotel.
+    :return: one row per hotel (in corpus order), with its id, name, city, latitude and longitude, review count and
+     average review rating.
+    :raises ValueError: if some hotels of the corpus are missing from the hotel locations file.
+    """
+
+    corpus_df = load_reviews_corpus(folder_path, columns=[HOTEL_NAME_COLUMN, 'Rating'])
+    hotel_groups = corpus_df.groupby(HOTEL_NAME_COLUMN, sort=False, observed=True)['Rating']
+
+    hotel_metadata = pd.DataFrame({
+        HOTEL_NAME_COLUMN: hotel_groups.size().index.astype(str),
+        REVIEW_COUNT_COLUMN: hotel_groups.size().to_numpy(),
+        AVERAGE_RATING_COLUMN: hotel_groups.mean().to_numpy()
+    })
+    hotel_locations = load_hotel_locations(hotel_locations_path)
+    unknown_hotels = sorted(set(hotel_metadata[HOTEL_NAME_COLUMN]) - set(hotel_locations[HOTEL_NAME_COLUMN]))
+    if unknown_hotels:
+        raise ValueError(f"Hotels missing from {hotel_locations_path}: {', '.join(unknown_hotels)}")
+
+    hotel_metadata = hotel_metadata.merge(hotel_locations, on=HOTEL_NAME_COLUMN, how='left', validate='one_to_one')
+    hotel_metadata.insert(0, HOTEL_ID_COLUMN, np.arange(len(hotel_metadata)))
+    return hotel_metadata[[HOTEL_ID_COLUMN, HOTEL_NAME_COLUMN, CITY_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN,
+                           REVIEW_COUNT_COLUMN, AVERAGE_RATING_COLUMN]]
+
+
+def to_unit_sphere(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Maps (latitude, longitude) coordinates in degrees to 3D points on the unit sphere.
+    :param latitudes: latitudes in degrees.
+    :param longitudes: longitudes in degrees.
+    :return: array of shape (num_points x 3).
+    """
+
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack([np.cos(latitudes) * np.cos(longitudes),
+                            np.cos(latitudes) * np.sin(longitudes),
+                            np.sin(latitudes)])
+
+
+def chord_to_km(chord_lengths: np.ndarray) -> np.ndarray:
+    """
+    Converts chord lengths between points of the unit sphere to great-circle distances on Earth.
+    :param chord_lengths: chord lengths.
+    :return: distances in km.
+    """
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord_lengths / 2, 0, 1))
+
+
+class HotelSpatialIndex:
+    """
+    KD-tree over the hotels' coordinates, mapped to the unit sphere so that Euclidean (chord) distances between the
+    points are monotonic in great-circle distances, for "hotels within R km" and nearest hotels queries.
+    """
+
+    def __init__(self, hotel_metadata: pd.DataFrame):
+        self.hotel_metadata = hotel_metadata.dropna(subset=[LATITUDE_COLUMN, LONGITUDE_COLUMN]).reset_index(drop=True)
+        self.tree = cKDTree(to_unit_sphere(self.hotel_metadata[LATITUDE_COLUMN].to_numpy(),
+                                           self.hotel_metadata[LONGITUDE_COLUMN].to_numpy()))
+
+    def rows_within(self, latitude: float, longitude: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the rows (in the index's metadata table) of the hotels within the given great-circle distance of a point.
+        :param latitude: latitude of the point in degrees.
+        :param longitude: longitude of the point in degrees.
+        :param radius_km: radius in km.
+        :return: the rows of the hotels within the radius and their distances in km, sorted by distance.
+        """
+
+        point = to_unit_sphere(np.array([latitude]), np.array([longitude]))[0]
+        chord_radius = 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+        rows = np.array(self.tree.query_ball_point(point, chord_radius), dtype=np.int64)
+
+        distances = chord_to_km(np.linalg.norm(self.tree.data[rows] - point, axis=1))
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def hotels_within(self, latitude: float, longitude: float, radius_km: float) -> pd.DataFrame:
+        """
+        Finds the hotels within the given great-circle distance of a point.
+        :param latitude: latitude of the point in degrees.
+        :param longitude: longitude of the point in degrees.
+        :param radius_km: radius in km.
+        :return: metadata of the hotels within the radius, with their distance, sorted by distance.
+        """
+
+        rows, distances = self.rows_within(latitude, longitude, radius_km)
+        return self.hotel_metadata.iloc[rows].assign(**{DISTANCE_COLUMN: distances})
+
+    def nearest_hotels(self, latitude: float, longitude: float, k: int = 1) -> pd.DataFrame:
+        """
+        Finds the hotels nearest to a point.
+        :param latitude: latitude of the point in degrees.
+        :param longitude: longitude of the point in degrees.
+        :param k: number of hotels to find.
+        :return: metadata of the k nearest hotels, with their distance, sorted by distance.
+        """
+
+        k = min(k, len(self.hotel_metadata))
+        point = to_unit_sphere(np.array([latitude]), np.array([longitude]))[0]
+        chord_lengths, rows = self.tree.query(point, k=k)
+        chord_lengths, rows = np.atleast_1d(chord_lengths), np.atleast_1d(rows)
+        return self.hotel_metadata.iloc[rows].assign(**{DISTANCE_COLUMN: chord_to_km(chord_lengths)})
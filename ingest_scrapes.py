@@ -0,0 +1,292 @@
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from corpus_store import DATA_FOLDER_PATH, REPO_ROOT_PATH, TOPIC_CLASSIFIED_DATA_FOLDER, hotel_name_from_file_name
+from review_schema import COLUMN_NAME_ALIASES
+
+sys.path.append(os.path.join(REPO_ROOT_PATH, 'topic_classification'))
+from classify_reviews_topics import (CLASSIFIED_FILE_PREFIX, REVIEW_TEXT_COLUMNS, TOPIC_CLASSIFIER_PATH,  # noqa: E402
+                                     classify_reviews, load_topic_classifier)
+
+SCRAPES_FOLDER_PATH = os.path.join(REPO_ROOT_PATH, 'scrapes')
+INGESTION_STATE_FOLDER = os.path.join(REPO_ROOT_PATH, 'ingestion_state')
+INGESTION_DELTAS_PATH = os.path.join(INGESTION_STATE_FOLDER, 'deltas.jsonl')
+RAW_FILE_PREFIX = 'reviews_'
+REVIEW_KEY_COLUMNS = ['Review Title', 'Positive Reviews', 'Negative Reviews', 'Review Date', 'Room Type']
+
+
+def read_reviews_as_text(file_path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads a hotel reviews file with every field kept as its original text (missing fields are empty strings), so that
+    review keys do not depend on type inference, and appended rows are written back as they were scraped.
+    :param file_path: path of the reviews file.
+    :param columns: columns to read (all the columns by default).
+    :return: reviews of the hotel.
+    """
+
+    return pd.read_csv(file_path, dtype=str, keep_default_na=False, usecols=columns)
+
+
+def calculate_review_keys(reviews_df: pd.DataFrame) -> np.ndarray:
+    """
+    Calculates the stable key of each review: the hash of its title, texts, review date and room type, and of its
+    occurrence number among the identical reviews before it. Identical reviews (e.g. untitled reviews without text of
+    the same date and room type) are distinct reviews, so the k-th copy of a review in a scrape matches the k-th copy
+    of it in the hotel data, and only the extra copies are new.
+    :param reviews_df: reviews of a hotel, read with `read_reviews_as_text`.
+    :return: uint64 key of each review.
+    """
+
+    review_hashes = pd.util.hash_pandas_object(
+        reviews_df[REVIEW_KEY_COLUMNS].apply(lambda column: column.str.strip()), index=False)
+    occurrences = review_hashes.groupby(review_hashes.to_numpy(), sort=False).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({'review': review_hashes.to_numpy(),
+                                                    'occurrence': occurrences.to_numpy()}), index=False).to_numpy()
+
+
+def get_review_keys_path(hotel_name: str, state_folder: str = INGESTION_STATE_FOLDER) -> str:
+    """
+    Gets the path of the stored review keys of a hotel.
+    :param hotel_name: name of the hotel.
+    :param state_folder: path to folder of the ingestion state.
+    :return: path of the .npz file of the hotel.
+    """
+
+    return os.path.join(state_folder, f"review_keys_{hotel_name}.npz")
+
+
+def load_review_keys(hotel_name: str, data_file_path: str, state_folder: str = INGESTION_STATE_FOLDER) -> np.ndarray:
+    """
+    Loads the sorted review keys of a hotel data file. The keys are stored with the (mtime, size) of the data file
+    they were calculated from, and are calculated again from the data file if it was modified since.
+    :param hotel_name: name of the hotel.
+    :param data_file_path: path of the hotel data file.
+    :param state_folder: path to folder of the ingestion state.
+    :return: sorted review keys of the hotel (empty if it has no data file yet).
+    """
+
+    if not os.path.exists(data_file_path):
+        return np.empty(0, dtype=np.uint64)
+
+    keys_path = get_review_keys_path(hotel_name, state_folder)
+    data_file_stat = os.stat(data_file_path)
+    if os.path.exists(keys_path):
+        with np.load(keys_path) as review_keys:
+            if tuple(review_keys['source']) == (data_file_stat.st_mtime_ns, data_file_stat.st_size):
+                return review_keys['keys']
+
+    review_keys = np.sort(calculate_review_keys(read_reviews_as_text(data_file_path, REVIEW_KEY_COLUMNS)))
+    save_review_keys(hotel_name, review_keys, data_file_path, state_folder)
+    return review_keys
+
+
+def save_review_keys(
+        hotel_name: str,
+        review_keys: np.ndarray,
+        data_file_path: str,
+        state_folder: str = INGESTION_STATE_FOLDER
+) -> None:
+    """
+    Stores the sorted review keys of a hotel, with the (mtime, size) of its data file.
+    :param hotel_name: name of the hotel.
+    :param review_keys: sorted review keys of the hotel.
+    :param data_file_path: path of the hotel data file.
+    :param state_folder: path to folder of the ingestion state.
+    """
+
+    os.makedirs(state_folder, exist_ok=True)
+    data_file_stat = os.stat(data_file_path)
+    np.savez(get_review_keys_path(hotel_name, state_folder), keys=review_keys,
+             source=np.array([data_file_stat.st_mtime_ns, data_file_stat.st_size], dtype=np.int64))
+
+
+def append_reviews(reviews_df: pd.DataFrame, file_path: str) -> None:
+    """
+    Appends reviews to a hotel reviews file, in the column order of its header (a new file is written with a header).
+    :param reviews_df: reviews to append.
+    :param file_path: path of the reviews file.
+    """
+
+    if not os.path.exists(file_path):
+        reviews_df.to_csv(file_path, index=False)
+        return
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    # Older data files use the British spelling of some columns.
+    reviews_df = reviews_df.rename(columns={column: alias for alias, column in COLUMN_NAME_ALIASES.items()
+                                            if alias in header})
+    with open(file_path, 'rb') as reviews_file:
+        ends_with_newline = True
+        if reviews_file.seek(0, os.SEEK_END) > 0:
+            reviews_file.seek(-1, os.SEEK_END)
+            ends_with_newline = reviews_file.read(1) == b'\n'
+    with open(file_path, 'a', newline='', encoding='utf-8') as reviews_file:
+        if not ends_with_newline:
+            reviews_file.write('\n')
+        reviews_df.reindex(columns=header, fill_value='').to_csv(reviews_file, index=False, header=False)
+
+
+def classify_new_reviews(
+        hotel_name: str,
+        new_reviews_df: pd.DataFrame,
+        classified_folder: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        classifier_path: str = TOPIC_CLASSIFIER_PATH
+) -> None:
+    """
+    Classifies the newly ingested reviews of a hotel and appends them to its topic-classified data file, which stays
+    row-aligned with the raw data file.
+    :param hotel_name: name of the hotel.
+    :param new_reviews_df: newly ingested reviews of the hotel, read with `read_reviews_as_text`.
+    :param classified_folder: path to folder of topic-classified hotel data files.
+    :param classifier_path: path of the classifier file.
+    """
+
+    # The classifier treats reviews without text as missing values.
+    reviews_df = new_reviews_df.copy()
+    reviews_df[REVIEW_TEXT_COLUMNS] = reviews_df[REVIEW_TEXT_COLUMNS].replace('', np.nan)
+    classified_df = classify_reviews(reviews_df, load_topic_classifier(classifier_path))
+
+    os.makedirs(classified_folder, exist_ok=True)
+    append_reviews(classified_df, os.path.join(classified_folder, f"{CLASSIFIED_FILE_PREFIX}{hotel_name}.csv"))
+
+
+def ingest_scrape_file(
+        scrape_file_path: str,
+        data_folder: str = DATA_FOLDER_PATH,
+        state_folder: str = INGESTION_STATE_FOLDER,
+        classified_folder: str | None = TOPIC_CLASSIFIED_DATA_FOLDER
+) -> dict[str, object]:
+    """
+    Merges a scraped reviews file into the data file of its hotel: the reviews whose key is not in the hotel data yet
+    are appended to it, without reading the hotel data (only its stored keys). The data files are append-only, so the
+    new reviews are the rows from 'first_new_row' on, which lets downstream stages process only them.
+    :param scrape_file_path: path of the scraped file, e.g. 'scrapes/reviews_Hotel_Boss.csv'.
+    :param data_folder: path to folder of raw hotel data files.
+    :param state_folder: path to folder of the ingestion state.
+    :param classified_folder: path to folder of topic-classified hotel data files, to classify the new reviews into
+     (None to leave the new reviews unclassified).
+    :return: the delta of the ingestion: hotel name, data file, numbers of scraped and new reviews, and the row of the
+     data file the new reviews start at.
+    """
+
+    start_time = time.perf_counter()
+    hotel_name = hotel_name_from_file_name(scrape_file_path)
+    data_file_path = os.path.join(data_folder, f"{RAW_FILE_PREFIX}{hotel_name}.csv")
+
+    scraped_df = read_reviews_as_text(scrape_file_path)
+    scraped_keys = calculate_review_keys(scraped_df)
+    known_keys = load_review_keys(hotel_name, data_file_path, state_folder)
+
+    positions = np.searchsorted(known_keys, scraped_keys)
+    is_known = positions < len(known_keys)
+    is_known[is_known] = known_keys[positions[is_known]] == scraped_keys[is_known]
+    new_reviews_df = scraped_df[~is_known]
+
+    if len(new_reviews_df):
+        os.makedirs(data_folder, exist_ok=True)
+        append_reviews(new_reviews_df, data_file_path)
+        if classified_folder is not None:
+            classify_new_reviews(hotel_name, new_reviews_df, classified_folder)
+        new_keys = np.sort(scraped_keys[~is_known])
+        review_keys = np.insert(known_keys, np.searchsorted(known_keys, new_keys), new_keys)
+        save_review_keys(hotel_name, review_keys, data_file_path, state_folder)
+
+    return {
+        'hotel_name': hotel_name,
+        'scrape_file': os.path.basename(scrape_file_path),
+        'data_file': os.path.basename(data_file_path),
+        'ingested_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'num_scraped_reviews': len(scraped_df),
+        'num_new_reviews': len(new_reviews_df),
+        'first_new_row': len(known_keys),
+        'seconds': round(time.perf_counter() - start_time, 3)
+    }
+
+
+def record_delta(delta: dict[str, object], deltas_path: str = INGESTION_DELTAS_PATH) -> None:
+    """
+    Appends the delta of an ingestion to the ingestion log.
+    :param delta: delta returned by `ingest_scrape_file`.
+    :param deltas_path: path of the JSON lines log of the deltas.
+    """
+
+    os.makedirs(os.path.dirname(deltas_path), exist_ok=True)
+    with open(deltas_path, 'a', encoding='utf-8') as deltas_file:
+        deltas_file.write(json.dumps(delta, ensure_ascii=False) + '\n')
+
+
+def load_deltas(deltas_path: str = INGESTION_DELTAS_PATH, hotel_name: str | None = None) -> list[dict[str, object]]:
+    """
+    Loads the deltas of the past ingestions.
+    :param deltas_path: path of the JSON lines log of the deltas.
+    :param hotel_name: name of the hotel to load the deltas of (all the hotels by default).
+    :return: the deltas, oldest first.
+    """
+
+    if not os.path.exists(deltas_path):
+        return []
+    with open(deltas_path, encoding='utf-8') as deltas_file:
+        deltas = [json.loads(line) for line in deltas_file if line.strip()]
+    return [delta for delta in deltas if hotel_name is None or delta['hotel_name'] == hotel_name]
+
+
+def ingest_scrapes(
+        scrapes_folder: str = SCRAPES_FOLDER_PATH,
+        data_folder: str = DATA_FOLDER_PATH,
+        state_folder: str = INGESTION_STATE_FOLDER,
+        classified_folder: str | None = TOPIC_CLASSIFIED_DATA_FOLDER,
+        deltas_path: str = INGESTION_DELTAS_PATH
+) -> tuple[list[dict[str, object]], dict[str, str]]:
+    """
+    Ingests every scraped file of the scrapes folder, and records the delta of each one. A failing file is recorded
+    and does not abort the other files.
+    :param scrapes_folder: path to folder of scraped files, as downloaded by the scraper extension.
+    :param data_folder: path to folder of raw hotel data files.
+    :param state_folder: path to folder of the ingestion state.
+    :param classified_folder: path to folder of topic-classified hotel data files (None to not classify).
+    :param deltas_path: path of the JSON lines log of the deltas.
+    :return: the deltas of the ingested files; and mapping between each failed file and its error (both empty if there
+     is no scrapes folder).
+    """
+
+    deltas, failures = [], {}
+    if not os.path.isdir(scrapes_folder):
+        return deltas, failures
+
+    for file_name in sorted(os.listdir(scrapes_folder)):
+        if not file_name.endswith('.csv'):
+            continue
+        try:
+            delta = ingest_scrape_file(os.path.join(scrapes_folder, file_name), data_folder, state_folder,
+                                       classified_folder)
+        except Exception as e:
+            failures[file_name] = f"{type(e).__name__}: {e}"
+            continue
+        record_delta(delta, deltas_path)
+        deltas.append(delta)
+
+    return deltas, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merges scraped review files into the hotel data files.')
+    parser.add_argument('--scrapes-folder', default=SCRAPES_FOLDER_PATH,
+                        help='folder of the scraped reviews_<hotel>.csv files')
+    parser.add_argument('--no-classify', action='store_true',
+                        help='do not classify the new reviews into the topic-classified data files')
+    args = parser.parse_args()
+
+    deltas, failures = ingest_scrapes(args.scrapes_folder,
+                                      classified_folder=None if args.no_classify else TOPIC_CLASSIFIED_DATA_FOLDER)
+    for delta in deltas:
+        print(f"{delta['hotel_name']}: {delta['num_new_reviews']} new of {delta['num_scraped_reviews']} scraped "
+              f"reviews, appended from row {delta['first_new_row']} ({delta['seconds']:.2f}s)")
+    for file_name, error in failures.items():
+        print(f"Failed to ingest {file_name}: {error}")
@@ -0,0 +1,399 @@
+from concurrent.futures import Executor, Future
+import collections
+import contextlib
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+REPO_ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+INSTRUMENTATION_REPORTS_FOLDER = os.path.join(REPO_ROOT_PATH, 'instrumentation_reports')
+INSTRUMENTATION_ENV_VAR = 'PIPELINE_INSTRUMENTATION'
+INSTRUMENT_MODE = 'instrument'
+PROFILE_MODE = 'profile'
+HOTEL_STAGE = 'hotel'
+NULL_CONTEXT = contextlib.nullcontext()
+
+instrumentation_enabled = False
+profiling_enabled = False
+current_hotel = None
+run_start_times = None
+run_profiler = None
+worker_profile_paths = []
+
+
+def new_instrumentation_records() -> dict[str, dict]:
+    """
+    Creates empty instrumentation records.
+    :return: mapping with the 'stages' totals (stage name -> [calls, wall seconds, CPU seconds]), the 'counters' totals
+     (counter name -> value), and the stages and counters of each hotel under 'hotels'.
+    """
+
+    return {'stages': {}, 'counters': {}, 'hotels': {}}
+
+
+instrumentation_records = new_instrumentation_records()
+
+
+def enable_instrumentation(profile: bool = False) -> None:
+    """
+    Switches the instrumentation on, for this process and the processes it starts (worker processes and the scripts
+    run by the pipeline inherit it through the INSTRUMENTATION_ENV_VAR environment variable).
+    :param profile: whether to also profile the run with cProfile.
+    """
+
+    global instrumentation_enabled, profiling_enabled
+    instrumentation_enabled = True
+    profiling_enabled = profiling_enabled or profile
+    os.environ[INSTRUMENTATION_ENV_VAR] = PROFILE_MODE if profiling_enabled else INSTRUMENT_MODE
+
+
+def record_stage(stage_name: str, wall_seconds: float, cpu_seconds: float, hotel_name: str | None = None) -> None:
+    """
+    Adds a timed call of a stage to the instrumentation records.
+    :param stage_name: name of the stage.
+    :param wall_seconds: wall time of the call.
+    :param cpu_seconds: CPU time of the call (of the current process).
+    :param hotel_name: hotel the call processed, if any.
+    """
+
+    stages_records = [instrumentation_records['stages']]
+    if hotel_name is not None:
+        stages_records.append(instrumentation_records['hotels'].setdefault(
+            hotel_name, new_instrumentation_records())['stages'])
+    for stages in stages_records:
+        stage_totals = stages.setdefault(stage_name, [0, 0.0, 0.0])
+        stage_totals[0] += 1
+        stage_totals[1] += wall_seconds
+        stage_totals[2] += cpu_seconds
+
+
+class StageTimer:
+    """
+    Context manager timing a call of a stage (wall and CPU time), attributed to the current hotel if there is one.
+    """
+
+    def __init__(self, stage_name: str, hotel_name: str | None = None):
+        self.stage_name = stage_name
+        self.hotel_name = hotel_name
+        self.start_wall_time = self.start_cpu_time = 0.0
+
+    def __enter__(self):
+        self.start_wall_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.stage_name, time.perf_counter() - self.start_wall_time,
+                     time.process_time() - self.start_cpu_time, self.hotel_name or current_hotel)
+
+
+class HotelScope(StageTimer):
+    """
+    Context manager of the iteration over a single hotel: the stages timed and the counters incremented within it are
+    attributed to the hotel, and the iteration itself is timed as the HOTEL_STAGE stage.
+    """
+
+    def __init__(self, hotel_name: str):
+        super().__init__(HOTEL_STAGE, hotel_name)
+        self.outer_hotel = None
+
+    def __enter__(self):
+        global current_hotel
+        self.outer_hotel, current_hotel = current_hotel, self.hotel_name
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        global current_hotel
+        super().__exit__(*exc_info)
+        current_hotel = self.outer_hotel
+
+
+def time_stage(stage_name: str) -> contextlib.AbstractContextManager:
+    """
+    Times the enclosed block as a call of a stage. When the instrumentation is off, this is a shared no-op context.
+    :param stage_name: name of the stage, e.g. 'read_csv'.
+    :return: context manager timing the block.
+    """
+
+    return StageTimer(stage_name) if instrumentation_enabled else NULL_CONTEXT
+
+
+def instrument_hotel(hotel_name: str) -> contextlib.AbstractContextManager:
+    """
+    Attributes the stages and counters of the enclosed block to a hotel (see `HotelScope`). When the instrumentation is
+    off, this is a shared no-op context.
+    :param hotel_name: name of the hotel.
+    :return: context manager of the hotel iteration.
+    """
+
+    return HotelScope(hotel_name) if instrumentation_enabled else NULL_CONTEXT
+
+
+def count(counter_name: str, value: int = 1) -> None:
+    """
+    Increments a counter, in total and for the current hotel if there is one. Does nothing when the instrumentation is
+    off, so it is meant to be called once per batch of work (e.g. with the number of rows of a hotel), not per item.
+    :param counter_name: name of the counter, e.g. 'rows_processed'.
+    :param value: increment.
+    """
+
+    if not instrumentation_enabled:
+        return
+    counters_records = [instrumentation_records['counters']]
+    if current_hotel is not None:
+        counters_records.append(instrumentation_records['hotels'].setdefault(
+            current_hotel, new_instrumentation_records())['counters'])
+    for counters in counters_records:
+        counters[counter_name] = counters.get(counter_name, 0) + int(value)
+
+
+def count_bytes_read(file_path: str) -> None:
+    """
+    Adds the size of a file that is read to the 'bytes_read' counter (the whole file, even if only some of its columns
+    are read).
+    :param file_path: path of the file.
+    """
+
+    if instrumentation_enabled:
+        count('bytes_read', os.path.getsize(file_path))
+
+
+def merge_instrumentation_records(records: dict[str, dict], into_records: dict[str, dict] | None = None) -> None:
+    """
+    Adds instrumentation records (e.g. collected by a worker process) to other records.
+    :param records: instrumentation records to add.
+    :param into_records: records to add them to (the records of this process by default).
+    """
+
+    into_records = instrumentation_records if into_records is None else into_records
+    for stage_name, (calls, wall_seconds, cpu_seconds) in records['stages'].items():
+        stage_totals = into_records['stages'].setdefault(stage_name, [0, 0.0, 0.0])
+        stage_totals[0] += calls
+        stage_totals[1] += wall_seconds
+        stage_totals[2] += cpu_seconds
+    for counter_name, value in records['counters'].items():
+        into_records['counters'][counter_name] = into_records['counters'].get(counter_name, 0) + value
+    for hotel_name, hotel_records in records['hotels'].items():
+        merge_instrumentation_records(hotel_records, into_records['hotels'].setdefault(
+            hotel_name, new_instrumentation_records()))
+
+
+def run_instrumented_job(function: Callable, *args) -> tuple[Any, dict[str, dict], str | None]:
+    """
+    Runs a job in a worker process (the unit of work sent by `submit_job`), collecting its instrumentation records
+    apart from those of the process, and profiling it in profile mode.
+    :param function: function of the job.
+    :param args: arguments of the function.
+    :return: result of the function, the instrumentation records of the job, and the path of its profile dump (None
+     when not profiling).
+    """
+
+    global instrumentation_records
+    if run_profiler is not None:
+        # A worker forked from the profiled main process inherits its profiler.
+        run_profiler.disable()
+
+    outer_records, instrumentation_records = instrumentation_records, new_instrumentation_records()
+    profiler = cProfile.Profile() if profiling_enabled else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        result = function(*args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        job_records, instrumentation_records = instrumentation_records, outer_records
+
+    profile_path = None
+    if profiler is not None:
+        os.makedirs(INSTRUMENTATION_REPORTS_FOLDER, exist_ok=True)
+        profile_file, profile_path = tempfile.mkstemp(suffix='.prof', dir=INSTRUMENTATION_REPORTS_FOLDER)
+        os.close(profile_file)
+        profiler.dump_stats(profile_path)
+    return result, job_records, profile_path
+
+
+def submit_job(executor: Executor, function: Callable, *args) -> Future:
+    """
+    Submits a job to a process pool, through `run_instrumented_job` when the instrumentation is on. The result must be
+    read with `get_job_result`.
+    :param executor: process pool.
+    :param function: function of the job.
+    :param args: arguments of the function.
+    :return: future of the job.
+    """
+
+    if not instrumentation_enabled:
+        return executor.submit(function, *args)
+    return executor.submit(run_instrumented_job, function, *args)
+
+
+def get_job_result(future: Future) -> Any:
+    """
+    Gets the result of a job submitted by `submit_job`, merging the instrumentation records of the job into those of
+    this process.
+    :param future: future of the job.
+    :return: result of the job function.
+    """
+
+    if not instrumentation_enabled:
+        return future.result()
+    result, job_records, profile_path = future.result()
+    merge_instrumentation_records(job_records)
+    if profile_path is not None:
+        worker_profile_paths.append(profile_path)
+    return result
+
+
+def map_jobs(
+        executor: Executor,
+        function: Callable,
+        jobs_args: Iterable[tuple],
+        max_pending_jobs: int | None = None
+) -> Iterator:
+    """
+    Runs a job per arguments tuple across a process pool, as `Executor.map` does (the results are yielded in order),
+    with the instrumentation of `submit_job`. At most `max_pending_jobs` jobs are in flight at once (all the jobs are
+    submitted at once by default): a new job is submitted as the result of the oldest one is yielded, so that the
+    results waiting to be consumed do not pile up in memory.
+    :param executor: process pool.
+    :param function: function of the jobs.
+    :param jobs_args: arguments of each job.
+    :param max_pending_jobs: maximal number of submitted jobs whose results were not yielded yet (unbounded if None).
+    :return: generator of the results of the jobs.
+    """
+
+    jobs_args = iter(jobs_args)
+    pending_futures = collections.deque(
+        submit_job(executor, function, *args) for args in itertools.islice(jobs_args, max_pending_jobs))
+    while pending_futures:
+        result = get_job_result(pending_futures.popleft())
+        for args in itertools.islice(jobs_args, 1):
+            pending_futures.append(submit_job(executor, function, *args))
+        yield result
+
+
+def start_instrumented_run(instrument: bool = False, profile: bool = False) -> None:
+    """
+    Starts the instrumented run of a script (called first thing in its main block): the instrumentation is switched on
+    if asked for on the command line or inherited from the environment, and the main process is profiled in profile
+    mode.
+    :param instrument: whether the instrumentation was asked for on the command line.
+    :param profile: whether profiling was asked for on the command line.
+    """
+
+    global run_start_times, run_profiler
+    if instrument or profile:
+        enable_instrumentation(profile)
+    if not instrumentation_enabled:
+        return
+
+    run_start_times = (time.time(), time.perf_counter(), time.process_time())
+    if profiling_enabled:
+        run_profiler = cProfile.Profile()
+        run_profiler.enable()
+
+
+def get_peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """
+    Gets the peak resident set size of this process, or of its largest terminated child process.
+    :param who: resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN.
+    :return: the peak RSS, in MB.
+    """
+
+    peak_rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes on Linux.
+    return peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10
+
+
+def format_stages(stages: dict[str, list]) -> dict[str, dict[str, float]]:
+    """
+    Formats stage totals for the report, slowest stage first.
+    :param stages: mapping between each stage name and its [calls, wall seconds, CPU seconds].
+    :return: mapping between each stage name and its calls, wall seconds and CPU seconds.
+    """
+
+    return {stage_name: {'calls': calls, 'seconds': round(wall_seconds, 6), 'cpu_seconds': round(cpu_seconds, 6)}
+            for stage_name, (calls, wall_seconds, cpu_seconds)
+            in sorted(stages.items(), key=lambda item: item[1][1], reverse=True)}
+
+
+def build_instrumentation_report(script_name: str) -> dict[str, Any]:
+    """
+    Builds the report of the current run from the instrumentation records.
+    Stage CPU times of jobs run in worker processes are those of the workers, so they may add up to more than the wall
+    time of the run.
+    :param script_name: name of the instrumented script.
+    :return: the run metadata (start time, wall and CPU time, peak RSS of the main and worker processes), the totals
+     of the stages and counters, and the stages and counters of each hotel.
+    """
+
+    start_time, start_wall_time, start_cpu_time = run_start_times or (time.time(), time.perf_counter(),
+                                                                       time.process_time())
+    return {
+        'script': script_name,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start_time)),
+        'wall_seconds': round(time.perf_counter() - start_wall_time, 6),
+        'cpu_seconds': round(time.process_time() - start_cpu_time, 6),
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+        'peak_worker_rss_mb': round(get_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        'stages': format_stages(instrumentation_records['stages']),
+        'counters': dict(sorted(instrumentation_records['counters'].items())),
+        'hotels': {hotel_name: {'stages': format_stages(hotel_records['stages']),
+                                'counters': dict(sorted(hotel_records['counters'].items()))}
+                   for hotel_name, hotel_records in sorted(instrumentation_records['hotels'].items())}
+    }
+
+
+def finish_instrumented_run(script_name: str) -> str | None:
+    """
+    Finishes the instrumented run of a script (called last thing in its main block): saves the run report to
+    INSTRUMENTATION_REPORTS_FOLDER and prints its stage and counter totals. In profile mode, the profiles of the main
+    and worker processes are merged into a single cProfile dump next to the report (readable with pstats or snakeviz).
+    :param script_name: name of the instrumented script.
+    :return: path of the report (None when the instrumentation is off).
+    """
+
+    global run_profiler
+    if not instrumentation_enabled:
+        return None
+
+    report = build_instrumentation_report(script_name)
+    os.makedirs(INSTRUMENTATION_REPORTS_FOLDER, exist_ok=True)
+    report_path_prefix = os.path.join(INSTRUMENTATION_REPORTS_FOLDER,
+                                      f"{script_name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+
+    if run_profiler is not None:
+        run_profiler.disable()
+        profile_stats = pstats.Stats(run_profiler)
+        for profile_path in worker_profile_paths:
+            profile_stats.add(profile_path)
+            os.remove(profile_path)
+        worker_profile_paths.clear()
+        report['profile_path'] = f"{report_path_prefix}.prof"
+        profile_stats.dump_stats(report['profile_path'])
+        run_profiler = None
+
+    report_path = f"{report_path_prefix}.json"
+    with open(report_path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=1)
+
+    print(f"Instrumentation of {script_name}: {report['wall_seconds']:.2f}s wall, "
+          f"{report['peak_rss_mb']:.0f} MB peak RSS")
+    for stage_name, stage_totals in report['stages'].items():
+        print(f"  {stage_name:<32}{stage_totals['calls']:>8} calls{stage_totals['seconds']:>12.3f}s")
+    for counter_name, value in report['counters'].items():
+        print(f"  {counter_name:<32}{value:>14}")
+    print(f"Saved the instrumentation report to {report_path}")
+    return report_path
+
+
+if os.environ.get(INSTRUMENTATION_ENV_VAR):
+    enable_instrumentation(profile=os.environ[INSTRUMENTATION_ENV_VAR] == PROFILE_MODE)
@@ -1,17 +1,29 @@
+import argparse
 import os
+import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import hotel_name_from_file_name  # noqa: E402
+from instrumentation import (count, count_bytes_read, finish_instrumented_run, instrument_hotel,  # noqa: E402
+                             start_instrumented_run, time_stage)
+from plotting import enable_render_only, print_render_statuses, render_plots, show_or_close_figure  # noqa: E402
+from review_schema import apply_review_schema  # noqa: E402
+
 PAGERANK_REVIEWS_SCORES_FOLDER = 'pagerank_results'
 TOPICS = ['Room amenities', 'Hotel amenities', 'Staff', 'Food and beverages', 'Location']
 PAGERANK_PLOTS_FOLDER = os.path.join(os.pardir, 'plots', 'pagerank_reviews')
+TOPIC_SENTIMENT_COLUMNS = [f'{topic} - {sentiment}' for topic in TOPICS for sentiment in ('positive', 'negative')]
+SAMPLE_SIZES = (10,)
+NUM_RANDOM_ITERATIONS = 100
 
 
 def load_pagerank_results() -> list[pd.DataFrame]:
     """
-    Loads PageRank results.
+    Loads PageRank results, with the typed columns of the review schema, so that all the hotels fit in less memory.
     :return: A list of dataframes, where each dataframe is a topic-classified hotel reviews dataframe,
     in which the reviews are sorted according to their PageRank score.
     """
@@ -21,7 +33,11 @@ def load_pagerank_results() -> list[pd.DataFrame]:
     for file_name in os.listdir(PAGERANK_REVIEWS_SCORES_FOLDER):
         if file_name.endswith('.csv'):
             file_path = os.path.join(PAGERANK_REVIEWS_SCORES_FOLDER, file_name)
-            pagerank_scored_hotel_reviews_df = pd.read_csv(file_path)
+            hotel_name = hotel_name_from_file_name(file_name.removeprefix('pagerank_'))
+            with instrument_hotel(hotel_name), time_stage('read_csv'):
+                pagerank_scored_hotel_reviews_df, _ = apply_review_schema(pd.read_csv(file_path))
+                count_bytes_read(file_path)
+                count('rows_processed', len(pagerank_scored_hotel_reviews_df))
             results.append(pagerank_scored_hotel_reviews_df)
 
     return results
@@ -97,6 +113,118 @@ def calculate_indicativeness_scores(reviews_subset: pd.DataFrame) -> dict[str, f
     return sentiment_ratios
 
 
+def sample_random_index_sets(
+        rng: np.random.Generator,
+        num_reviews: int,
+        sample_size: int,
+        num_iterations: int
+) -> np.ndarray:
+    """
+    Draws random subsets of review indices without replacement, all iterations at once, using Floyd's algorithm:
+    for each j in [num_reviews - sample_size, num_reviews), a random index in [0, j] is drawn and replaced with j if it
+    was already selected. Every subset of size sample_size is equally likely, and the memory used is independent of the
+    number of reviews.
+    :param rng: seeded random generator.
+    :param num_reviews: number of reviews to sample from.
+    :param sample_size: number of reviews in each subset.
+    :param num_iterations: number of subsets to draw.
+    :return: matrix of shape (num_iterations x sample_size) with the indices of the reviews in each subset.
+    """
+
+    index_sets = np.empty((num_iterations, sample_size), dtype=np.int64)
+
+    for column, j in enumerate(range(num_reviews - sample_size, num_reviews)):
+        candidates = rng.integers(0, j + 1, size=num_iterations)
+        already_selected = (index_sets[:, :column] == candidates[:, None]).any(axis=1)
+        index_sets[:, column] = np.where(already_selected, j, candidates)
+
+    return index_sets
+
+
+def calculate_indicativeness_scores_of_subsets(topic_sentiment_flags: np.ndarray, index_sets: np.ndarray) -> np.ndarray:
+    """
+    Calculates the indicativeness scores of many subsets of the reviews of a hotel at once, as in
+    `calculate_indicativeness_scores`.
+    :param topic_sentiment_flags: int8 matrix (num_reviews x 2 * num_topics) of the TOPIC_SENTIMENT_COLUMNS of the
+     reviews.
+    :param index_sets: matrix (num_subsets x subset_size) with the indices of the reviews in each subset.
+    :return: matrix (num_subsets x num_topics) with the indicativeness score of each topic for each subset.
+    """
+
+    subset_flags = topic_sentiment_flags[index_sets]
+    positive_flags = subset_flags[:, :, 0::2]
+    negative_flags = subset_flags[:, :, 1::2]
+
+    num_positive_reviews = positive_flags.sum(axis=1, dtype=np.int32)
+    num_negative_reviews = negative_flags.sum(axis=1, dtype=np.int32)
+    num_reviews_for_topic = (positive_flags | negative_flags).sum(axis=1, dtype=np.int32)
+
+    return np.divide(num_positive_reviews - num_negative_reviews, num_reviews_for_topic,
+                     out=np.zeros(num_reviews_for_topic.shape), where=num_reviews_for_topic > 0)
+
+
+def calculate_differences_vectorized(
+        pagerank_scored_hotel_reviews_dfs: list[pd.DataFrame],
+        sample_sizes: tuple[int, ...] = SAMPLE_SIZES,
+        num_random_iterations: int = NUM_RANDOM_ITERATIONS,
+        seed: int = 0
+) -> dict[int, tuple[dict[str, np.ndarray], dict[str, np.ndarray]]]:
+    """
+    Vectorized version of `calculate_differences`, for several subset sizes: the topic columns of each hotel are
+    converted to an int8 array once, and all the random subsets are drawn as one index matrix and scored through
+    array reductions.
+    :param pagerank_scored_hotel_reviews_dfs: A list of dataframes, where each dataframe is a topic-classified
+    hotel reviews dataframe, in which the reviews are sorted according to their PageRank score.
+    :param sample_sizes: numbers of top-scored / random reviews (k) to calculate the indicativeness results with.
+    :param num_random_iterations: number of random subsets of k reviews drawn per hotel.
+    :param seed: seed of the random generator.
+    :return: mapping between each k and the differences between indicativeness results calculated over the top k
+    reviews and over random subsets of k reviews, as in `calculate_differences`.
+    """
+
+    rng = np.random.default_rng(seed)
+    hotels_topic_sentiment_flags = [df[TOPIC_SENTIMENT_COLUMNS].to_numpy(dtype=np.int8)
+                                    for df in pagerank_scored_hotel_reviews_dfs]
+    hotels_indicativeness_scores = [
+        calculate_indicativeness_scores_of_subsets(topic_sentiment_flags,
+                                                   np.arange(len(topic_sentiment_flags))[None, :])
+        for topic_sentiment_flags in hotels_topic_sentiment_flags
+    ]
+
+    differences = {}
+    for sample_size in sample_sizes:
+        differences_top_k = {topic: [] for topic in TOPICS}
+        differences_random_k = {topic: [] for topic in TOPICS}
+
+        for topic_sentiment_flags, indicativeness_scores in zip(hotels_topic_sentiment_flags,
+                                                                hotels_indicativeness_scores):
+            num_reviews = len(topic_sentiment_flags)
+            hotel_sample_size = min(sample_size, num_reviews)
+
+            # Indicativeness scores based on top k PageRank reviews (the dataframe is sorted by the scores).
+            top_k_reviews = np.arange(hotel_sample_size)[None, :]
+            top_k_differences = np.abs(
+                calculate_indicativeness_scores_of_subsets(topic_sentiment_flags, top_k_reviews)
+                - indicativeness_scores)
+
+            # Indicativeness scores based on random subsets of k reviews.
+            random_k_reviews = sample_random_index_sets(rng, num_reviews, hotel_sample_size, num_random_iterations)
+            random_k_differences = np.abs(
+                calculate_indicativeness_scores_of_subsets(topic_sentiment_flags, random_k_reviews)
+                - indicativeness_scores)
+
+            for topic_index, topic in enumerate(TOPICS):
+                differences_top_k[topic].append(top_k_differences[:, topic_index])
+                differences_random_k[topic].append(random_k_differences[:, topic_index])
+
+        differences[sample_size] = (
+            {topic: np.concatenate(topic_differences) for topic, topic_differences in differences_top_k.items()},
+            {topic: np.concatenate(topic_differences) for topic, topic_differences in differences_random_k.items()}
+        )
+
+    return differences
+
+
 def plot_differences(differences_top_10: dict[str, list[float]], differences_random_10: dict[str, list[float]]) -> None:
     """
     Plots the average estimation error of the indicativeness scores.
@@ -141,10 +269,44 @@ def plot_differences(differences_top_10: dict[str, list[float]], differences_ran
     plt.tight_layout()
 
     plt.savefig(os.path.join(PAGERANK_PLOTS_FOLDER, 'estimation_error_of_topic_indicativeness_scores.png'))
-    plt.show()
+    show_or_close_figure()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluates the PageRank-selected reviews against random reviews.')
+    parser.add_argument('--sample-sizes', type=int, nargs='+', default=list(SAMPLE_SIZES),
+                        help='numbers of top-scored / random reviews to estimate the indicativeness scores with (the '
+                             'plot is of 10 reviews, which is always evaluated)')
+    parser.add_argument('--random-iterations', type=int, default=NUM_RANDOM_ITERATIONS,
+                        help='number of random subsets of reviews drawn per hotel and sample size')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    parser.add_argument('--render-only', action='store_true',
+                        help='render the plot headless, skipping it if its data is unchanged')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time the stages of each hotel, count the rows and bytes read, and save a run report')
+    parser.add_argument('--profile', action='store_true', help='instrument the run and also dump a cProfile profile')
+    args = parser.parse_args()
+    start_instrumented_run(args.instrument, args.profile)
+    if args.render_only:
+        enable_render_only()
+
     pagerank_scored_hotel_reviews_df: list[pd.DataFrame] = load_pagerank_results()
-    differences_top_10, differences_random_10 = calculate_differences(pagerank_scored_hotel_reviews_df)
-    plot_differences(differences_top_10, differences_random_10)
+    with time_stage('calculate_differences'):
+        differences_per_sample_size = calculate_differences_vectorized(
+            pagerank_scored_hotel_reviews_df, tuple(sorted(set(args.sample_sizes) | {10})), args.random_iterations,
+            args.seed)
+    for sample_size, (differences_top_k, differences_random_k) in differences_per_sample_size.items():
+        for topic in TOPICS:
+            print(f"k={sample_size}, {topic}: "
+                  f"top-k error {np.mean(differences_top_k[topic]):.3f} +- {np.std(differences_top_k[topic]):.3f}, "
+                  f"random-k error {np.mean(differences_random_k[topic]):.3f} "
+                  f"+- {np.std(differences_random_k[topic]):.3f}")
+
+    differences_top_10, differences_random_10 = differences_per_sample_size[10]
+    with time_stage('plotting'):
+        if args.render_only:
+            print_render_statuses(render_plots([('estimation_error_of_topic_indicativeness_scores', plot_differences,
+                                                 (differences_top_10, differences_random_10))]))
+        else:
+            plot_differences(differences_top_10, differences_random_10)
+    finish_instrumented_run('evaluate_pagerank_results')
@@ -1,13 +1,26 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fnmatch
+import hashlib
 import os
+import sys
+import time
 
 import networkx as nx
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from scipy.spatial.distance import pdist, squareform
 from sklearn.preprocessing import normalize
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import hotel_name_from_file_name  # noqa: E402
+from instrumentation import (count, count_bytes_read, finish_instrumented_run, get_job_result,  # noqa: E402
+                             instrument_hotel, start_instrumented_run, submit_job, time_stage)
+
 TOPIC_CLASSIFIED_DATA_FOLDER = os.path.join(os.pardir, 'data_topic_classified')
 PAGERANK_REVIEWS_SCORES_FOLDER = 'pagerank_results'
+PAGERANK_STATE_FOLDER = 'pagerank_state'
 TOPICS_COLUMNS = [
     'Room amenities - positive', 'Room amenities - negative',
     'Hotel amenities - positive', 'Hotel amenities - negative',
@@ -16,6 +29,12 @@ TOPICS_COLUMNS = [
     'Location - positive', 'Location - negative'
 ]
 PAGERANK_SCORE_COLUMN_NAME = 'PageRank Score'
+NUM_SIGNATURES = 2 ** len(TOPICS_COLUMNS)
+USE_SPARSE_REVIEWS_GRAPH = True
+COLLAPSE_REVIEW_SIGNATURES = True
+PAGERANK_DAMPING_FACTOR = 0.85
+PAGERANK_TOLERANCE = 1e-06
+PAGERANK_MAX_ITERATIONS = 100
 
 
 def extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df: pd.DataFrame) -> np.ndarray:
@@ -50,9 +69,282 @@ def build_reviews_graph(reviews_similarity_matrix: np.ndarray) -> nx.Graph:
             if reviews_similarity_matrix[i, j] > 0:  # Only add edges with positive similarity
                 G.add_edge(i, j, weight=reviews_similarity_matrix[i, j])
 
+    count('edges_created', G.number_of_edges())
     return G
 
 
+def build_sparse_reviews_graph(normalized_topic_matrix: np.ndarray) -> sparse.csr_matrix:
+    """
+    Builds the reviews graph of `build_reviews_graph` directly as a sparse adjacency matrix, without materializing the
+    dense similarity matrix or a networkx graph.
+    Since the (topic, sentiment) vectors are already L2-normalized, the cosine similarity between two reviews is their
+    dot product, so the weights of all edges are obtained from a single sparse product of the matrix with itself.
+    Reviews that share no (topic, sentiment) pair have a zero product and therefore no edge, and self-loops are removed.
+    :param normalized_topic_matrix: Normalised (topic, sentiment) matrix with vector for the reviews.
+    :return: Symmetric adjacency matrix (num_reviews x num_reviews) in CSR format, with the edge weights as values.
+    """
+
+    topic_sentiment_vectors = sparse.csr_matrix(normalized_topic_matrix)
+    adjacency = (topic_sentiment_vectors @ topic_sentiment_vectors.T).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    count('edges_created', adjacency.nnz // 2)
+    return adjacency
+
+
+def extract_topic_sentiment_signatures(hotel_reviews_df: pd.DataFrame) -> np.ndarray:
+    """
+    Encodes the 0/1 (topic, sentiment) vector of each review as an integer signature, where bit k is set iff the review
+    discusses the k-th (topic, sentiment) pair of TOPICS_COLUMNS.
+    :param hotel_reviews_df: Topic-classified reviews data file of a single hotel.
+    :return: Signature of each review, in range [0, 2 ** len(TOPICS_COLUMNS)).
+    """
+
+    topic_sentiment_flags = hotel_reviews_df[TOPICS_COLUMNS].values > 0
+    return topic_sentiment_flags.astype(np.int64) @ (1 << np.arange(len(TOPICS_COLUMNS)))
+
+
+def signatures_to_normalized_vectors(signatures: np.ndarray) -> np.ndarray:
+    """
+    Decodes signatures back into normalised (topic, sentiment) vectors, as returned by
+    `extract_topic_sentiment_vectors_for_single_hotel`.
+    :param signatures: Integer signatures of reviews.
+    :return: Normalised (topic, sentiment) matrix with vector for each signature.
+    """
+
+    topic_sentiment_matrix = (np.asarray(signatures)[:, None] >> np.arange(len(TOPICS_COLUMNS))) & 1
+    return normalize(topic_sentiment_matrix.astype(float), norm='l2')
+
+
+def build_collapsed_reviews_graph(unique_signatures: np.ndarray, signature_counts: np.ndarray) -> sparse.csr_matrix:
+    """
+    Builds the reviews graph over the unique signatures of a hotel instead of over its individual reviews.
+    All the reviews sharing a signature have the same PageRank score, so the graph of `build_sparse_reviews_graph` can
+    be collapsed into a directed graph whose node s stands for the m_s reviews with signature s: the edge s -> t
+    carries the total weight sent from one review of s to all the reviews of t, i.e. similarity(s, t) * m_t, except
+    for t == s, where a review is not connected to itself and only its m_s - 1 duplicates are counted.
+    :param unique_signatures: The distinct signatures of the hotel reviews.
+    :param signature_counts: Number of reviews with each signature (multiplicity).
+    :return: Weighted adjacency matrix (num_signatures x num_signatures) of the collapsed graph, in CSR format.
+    """
+
+    normalized_vectors = signatures_to_normalized_vectors(unique_signatures)
+    similarity_matrix = normalized_vectors @ normalized_vectors.T
+    multiplicity_matrix = np.broadcast_to(signature_counts, similarity_matrix.shape) - np.eye(len(unique_signatures))
+    collapsed_graph = sparse.csr_matrix(similarity_matrix * multiplicity_matrix)
+    count('signature_edges_created', collapsed_graph.nnz)
+    return collapsed_graph
+
+
+def calculate_signature_pagerank_scores(
+        signature_counts: np.ndarray,
+        **pagerank_kwargs
+) -> tuple[np.ndarray, dict[str, float]]:
+    """
+    Solves PageRank on the collapsed graph of the signatures present in a hotel (see `build_collapsed_reviews_graph`).
+    The collapsed iteration tracks the total score of each group of reviews: it teleports to (and redistributes
+    dangling mass over) each group in proportion to its size and uses the same convergence threshold as the full graph,
+    so it reproduces the scores of `pagerank_power_iteration` on the full reviews graph.
+    :param signature_counts: Number of reviews with each signature, indexed by signature (length NUM_SIGNATURES).
+    :param pagerank_kwargs: Keyword arguments of `pagerank_power_iteration` (damping_factor, tolerance, ...).
+     Note that initial_scores, if given, are indexed by signature as well.
+    :return: Total PageRank score of the reviews with each signature, indexed by signature, and the convergence stats.
+    """
+
+    signature_scores = np.zeros(NUM_SIGNATURES)
+    unique_signatures = np.flatnonzero(signature_counts)
+    num_reviews = signature_counts.sum()
+    if num_reviews == 0:
+        return signature_scores, {'iterations': 0, 'residual': 0.0, 'converged': True}
+
+    # The full graph stops at num_reviews * tolerance, the collapsed one at num_signatures * tolerance.
+    tolerance = pagerank_kwargs.pop('tolerance', PAGERANK_TOLERANCE) * num_reviews / len(unique_signatures)
+
+    initial_scores = pagerank_kwargs.pop('initial_scores', None)
+    initial_scores = signature_counts if initial_scores is None else initial_scores
+
+    collapsed_graph = build_collapsed_reviews_graph(unique_signatures, signature_counts[unique_signatures])
+    signature_scores[unique_signatures], convergence_stats = pagerank_power_iteration(
+        collapsed_graph, tolerance=tolerance, personalization=signature_counts[unique_signatures],
+        initial_scores=initial_scores[unique_signatures], **pagerank_kwargs)
+
+    return signature_scores, convergence_stats
+
+
+def calculate_pagerank_scores_by_signature(
+        hotel_reviews_df: pd.DataFrame,
+        **pagerank_kwargs
+) -> tuple[np.ndarray, dict[str, float]]:
+    """
+    Calculates the PageRank scores of the reviews of a hotel by grouping reviews with identical (topic, sentiment)
+    signatures, solving PageRank on the collapsed graph of the unique signatures, and expanding the scores back to the
+    individual reviews. The result matches the scores of `pagerank_power_iteration` on the full reviews graph.
+    :param hotel_reviews_df: Topic-classified reviews data file of a single hotel.
+    :param pagerank_kwargs: Keyword arguments of `pagerank_power_iteration` (damping_factor, tolerance, ...).
+    :return: PageRank score of each review, and the convergence stats of the run.
+    """
+
+    signatures = extract_topic_sentiment_signatures(hotel_reviews_df)
+    signature_counts = np.bincount(signatures, minlength=NUM_SIGNATURES)
+    signature_scores, convergence_stats = calculate_signature_pagerank_scores(signature_counts, **pagerank_kwargs)
+    return score_reviews_by_signature(signature_scores, signature_counts, signatures), convergence_stats
+
+
+def score_reviews_by_signature(
+        signature_scores: np.ndarray,
+        signature_counts: np.ndarray,
+        signatures: np.ndarray
+) -> np.ndarray:
+    """
+    Expands the total PageRank score of each signature back to the individual reviews with that signature.
+    :param signature_scores: Total PageRank score of the reviews with each signature, indexed by signature.
+    :param signature_counts: Number of reviews with each signature, indexed by signature.
+    :param signatures: Signature of each review to score.
+    :return: PageRank score of each review.
+    """
+
+    per_review_scores = np.divide(signature_scores, signature_counts,
+                                  out=np.zeros(NUM_SIGNATURES), where=signature_counts > 0)
+    return per_review_scores[signatures]
+
+
+def refresh_pagerank_state(
+        pagerank_state: dict[str, np.ndarray] | None,
+        new_reviews_df: pd.DataFrame,
+        **pagerank_kwargs
+) -> tuple[dict[str, np.ndarray], dict[str, float]]:
+    """
+    Incrementally updates the PageRank state of a hotel with newly appended reviews: only the new reviews are encoded
+    and added to the stored signature counts, and the iteration on the collapsed graph is warm-started from the
+    stored signature scores, so a small delta costs a few iterations over at most NUM_SIGNATURES nodes.
+    A warm start is already close to the fixed point, so the full graph's threshold (num_reviews * tolerance on the L1
+    change) would stop it after the first iteration, and the errors would build up over the refreshes: the threshold
+    is tightened to the tolerance itself.
+    :param pagerank_state: The previous PageRank state of the hotel (as returned by this function or
+     `load_pagerank_state`), or None to start from an empty hotel.
+    :param new_reviews_df: Topic-classified reviews appended to the hotel data file since the previous state.
+    :param pagerank_kwargs: Keyword arguments of `pagerank_power_iteration` (damping_factor, tolerance, ...).
+    :return: The updated PageRank state, and the convergence stats of the run.
+    """
+
+    if pagerank_state is None:
+        pagerank_state = {'signature_counts': np.zeros(NUM_SIGNATURES, dtype=np.int64),
+                          'signature_scores': np.zeros(NUM_SIGNATURES)}
+
+    new_signatures = extract_topic_sentiment_signatures(new_reviews_df)
+    signature_counts = pagerank_state['signature_counts'] + np.bincount(new_signatures, minlength=NUM_SIGNATURES)
+
+    # Warm start: keep the previous total score of each known signature, and give new signatures their uniform share.
+    previous_scores = pagerank_state['signature_scores']
+    initial_scores = np.where(previous_scores > 0, previous_scores, signature_counts / max(signature_counts.sum(), 1))
+
+    # `calculate_signature_pagerank_scores` scales the tolerance by the number of reviews.
+    tolerance = pagerank_kwargs.pop('tolerance', PAGERANK_TOLERANCE) / max(signature_counts.sum(), 1)
+    signature_scores, convergence_stats = calculate_signature_pagerank_scores(
+        signature_counts, initial_scores=initial_scores, tolerance=tolerance, **pagerank_kwargs)
+    return {'signature_counts': signature_counts, 'signature_scores': signature_scores}, convergence_stats
+
+
+def fingerprint_signatures(signatures: np.ndarray) -> str:
+    """
+    Fingerprints the signatures of a sequence of reviews, to check that the reviews a stored PageRank state was built
+    from are still the first rows of the hotel data file.
+    :param signatures: Signature of each review, in data file order.
+    :return: hex digest of the signatures.
+    """
+
+    return hashlib.sha256(np.ascontiguousarray(signatures, dtype=np.int64).tobytes()).hexdigest()
+
+
+def load_pagerank_state(state_file_path: str) -> dict[str, np.ndarray] | None:
+    """
+    Loads the stored PageRank state of a hotel.
+    :param state_file_path: path of the .npz state file.
+    :return: signature counts, signature scores and fingerprint of the reviews of the hotel (see
+     `fingerprint_signatures`), or None if there is no stored state (or it was stored without a fingerprint).
+    """
+
+    if not os.path.exists(state_file_path):
+        return None
+
+    with np.load(state_file_path) as state_file:
+        if 'reviews_fingerprint' not in state_file:
+            return None
+        return {'signature_counts': state_file['signature_counts'], 'signature_scores': state_file['signature_scores'],
+                'reviews_fingerprint': str(state_file['reviews_fingerprint'])}
+
+
+def save_pagerank_state(pagerank_state: dict[str, np.ndarray], state_file_path: str) -> None:
+    """
+    Saves the PageRank state of a hotel.
+    :param pagerank_state: signature counts, signature scores and fingerprint of the reviews of the hotel.
+    :param state_file_path: path of the .npz state file.
+    """
+
+    np.savez(state_file_path, **pagerank_state)
+
+
+def pagerank_power_iteration(
+        adjacency: sparse.spmatrix,
+        damping_factor: float = PAGERANK_DAMPING_FACTOR,
+        tolerance: float = PAGERANK_TOLERANCE,
+        max_iterations: int = PAGERANK_MAX_ITERATIONS,
+        initial_scores: np.ndarray | None = None,
+        personalization: np.ndarray | None = None
+) -> tuple[np.ndarray, dict[str, float]]:
+    """
+    Runs the PageRank algorithm by power iteration over the row-normalised transition matrix of the given graph.
+    The iteration follows `nx.pagerank`: the teleport and dangling-node mass are distributed according to the
+    personalization vector (uniform by default), and it stops once the L1 change of the scores is below
+    num_nodes * tolerance.
+    :param adjacency: Weighted adjacency matrix of the graph, where entry (i, j) is the weight of the edge i -> j.
+    :param damping_factor: Damping parameter of PageRank.
+    :param tolerance: Error tolerance used to check convergence.
+    :param max_iterations: Maximum number of power iterations.
+    :param initial_scores: Starting scores of the iteration (e.g. the scores of a previous run); uniform if not given.
+    :param personalization: Teleport distribution over the nodes; uniform if not given.
+    :return: PageRank score of each node (summing to 1), and the convergence stats of the run:
+     number of iterations, final residual (L1 change of the last iteration) and whether it converged.
+    """
+
+    num_nodes = adjacency.shape[0]
+    if num_nodes == 0:
+        return np.empty(0), {'iterations': 0, 'residual': 0.0, 'converged': True}
+
+    adjacency = sparse.csr_matrix(adjacency, dtype=float)
+    out_degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    is_dangling = out_degrees == 0
+    inverse_out_degrees = np.divide(1.0, out_degrees, out=np.zeros(num_nodes), where=~is_dangling)
+
+    # Transposed transition matrix, so that each iteration is a single CSR matrix-vector product.
+    transition_transposed = (sparse.diags(inverse_out_degrees) @ adjacency).T.tocsr()
+
+    if personalization is None:
+        teleport = np.full(num_nodes, 1.0 / num_nodes)
+    else:
+        teleport = np.asarray(personalization, dtype=float) / np.sum(personalization)
+
+    if initial_scores is None:
+        scores = np.full(num_nodes, 1.0 / num_nodes)
+    else:
+        scores = np.asarray(initial_scores, dtype=float) / np.sum(initial_scores)
+
+    residual = float('inf')
+    for iteration in range(1, max_iterations + 1):
+        previous_scores = scores
+        dangling_mass = previous_scores[is_dangling].sum()
+        scores = (damping_factor * (transition_transposed @ previous_scores + dangling_mass * teleport)
+                  + (1 - damping_factor) * teleport)
+
+        residual = float(np.abs(scores - previous_scores).sum())
+        if residual < num_nodes * tolerance:
+            count('pagerank_iterations', iteration)
+            return scores, {'iterations': iteration, 'residual': residual, 'converged': True}
+
+    count('pagerank_iterations', max_iterations)
+    raise nx.PowerIterationFailedConvergence(max_iterations)
+
+
 def save_scores(hotel_reviews_df: pd.DataFrame, pagerank_scores: dict[int, float], output_file_path: str) -> None:
     """
     Saves a dataframe of the reviews sorted by the PageRank scores, with an additional column with the scores.
@@ -67,25 +359,167 @@ def save_scores(hotel_reviews_df: pd.DataFrame, pagerank_scores: dict[int, float
     print(f"Saved sorted PageRank results to {output_file_path}")
 
 
-if __name__ == '__main__':
-    if not os.path.exists(PAGERANK_REVIEWS_SCORES_FOLDER):
-        os.makedirs(PAGERANK_REVIEWS_SCORES_FOLDER)
+def calculate_pagerank_scores(hotel_reviews_df: pd.DataFrame) -> tuple[dict[int, float], dict[str, float]]:
+    """
+    Calculates the PageRank scores of the reviews of a single hotel, using the graph construction mode selected by
+    COLLAPSE_REVIEW_SIGNATURES and USE_SPARSE_REVIEWS_GRAPH.
+    :param hotel_reviews_df: Topic-classified reviews data file of a single hotel.
+    :return: mapping between each review index and its PageRank score, and the convergence stats of the run
+     (empty for the networkx mode).
+    """
+
+    if COLLAPSE_REVIEW_SIGNATURES:
+        # Run the PageRank algorithm on the graph of the unique (topic, sentiment) signatures.
+        scores, convergence_stats = calculate_pagerank_scores_by_signature(hotel_reviews_df)
+        return dict(enumerate(scores.tolist())), convergence_stats
+
+    # Extract (topic, sentiment) vectors for this hotel.
+    normalized_topic_matrix = extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df)
+
+    if USE_SPARSE_REVIEWS_GRAPH:
+        # Build the graph straight from the sparse product of the vectors (same edges and weights),
+        # and run the PageRank algorithm on its CSR adjacency matrix.
+        adjacency = build_sparse_reviews_graph(normalized_topic_matrix)
+        scores, convergence_stats = pagerank_power_iteration(adjacency)
+        return dict(enumerate(scores.tolist())), convergence_stats
+
+    # Calculate the similarity between reviews (weights for the edges in the graph) using these vectors.
+    similarity_matrix = (1 - squareform(pdist(normalized_topic_matrix, 'cosine')))
+
+    # Initialize the graph and run the PageRank algorithm.
+    G = build_reviews_graph(similarity_matrix)
+    return nx.pagerank(G, weight='weight'), {}
+
+
+def rank_hotel_reviews_file(
+        file_name: str,
+        input_folder: str,
+        output_folder: str,
+        state_folder: str | None = None
+) -> dict[str, float]:
+    """
+    Runs the PageRank algorithm on the reviews of a single hotel and saves the scored reviews to the output folder.
+    :param file_name: name of the topic-classified reviews data file of the hotel.
+    :param input_folder: path to folder of topic-classified hotel data files.
+    :param output_folder: path to folder of PageRank results.
+    :param state_folder: path to folder of incremental PageRank states. If given, only the reviews appended to the data
+     file since the stored state of the hotel are applied (see `refresh_pagerank_state`), and the state is updated.
+    :return: timing and convergence stats of the hotel.
+    """
 
-    for file_name in os.listdir(TOPIC_CLASSIFIED_DATA_FOLDER):
-        if file_name.endswith('.csv'):
-            file_path = os.path.join(TOPIC_CLASSIFIED_DATA_FOLDER, file_name)
-            hotel_reviews_df = pd.read_csv(file_path)
+    start_time = time.perf_counter()
+    with instrument_hotel(hotel_name_from_file_name(file_name)):
+        with time_stage('read_csv'):
+            hotel_reviews_df = pd.read_csv(os.path.join(input_folder, file_name))
+        count_bytes_read(os.path.join(input_folder, file_name))
+        count('rows_processed', len(hotel_reviews_df))
 
-            # Extract (topic, sentiment) vectors for this hotel.
-            normalized_topic_matrix = extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df)
+        if state_folder is None:
+            with time_stage('pagerank'):
+                pagerank_scores, convergence_stats = calculate_pagerank_scores(hotel_reviews_df)
+        else:
+            state_file_path = os.path.join(state_folder, f"pagerank_state_{os.path.splitext(file_name)[0]}.npz")
+            signatures = extract_topic_sentiment_signatures(hotel_reviews_df)
+            pagerank_state = load_pagerank_state(state_file_path)
+            num_known_reviews = 0 if pagerank_state is None else int(pagerank_state['signature_counts'].sum())
+            if pagerank_state is not None and (
+                    num_known_reviews > len(hotel_reviews_df) or pagerank_state['reviews_fingerprint']
+                    != fingerprint_signatures(signatures[:num_known_reviews])):
+                # The data file was rewritten rather than appended to, so the stored state is stale: recompute it.
+                pagerank_state, num_known_reviews = None, 0
 
-            # Calculate the similarity between reviews (weights for the edges in the graph) using these vectors.
-            similarity_matrix = (1 - squareform(pdist(normalized_topic_matrix, 'cosine')))
+            with time_stage('pagerank'):
+                pagerank_state, convergence_stats = refresh_pagerank_state(
+                    pagerank_state, hotel_reviews_df.iloc[num_known_reviews:])
+            pagerank_state['reviews_fingerprint'] = fingerprint_signatures(signatures)
+            os.makedirs(state_folder, exist_ok=True)
+            save_pagerank_state(pagerank_state, state_file_path)
 
-            # Initialize the graph and run the PageRank algorithm.
-            G = build_reviews_graph(similarity_matrix)
-            pagerank_scores = nx.pagerank(G, weight='weight')
+            scores = score_reviews_by_signature(pagerank_state['signature_scores'], pagerank_state['signature_counts'],
+                                                signatures)
+            pagerank_scores = dict(enumerate(scores.tolist()))
+            convergence_stats['new_reviews'] = len(hotel_reviews_df) - num_known_reviews
 
-            # Save PageRank results to output folder.
-            output_file_path = os.path.join(PAGERANK_REVIEWS_SCORES_FOLDER, f"pagerank_{file_name}")
+        # Save PageRank results to output folder.
+        output_file_path = os.path.join(output_folder, f"pagerank_{file_name}")
+        with time_stage('save_scores'):
             save_scores(hotel_reviews_df, pagerank_scores, output_file_path)
+
+        return {'num_reviews': len(hotel_reviews_df), 'seconds': time.perf_counter() - start_time, **convergence_stats}
+
+
+def run_pagerank_batch(
+        input_folder: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        output_folder: str = PAGERANK_REVIEWS_SCORES_FOLDER,
+        num_workers: int | None = None,
+        hotel_filter: str = '*.csv',
+        state_folder: str | None = None
+) -> tuple[dict[str, dict[str, float]], dict[str, str]]:
+    """
+    Runs the PageRank algorithm on all the hotels of the input folder, spread across a pool of worker processes.
+    Hotels are submitted largest file first, so that the longest jobs do not end up running alone at the end.
+    A failing hotel is reported and skipped without aborting the rest of the batch.
+    :param input_folder: path to folder of topic-classified hotel data files.
+    :param output_folder: path to folder of PageRank results.
+    :param num_workers: number of worker processes (defaults to the number of CPUs).
+    :param hotel_filter: glob pattern that the data file names of the hotels to rank must match.
+    :param state_folder: path to folder of incremental PageRank states, to only apply newly appended reviews.
+    :return: mapping between each ranked file and its timing and convergence stats;
+     and mapping between each failed file and its error message.
+    """
+
+    for folder in (output_folder, state_folder):
+        if folder is not None and not os.path.exists(folder):
+            os.makedirs(folder)
+
+    file_names = [
+        file_name for file_name in os.listdir(input_folder)
+        if file_name.endswith('.csv') and fnmatch.fnmatch(file_name, hotel_filter)
+    ]
+    file_names.sort(key=lambda file_name: os.path.getsize(os.path.join(input_folder, file_name)), reverse=True)
+
+    hotel_stats = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            submit_job(executor, rank_hotel_reviews_file, file_name, input_folder, output_folder,
+                       state_folder): file_name
+            for file_name in file_names
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                hotel_stats[file_name] = stats = get_job_result(future)
+                print(f"{file_name}: ranked {stats['num_reviews']} reviews in {stats['seconds']:.2f}s")
+            except Exception as e:
+                failures[file_name] = f"{type(e).__name__}: {e}"
+                print(f"{file_name}: FAILED ({failures[file_name]})")
+
+    return hotel_stats, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scores the reviews of each hotel with the PageRank algorithm.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--hotels', default='*.csv',
+                        help="glob pattern of the hotel data files to rank, e.g. 'processed_reviews_Generator_*'")
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'only apply the reviews appended since the last run, using the states in '
+                             f'{PAGERANK_STATE_FOLDER}/')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time the stages of each hotel, count the rows, edges, PageRank iterations and bytes '
+                             'read, and save a run report')
+    parser.add_argument('--profile', action='store_true',
+                        help='instrument the run and also dump a cProfile profile of the main and worker processes')
+    args = parser.parse_args()
+    start_instrumented_run(args.instrument, args.profile)
+
+    batch_start_time = time.perf_counter()
+    hotel_stats, failures = run_pagerank_batch(num_workers=args.workers, hotel_filter=args.hotels,
+                                               state_folder=PAGERANK_STATE_FOLDER if args.incremental else None)
+    print(f"Ranked {len(hotel_stats)} hotels in {time.perf_counter() - batch_start_time:.2f}s, "
+          f"{len(failures)} failed")
+    finish_instrumented_run('pagerank_reviews_graph')
+    for file_name, error in failures.items():
+        print(f"  {file_name}: {error}")
@@ -0,0 +1,553 @@
+import argparse
+import ast
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable
+
+from corpus_store import DATA_FOLDER_PATH, REPO_ROOT_PATH, TOPIC_CLASSIFIED_DATA_FOLDER, hotel_name_from_file_name
+from hotel_metadata import HOTEL_LOCATIONS_PATH
+from ingest_scrapes import SCRAPES_FOLDER_PATH
+from plotting import RENDER_ONLY_ENV_VAR
+
+sys.path.append(os.path.join(REPO_ROOT_PATH, 'topic_classification'))
+sys.path.append(os.path.join(REPO_ROOT_PATH, 'pagerank_reviews'))
+sys.path.append(os.path.join(REPO_ROOT_PATH, 'recommendation'))
+from classify_reviews_topics import (CLASSIFIED_FILE_PREFIX, TOPIC_CLASSIFIER_PATH,  # noqa: E402
+                                     classify_hotel_reviews_file, save_topic_classifier, train_topic_classifier)
+from pagerank_reviews_graph import (PAGERANK_REVIEWS_SCORES_FOLDER, PAGERANK_STATE_FOLDER,  # noqa: E402
+                                    rank_hotel_reviews_file)
+from ranking_service import RANKING_CATALOG_PATH  # noqa: E402
+
+PIPELINE_CACHE_FOLDER = os.path.join(REPO_ROOT_PATH, 'pipeline_cache')
+PIPELINE_MANIFEST_PATH = os.path.join(PIPELINE_CACHE_FOLDER, 'manifest.json')
+PIPELINE_LOGS_FOLDER = os.path.join(PIPELINE_CACHE_FOLDER, 'logs')
+INDICATIVENESS_FOLDER = os.path.join(REPO_ROOT_PATH, 'topic_indicativeness_scores')
+PAGERANK_FOLDER = os.path.join(REPO_ROOT_PATH, 'pagerank_reviews')
+PAGERANK_RESULTS_FOLDER = os.path.join(PAGERANK_FOLDER, PAGERANK_REVIEWS_SCORES_FOLDER)
+PAGERANK_STATES_FOLDER = os.path.join(PAGERANK_FOLDER, PAGERANK_STATE_FOLDER)
+INDICATIVENESS_RESULTS_PATH = os.path.join(INDICATIVENESS_FOLDER, 'results', 'result.csv')
+RECOMMENDATION_FOLDER = os.path.join(REPO_ROOT_PATH, 'recommendation')
+HASH_BLOCK_SIZE = 2 ** 20
+# Folders the scripts add to their import path, besides their own folder and the repository root.
+CODE_FOLDERS = ['topic_classification', 'pagerank_reviews', 'topic_indicativeness_scores', 'recommendation']
+KEPT_OUTPUT_PREFIX = 'kept:'
+
+
+def classified_file_name(file_name: str) -> str:
+    """
+    Gets the name of the topic-classified data file of a raw hotel data file.
+    :param file_name: name of the raw hotel data file, e.g. 'reviews_Hotel_Boss.csv'.
+    :return: name of the topic-classified data file, e.g. 'processed_reviews_Hotel_Boss.csv'.
+    """
+
+    return f"{CLASSIFIED_FILE_PREFIX}{hotel_name_from_file_name(file_name)}.csv"
+
+
+def pagerank_file_name(file_name: str) -> str:
+    """
+    Gets the name of the PageRank results file of a topic-classified hotel data file.
+    :param file_name: name of the topic-classified hotel data file.
+    :return: name of the PageRank results file.
+    """
+
+    return f"pagerank_{file_name}"
+
+
+def ensure_topic_classifier() -> None:
+    """
+    Trains and saves the topic classifier, if it was not trained yet.
+    """
+
+    if not os.path.exists(TOPIC_CLASSIFIER_PATH):
+        classifier, _ = train_topic_classifier()
+        save_topic_classifier(classifier)
+
+
+def get_pipeline_stages(reference_date: str | None = None) -> dict[str, dict[str, Any]]:
+    """
+    Declares the stages of the pipeline, from the scraped files to the catalog of the ranking service (the interactive
+    reranker is left out, as it waits for a user) and the PageRank evaluation. Each stage
+    lists the stages it depends on, the code files and inputs it is fingerprinted with (the code files are fingerprinted
+    with all the repository modules they import, see `find_code_dependencies`), and either:
+    - a per-file function ('item_function'), called once per data file of 'input_folder', which writes the file
+      'output_file_name' into 'output_folder'. Only the files whose fingerprint changed are processed again. With
+      'keep_existing_outputs', the output files the pipeline did not write are never overwritten: the function is
+      called with extend_existing_output=True, to only process the rows appended to the data file since.
+    - a script ('command', with 'args'), run from its own folder ('cwd'), which writes the 'outputs'.
+    :param reference_date: date the time-aware sentiment ratios are calculated at (the latest review date by default).
+    :return: mapping between each stage name and its declaration.
+    """
+
+    indicativeness_args = ['--render-only', '--workers', '1']
+    if reference_date is not None:
+        indicativeness_args.extend(['--reference-date', reference_date])
+
+    return {
+        'ingest': {
+            'depends_on': [],
+            'code': ['ingest_scrapes.py'],
+            'inputs': [SCRAPES_FOLDER_PATH],
+            'cwd': REPO_ROOT_PATH,
+            'command': 'ingest_scrapes.py',
+            # The classify stage classifies the appended reviews, as it does for any changed data file.
+            'args': ['--no-classify'],
+            # The appended data files are the inputs of the classify stage.
+            'outputs': []
+        },
+        'classify': {
+            'depends_on': ['ingest'],
+            'code': ['topic_classification/classify_reviews_topics.py'],
+            'setup': ensure_topic_classifier,
+            'inputs': [TOPIC_CLASSIFIER_PATH],
+            'input_folder': DATA_FOLDER_PATH,
+            'output_folder': TOPIC_CLASSIFIED_DATA_FOLDER,
+            'output_file_name': classified_file_name,
+            'item_function': classify_hotel_reviews_file,
+            'item_args': (TOPIC_CLASSIFIER_PATH,),
+            # Topic-classified files the pipeline did not write are the labelled files: only extend them.
+            'keep_existing_outputs': True
+        },
+        'indicativeness': {
+            'depends_on': ['classify'],
+            'code': ['topic_indicativeness_scores/indicativeness_results.py'],
+            'inputs': [TOPIC_CLASSIFIED_DATA_FOLDER],
+            'cwd': INDICATIVENESS_FOLDER,
+            'command': 'indicativeness_results.py',
+            'args': indicativeness_args,
+            'outputs': [INDICATIVENESS_RESULTS_PATH]
+        },
+        'rank': {
+            'depends_on': ['indicativeness'],
+            'code': ['recommendation/ranking_service.py'],
+            'inputs': [INDICATIVENESS_RESULTS_PATH, TOPIC_CLASSIFIED_DATA_FOLDER, HOTEL_LOCATIONS_PATH],
+            'cwd': RECOMMENDATION_FOLDER,
+            'command': 'ranking_service.py',
+            'args': ['--build-catalog', '--sentiment-data', INDICATIVENESS_RESULTS_PATH,
+                     '--hotel-metadata-folder', TOPIC_CLASSIFIED_DATA_FOLDER, '--catalog-path', RANKING_CATALOG_PATH],
+            'outputs': [RANKING_CATALOG_PATH]
+        },
+        'pagerank': {
+            'depends_on': ['classify'],
+            'code': ['pagerank_reviews/pagerank_reviews_graph.py'],
+            'inputs': [],
+            'input_folder': TOPIC_CLASSIFIED_DATA_FOLDER,
+            'output_folder': PAGERANK_RESULTS_FOLDER,
+            'output_file_name': pagerank_file_name,
+            'item_function': rank_hotel_reviews_file,
+            # Ingested scrapes are appended to the data files, so only the new rows of a hotel are applied to its
+            # stored PageRank state.
+            'item_args': (PAGERANK_STATES_FOLDER,)
+        },
+        'evaluate': {
+            'depends_on': ['pagerank'],
+            'code': ['pagerank_reviews/evaluate_pagerank_results.py'],
+            'inputs': [PAGERANK_RESULTS_FOLDER],
+            'cwd': PAGERANK_FOLDER,
+            'command': 'evaluate_pagerank_results.py',
+            'args': ['--render-only'],
+            'outputs': [os.path.join(REPO_ROOT_PATH, 'plots', 'pagerank_reviews',
+                                     'estimation_error_of_topic_indicativeness_scores.png')]
+        }
+    }
+
+
+def validate_pipeline_stages(stages: dict[str, dict[str, Any]]) -> list[str]:
+    """
+    Checks that the stages form a DAG.
+    :param stages: mapping between each stage name and its declaration.
+    :return: the stage names in a topological order.
+    """
+
+    order, visiting = [], set()
+
+    def visit(stage_name: str) -> None:
+        if stage_name in order:
+            return
+        if stage_name in visiting:
+            raise ValueError(f"The pipeline stages have a dependency cycle through '{stage_name}'.")
+        visiting.add(stage_name)
+        for dependency in stages[stage_name]['depends_on']:
+            if dependency not in stages:
+                raise ValueError(f"Stage '{stage_name}' depends on an unknown stage '{dependency}'.")
+            visit(dependency)
+        visiting.remove(stage_name)
+        order.append(stage_name)
+
+    for stage_name in stages:
+        visit(stage_name)
+    return order
+
+
+def list_folder_files(folder_path: str) -> list[str]:
+    """
+    Lists the (non-hidden) files of a folder.
+    :param folder_path: path to the folder.
+    :return: sorted names of the files (empty if the folder does not exist).
+    """
+
+    if not os.path.isdir(folder_path):
+        return []
+    return sorted(file_name for file_name in os.listdir(folder_path)
+                  if not file_name.startswith('.') and os.path.isfile(os.path.join(folder_path, file_name)))
+
+
+def find_local_imports(file_path: str) -> list[str]:
+    """
+    Finds the modules of the repository that a Python file imports, resolved as the scripts resolve them: from the
+    folder of the file, the repository root, then the CODE_FOLDERS.
+    :param file_path: path of the Python file.
+    :return: paths of the imported module files (third-party and standard library modules are left out).
+    """
+
+    with open(file_path, encoding='utf-8') as code_file:
+        tree = ast.parse(code_file.read(), filename=file_path)
+
+    module_names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names.extend(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+            module_names.append(node.module.split('.')[0])
+
+    search_folders = [os.path.dirname(os.path.abspath(file_path)), REPO_ROOT_PATH,
+                      *(os.path.join(REPO_ROOT_PATH, folder) for folder in CODE_FOLDERS)]
+    module_paths = []
+    for module_name in dict.fromkeys(module_names):
+        for folder in search_folders:
+            module_path = os.path.join(folder, f"{module_name}.py")
+            if os.path.isfile(module_path):
+                module_paths.append(module_path)
+                break
+    return module_paths
+
+
+def find_code_dependencies(code_paths: list[str]) -> list[str]:
+    """
+    Finds the code files that the given code files depend on: themselves and, transitively, the modules of the
+    repository they import.
+    :param code_paths: paths of code files, relative to the repository.
+    :return: sorted paths of the code files and of their dependencies, relative to the repository.
+    """
+
+    dependencies = set()
+    pending_paths = [os.path.join(REPO_ROOT_PATH, path) for path in code_paths]
+    while pending_paths:
+        code_path = pending_paths.pop()
+        relative_path = os.path.relpath(code_path, REPO_ROOT_PATH)
+        if relative_path in dependencies:
+            continue
+        dependencies.add(relative_path)
+        if code_path.endswith('.py') and os.path.isfile(code_path):
+            pending_paths.extend(find_local_imports(code_path))
+    return sorted(dependencies)
+
+
+def hash_file(file_path: str, file_hashes: dict[str, list]) -> str:
+    """
+    Hashes the content of a file. Hashes are cached by (mtime, size), so that unchanged files are not read again.
+    :param file_path: path of the file.
+    :param file_hashes: mapping between each file path (relative to the repository) and its (mtime in ns, size in
+     bytes, hash), updated with the hash of the file.
+    :return: hex digest of the file content.
+    """
+
+    relative_path = os.path.relpath(file_path, REPO_ROOT_PATH)
+    file_stat = os.stat(file_path)
+    cached_hash = file_hashes.get(relative_path)
+    if cached_hash is not None and cached_hash[:2] == [file_stat.st_mtime_ns, file_stat.st_size]:
+        return cached_hash[2]
+
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            content_hash.update(block)
+    file_hashes[relative_path] = [file_stat.st_mtime_ns, file_stat.st_size, content_hash.hexdigest()]
+    return file_hashes[relative_path][2]
+
+
+def hash_inputs(paths: list[str], file_hashes: dict[str, list]) -> dict[str, str]:
+    """
+    Hashes the given input files, and every file of the given input folders.
+    :param paths: paths of input files and folders.
+    :param file_hashes: cache of the file hashes (see `hash_file`).
+    :return: mapping between each input file path (relative to the repository) and its hash ('missing' if absent).
+    """
+
+    input_hashes = {}
+    for path in paths:
+        file_paths = [os.path.join(path, file_name) for file_name in list_folder_files(path)] \
+            if os.path.isdir(path) else [path]
+        for file_path in file_paths:
+            relative_path = os.path.relpath(file_path, REPO_ROOT_PATH)
+            input_hashes[relative_path] = hash_file(file_path, file_hashes) if os.path.exists(file_path) else 'missing'
+    return input_hashes
+
+
+def hash_fingerprint(*parts: Any) -> str:
+    """
+    Hashes the given JSON-serializable parts into a single fingerprint.
+    :return: hex digest of the parts.
+    """
+
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def run_fan_out_stage(
+        stage: dict[str, Any],
+        stage_fingerprint: str,
+        known_item_fingerprints: dict[str, str],
+        file_hashes: dict[str, list],
+        process_pool: ProcessPoolExecutor,
+        force: bool
+) -> tuple[dict[str, str], dict[str, str], int]:
+    """
+    Runs a per-file stage: every data file whose fingerprint (the stage fingerprint and the file hash) changed, or
+    whose output is missing, is processed in the process pool, largest file first. With 'keep_existing_outputs', the
+    outputs that existed before the pipeline first saw them are recorded as kept, and are only extended when their
+    fingerprint changes.
+    :param stage: declaration of the stage.
+    :param stage_fingerprint: fingerprint of the code and the shared inputs of the stage.
+    :param known_item_fingerprints: mapping between each file processed by the last runs and its fingerprint.
+    :param file_hashes: cache of the file hashes (see `hash_file`).
+    :param process_pool: pool the files are processed in.
+    :param force: whether to process again files whose fingerprint is unchanged.
+    :return: mapping between each up-to-date file and its fingerprint; mapping between each failed file and its error;
+     and the number of processed files.
+    """
+
+    input_folder, output_folder = stage['input_folder'], stage['output_folder']
+    item_fingerprints, stale_items = {}, {}
+    for file_name in list_folder_files(input_folder):
+        if not file_name.endswith('.csv'):
+            continue
+        known_fingerprint = known_item_fingerprints.get(file_name)
+        output_exists = os.path.exists(os.path.join(output_folder, stage['output_file_name'](file_name)))
+        item_fingerprint = hash_fingerprint(stage_fingerprint,
+                                            hash_file(os.path.join(input_folder, file_name), file_hashes))
+        if output_exists and stage.get('keep_existing_outputs', False) and (
+                known_fingerprint is None or known_fingerprint.startswith(KEPT_OUTPUT_PREFIX)):
+            item_fingerprint = KEPT_OUTPUT_PREFIX + item_fingerprint
+        if output_exists and known_fingerprint == item_fingerprint and not force:
+            item_fingerprints[file_name] = item_fingerprint
+        else:
+            stale_items[file_name] = item_fingerprint
+
+    os.makedirs(output_folder, exist_ok=True)
+    file_names = sorted(stale_items, key=lambda name: os.path.getsize(os.path.join(input_folder, name)), reverse=True)
+    futures = {process_pool.submit(stage['item_function'], file_name, input_folder, output_folder, *stage['item_args'],
+                                   **({'extend_existing_output': True}
+                                      if stale_items[file_name].startswith(KEPT_OUTPUT_PREFIX) else {})): file_name
+               for file_name in file_names}
+
+    failures = {}
+    for future in as_completed(futures):
+        file_name = futures[future]
+        try:
+            future.result()
+            item_fingerprints[file_name] = stale_items[file_name]
+        except Exception as e:
+            failures[file_name] = f"{type(e).__name__}: {e}"
+
+    return item_fingerprints, failures, len(file_names)
+
+
+def run_command_stage(stage_name: str, stage: dict[str, Any]) -> None:
+    """
+    Runs the script of a stage from its own folder, in render-only mode, and logs its output.
+    :param stage_name: name of the stage.
+    :param stage: declaration of the stage.
+    """
+
+    os.makedirs(PIPELINE_LOGS_FOLDER, exist_ok=True)
+    log_path = os.path.join(PIPELINE_LOGS_FOLDER, f"{stage_name}.log")
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        completed_process = subprocess.run([sys.executable, stage['command'], *stage['args']], cwd=stage['cwd'],
+                                           stdout=log_file, stderr=subprocess.STDOUT,
+                                           env={**os.environ, RENDER_ONLY_ENV_VAR: '1'})
+    if completed_process.returncode != 0:
+        raise RuntimeError(f"{stage['command']} exited with code {completed_process.returncode} (see {log_path})")
+
+
+def run_stage(
+        stage_name: str,
+        stage: dict[str, Any],
+        stage_manifest: dict[str, Any],
+        file_hashes: dict[str, list],
+        process_pool: ProcessPoolExecutor,
+        force: bool
+) -> dict[str, Any]:
+    """
+    Runs a stage of the pipeline, unless its fingerprint is unchanged since its last successful run.
+    :param stage_name: name of the stage.
+    :param stage: declaration of the stage.
+    :param stage_manifest: fingerprints of the last successful run of the stage.
+    :param file_hashes: cache of the file hashes (see `hash_file`), updated with the hashed files.
+    :param process_pool: pool the files of per-file stages are processed in.
+    :param force: whether to run the stage even if its fingerprint is unchanged.
+    :return: status of the stage ('ran', 'skipped' or 'failed'), a description of the run, and the fingerprints to
+     record in the manifest.
+    """
+
+    start_time = time.perf_counter()
+    if 'setup' in stage:
+        stage['setup']()
+
+    code_hashes = hash_inputs([os.path.join(REPO_ROOT_PATH, path) for path in find_code_dependencies(stage['code'])],
+                              file_hashes)
+    input_hashes = hash_inputs(stage['inputs'], file_hashes)
+    fingerprint = hash_fingerprint(code_hashes, input_hashes, stage.get('args', []))
+
+    if 'item_function' in stage:
+        item_fingerprints, failures, num_processed = run_fan_out_stage(
+            stage, fingerprint, stage_manifest.get('items', {}), file_hashes, process_pool, force)
+        result = {'manifest': {'fingerprint': fingerprint, 'items': item_fingerprints},
+                  'description': f"processed {num_processed} files, {len(failures)} failed"}
+        if failures:
+            result['status'] = 'failed'
+            result['description'] += ''.join(f"\n  {file_name}: {error}" for file_name, error in failures.items())
+        else:
+            result['status'] = 'ran' if num_processed else 'skipped'
+    else:
+        outputs_exist = all(os.path.exists(output_path) for output_path in stage['outputs'])
+        if not force and outputs_exist and stage_manifest.get('fingerprint') == fingerprint:
+            return {'status': 'skipped', 'description': 'unchanged', 'manifest': stage_manifest}
+        try:
+            run_command_stage(stage_name, stage)
+            result = {'status': 'ran', 'description': 'ran', 'manifest': {'fingerprint': fingerprint}}
+        except Exception as e:
+            result = {'status': 'failed', 'description': str(e), 'manifest': {}}
+
+    result['description'] += f" in {time.perf_counter() - start_time:.2f}s"
+    return result
+
+
+def load_pipeline_manifest(manifest_path: str = PIPELINE_MANIFEST_PATH) -> dict[str, Any]:
+    """
+    Loads the manifest of the pipeline: the cached file hashes, and the fingerprints of the last successful run of
+    each stage.
+    :param manifest_path: path of the JSON manifest.
+    :return: the manifest.
+    """
+
+    if not os.path.exists(manifest_path):
+        return {'file_hashes': {}, 'stages': {}}
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_pipeline_manifest(manifest: dict[str, Any], manifest_path: str = PIPELINE_MANIFEST_PATH) -> None:
+    """
+    Saves the manifest of the pipeline.
+    :param manifest: the manifest.
+    :param manifest_path: path of the JSON manifest.
+    """
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+
+def run_pipeline(
+        stages: dict[str, dict[str, Any]],
+        selected_stages: list[str] | None = None,
+        num_workers: int | None = None,
+        force: bool = False,
+        manifest_path: str = PIPELINE_MANIFEST_PATH,
+        on_stage_done: Callable[[str, dict[str, Any]], None] | None = None
+) -> dict[str, dict[str, Any]]:
+    """
+    Runs the stages of the pipeline in dependency order. Independent stages run concurrently, and the files of the
+    per-file stages share a single process pool. A stage whose dependencies failed is not run. The manifest is saved
+    after every stage, so that an interrupted run resumes from the stages it did not finish.
+    :param stages: mapping between each stage name and its declaration (see `get_pipeline_stages`).
+    :param selected_stages: names of the stages to run (all the stages by default). Dependencies that are not
+     selected are assumed to be up to date.
+    :param num_workers: number of worker processes (defaults to the number of CPUs).
+    :param force: whether to run the stages even if their fingerprint is unchanged.
+    :param manifest_path: path of the JSON manifest of the pipeline.
+    :param on_stage_done: function called with the name and result of each finished stage.
+    :return: mapping between each stage name and its result (see `run_stage`), or its 'blocked' status.
+    """
+
+    stages_order = validate_pipeline_stages(stages)
+    selected_stages = set(stages if selected_stages is None else selected_stages)
+    unknown_stages = selected_stages - stages.keys()
+    if unknown_stages:
+        raise ValueError(f"Unknown pipeline stages: {', '.join(sorted(unknown_stages))}.")
+
+    manifest = load_pipeline_manifest(manifest_path)
+    results, running = {}, {}
+    pending_stages = [stage_name for stage_name in stages_order if stage_name in selected_stages]
+
+    # The workers are not forked from this process, whose stage threads start scripts concurrently: a worker forked
+    # while a script is being started would inherit the pipe that reports its start, and block that stage.
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('forkserver')) \
+            as process_pool, \
+            ThreadPoolExecutor(max_workers=len(stages)) as stage_pool:
+        while pending_stages or running:
+            for stage_name in list(pending_stages):
+                dependencies = [dependency for dependency in stages[stage_name]['depends_on']
+                                if dependency in selected_stages]
+                if any(results.get(dependency, {}).get('status') in ('failed', 'blocked')
+                       for dependency in dependencies):
+                    results[stage_name] = {'status': 'blocked', 'description': 'a dependency failed'}
+                elif all(dependency in results for dependency in dependencies):
+                    # Each stage hashes into a copy of the file hashes, merged back when the stage is done.
+                    stage_file_hashes = dict(manifest['file_hashes'])
+                    future = stage_pool.submit(run_stage, stage_name, stages[stage_name],
+                                               manifest['stages'].get(stage_name, {}), stage_file_hashes,
+                                               process_pool, force)
+                    running[future] = (stage_name, stage_file_hashes)
+                else:
+                    continue
+                pending_stages.remove(stage_name)
+                if on_stage_done is not None and stage_name in results:
+                    on_stage_done(stage_name, results[stage_name])
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage_name, stage_file_hashes = running.pop(future)
+                manifest['file_hashes'].update(stage_file_hashes)
+                try:
+                    results[stage_name] = result = future.result()
+                except Exception as e:
+                    results[stage_name] = result = {'status': 'failed', 'description': f"{type(e).__name__}: {e}",
+                                                    'manifest': {}}
+                if result['status'] != 'failed':
+                    manifest['stages'][stage_name] = result['manifest']
+                elif 'items' in result['manifest']:
+                    # Keep the files of the failed stage that did succeed.
+                    manifest['stages'][stage_name] = {'items': result['manifest']['items']}
+                else:
+                    manifest['stages'].pop(stage_name, None)
+                save_pipeline_manifest(manifest, manifest_path)
+                if on_stage_done is not None:
+                    on_stage_done(stage_name, result)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the hotel reviews pipeline, skipping the unchanged stages.')
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help='stages to run (all the stages by default): ' + ', '.join(get_pipeline_stages()))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--force', action='store_true', help='run the stages even if their inputs are unchanged')
+    parser.add_argument('--reference-date', default=None,
+                        help='date the time-aware sentiment ratios are calculated at')
+    args = parser.parse_args()
+
+    pipeline_start_time = time.perf_counter()
+    stage_results = run_pipeline(get_pipeline_stages(args.reference_date), args.stages, args.workers, args.force,
+                                 on_stage_done=lambda stage_name, result: print(
+                                     f"{stage_name}: {result['status']} ({result['description']})"))
+    print(f"Pipeline finished in {time.perf_counter() - pipeline_start_time:.2f}s")
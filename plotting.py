@@ -0,0 +1,157 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from typing import Any, Callable
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+REPO_ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+RENDER_MANIFEST_PATH = os.path.join(REPO_ROOT_PATH, 'plots', 'render_manifest.json')
+RENDER_ONLY_ENV_VAR = 'PLOTS_RENDER_ONLY'
+
+render_only = False
+
+
+def enable_render_only() -> None:
+    """
+    Switches to the render-only mode: figures are drawn on the non-interactive Agg backend, saved and closed, and
+    never shown.
+    """
+
+    global render_only
+    render_only = True
+    matplotlib.use('Agg', force=True)
+
+
+def show_or_close_figure(figure: plt.Figure | None = None) -> None:
+    """
+    Shows the given figure (the current one by default), unless in render-only mode, and closes it, so that the next
+    plot starts from a new figure and no figure memory is kept.
+    :param figure: figure to show and close.
+    """
+
+    if not render_only:
+        plt.show()
+    plt.close(figure)
+
+
+def hash_plot_job(plot_function: Callable, args: tuple) -> str:
+    """
+    Hashes the input of a plot: the source code of the plot function and its arguments.
+    :param plot_function: function drawing and saving the plot.
+    :param args: arguments of the plot function.
+    :return: hex digest of the plot input.
+    """
+
+    plot_hash = hashlib.sha256(inspect.getsource(plot_function).encode('utf-8'))
+    plot_hash.update(pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL))
+    return plot_hash.hexdigest()
+
+
+def load_render_manifest(manifest_path: str = RENDER_MANIFEST_PATH) -> dict[str, str]:
+    """
+    Loads the manifest of the rendered plots.
+    :param manifest_path: path of the JSON manifest.
+    :return: mapping between each rendered plot name and its input hash.
+    """
+
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def render_plot_job(plot_function: Callable, args: tuple) -> None:
+    """
+    Renders a single plot in render-only mode (the unit of work sent to each process by `render_plots`).
+    :param plot_function: function drawing and saving the plot.
+    :param args: arguments of the plot function.
+    """
+
+    enable_render_only()
+    plot_function(*args)
+    plt.close('all')
+
+
+def render_plots(
+        plot_jobs: list[tuple[str, Callable, tuple]],
+        num_workers: int = 1,
+        manifest_path: str = RENDER_MANIFEST_PATH,
+        force: bool = False
+) -> dict[str, str]:
+    """
+    Renders plots from precomputed data, in render-only mode, across worker processes. The input hash of each plot is
+    recorded in a manifest, and plots whose input hash is unchanged since their last rendering are skipped.
+    :param plot_jobs: (unique name, plot function, arguments of the plot function) of each plot.
+    :param num_workers: number of worker processes (1 to render the plots in the current process).
+    :param manifest_path: path of the JSON manifest of the rendered plots' input hashes.
+    :param force: whether to render again plots whose input hash is unchanged.
+    :return: mapping between each plot name and its status: 'rendered', 'skipped' or the error it failed with.
+    """
+
+    manifest = load_render_manifest(manifest_path)
+
+    statuses, pending_jobs, manifest_updates = {}, {}, {}
+    for plot_name, plot_function, args in plot_jobs:
+        plot_hash = hash_plot_job(plot_function, args)
+        if not force and manifest.get(plot_name) == plot_hash:
+            statuses[plot_name] = 'skipped'
+        else:
+            pending_jobs[plot_name] = (plot_function, args, plot_hash)
+
+    def record_result(plot_name: str, error: Exception | None) -> None:
+        if error is None:
+            statuses[plot_name] = 'rendered'
+            manifest_updates[plot_name] = pending_jobs[plot_name][2]
+        else:
+            statuses[plot_name] = repr(error)
+            manifest_updates[plot_name] = None
+
+    if num_workers == 1:
+        for plot_name, (plot_function, args, _) in pending_jobs.items():
+            try:
+                render_plot_job(plot_function, args)
+                record_result(plot_name, None)
+            except Exception as e:
+                record_result(plot_name, e)
+    elif pending_jobs:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(render_plot_job, plot_function, args): plot_name
+                       for plot_name, (plot_function, args, _) in pending_jobs.items()}
+            for future in as_completed(futures):
+                record_result(futures[future], future.exception())
+
+    # Reload the manifest before updating it, so that scripts rendering at the same time keep each other's entries.
+    manifest = load_render_manifest(manifest_path)
+    for plot_name, plot_hash in manifest_updates.items():
+        if plot_hash is None:
+            manifest.pop(plot_name, None)
+        else:
+            manifest[plot_name] = plot_hash
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+    return statuses
+
+
+def print_render_statuses(statuses: dict[str, Any]) -> None:
+    """
+    Prints a summary of the statuses returned by `render_plots`, with the error of each failed plot.
+    :param statuses: mapping between each plot name and its status.
+    """
+
+    rendered = sum(status == 'rendered' for status in statuses.values())
+    skipped = sum(status == 'skipped' for status in statuses.values())
+    print(f"Rendered {rendered} plots, skipped {skipped} unchanged plots")
+    for plot_name, status in statuses.items():
+        if status not in ('rendered', 'skipped'):
+            print(f"Failed to render {plot_name}: {status}")
+
+
+if os.environ.get(RENDER_ONLY_ENV_VAR):
+    enable_render_only()
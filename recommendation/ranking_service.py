@@ -0,0 +1,446 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from topk_index import ThresholdTopKIndex
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from hotel_metadata import HotelSpatialIndex, build_hotel_metadata  # noqa: E402
+
+SENTIMENT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_ratio_per_hotel_london.csv')
+HOTEL_METADATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_london_5_hotels_topic_classified')
+RANKING_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ranking_catalog.csv')
+TOPICS = ['Room amenities', 'Hotel amenities', 'Staff', 'Food and beverages', 'Location']
+HOTEL_NAME_COLUMN = 'Hotel Name'
+CITY_COLUMN = 'City'
+DEFAULT_TOP_K = 3
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class HotelRankingService:
+    """
+    Headless hotel ranking: the hotel x topic sentiment ratios are loaded once into a contiguous array, and each query
+    ranks the hotels (or a subset of them) by their weighted scores, as `calculate_weighted_scores` of the reranker
+    does, without any disk access. Queries are answered either by scoring all the hotels (brute force), or by a
+    `ThresholdTopKIndex` that avoids scanning the whole catalog. Given the hotel metadata table, the hotels can also be
+    pre-filtered by city and by distance.
+    """
+
+    def __init__(self, sentiment_data: pd.DataFrame, hotel_metadata: pd.DataFrame | None = None):
+        self.spatial_index = None
+        if hotel_metadata is not None:
+            unknown_hotels = sorted(set(sentiment_data[HOTEL_NAME_COLUMN]) - set(hotel_metadata[HOTEL_NAME_COLUMN]))
+            if unknown_hotels:
+                raise ValueError(f"Hotels missing from the hotel metadata: {', '.join(unknown_hotels)}")
+            hotel_metadata = hotel_metadata[hotel_metadata[HOTEL_NAME_COLUMN].isin(sentiment_data[HOTEL_NAME_COLUMN])]
+            self.spatial_index = HotelSpatialIndex(hotel_metadata)
+            if CITY_COLUMN not in sentiment_data.columns:
+                sentiment_data = sentiment_data.merge(hotel_metadata[[HOTEL_NAME_COLUMN, CITY_COLUMN]],
+                                                      on=HOTEL_NAME_COLUMN, how='left')
+
+        self.hotel_names = sentiment_data[HOTEL_NAME_COLUMN].astype(str).to_numpy()
+        self.hotel_indices = {hotel_name: i for i, hotel_name in enumerate(self.hotel_names)}
+        self.topic_scores = np.ascontiguousarray(sentiment_data[TOPICS].to_numpy(dtype=np.float64))
+        self.hotel_cities = (sentiment_data[CITY_COLUMN].astype(str).to_numpy()
+                             if CITY_COLUMN in sentiment_data.columns else None)
+        self.topk_index = ThresholdTopKIndex(self.topic_scores, self.hotel_cities)
+
+    @classmethod
+    def from_csv(
+            cls,
+            sentiment_data_path: str = SENTIMENT_DATA_PATH,
+            hotel_metadata: pd.DataFrame | None = None
+    ) -> 'HotelRankingService':
+        """
+        Creates the service from a sentiment ratio per hotel .csv file (as saved by `save_sentiment_ratio_per_hotel`).
+        :param sentiment_data_path: path of the sentiment ratio per hotel file.
+        :param hotel_metadata: optional hotel metadata table (as built by `build_hotel_metadata`), for the city and
+         distance filters.
+        :return: the ranking service.
+        """
+
+        return cls(pd.read_csv(sentiment_data_path), hotel_metadata)
+
+    def save_catalog(self, catalog_path: str = RANKING_CATALOG_PATH) -> None:
+        """
+        Saves the hotels the service ranks, with their topic scores and cities, in the format of the sentiment ratio per
+        hotel file, so that the service can be started from it.
+        :param catalog_path: path of the catalog .csv file.
+        """
+
+        catalog = pd.DataFrame(self.topic_scores, columns=TOPICS)
+        catalog.insert(0, HOTEL_NAME_COLUMN, self.hotel_names)
+        if self.hotel_cities is not None:
+            catalog[CITY_COLUMN] = self.hotel_cities
+        catalog.to_csv(catalog_path, index=False)
+
+    def hotels_near(self, latitude: float, longitude: float, radius_km: float) -> list[str]:
+        """
+        Finds the hotels within the given distance of a point, to pre-filter the hotels to rank.
+        :param latitude: latitude of the point in degrees.
+        :param longitude: longitude of the point in degrees.
+        :param radius_km: radius in km.
+        :return: names of the hotels within the radius, nearest first.
+        """
+
+        if self.spatial_index is None:
+            raise ValueError("The service has no hotel metadata to filter by distance.")
+        rows, _ = self.spatial_index.rows_within(latitude, longitude, radius_km)
+        return self.spatial_index.hotel_metadata[HOTEL_NAME_COLUMN].to_numpy()[rows].tolist()
+
+    def check_cities(self, cities: list[str]) -> None:
+        """
+        Checks that the hotels can be filtered by the given cities.
+        :param cities: cities of the hotels to rank.
+        :raises ValueError: if the service has no cities, or if some of the given cities have no hotels.
+        """
+
+        if self.hotel_cities is None:
+            raise ValueError("The sentiment data has no city column to filter by.")
+        known_cities = set(self.hotel_cities)
+        unknown_cities = [city for city in cities if city not in known_cities]
+        if unknown_cities:
+            raise ValueError(f"Unknown cities: {', '.join(unknown_cities)}")
+
+    def get_hotel_indices(
+            self,
+            hotel_names: list[str] | None,
+            cities: list[str] | None = None
+    ) -> np.ndarray | None:
+        """
+        Maps hotel names and cities to the rows of their hotels in the score matrix.
+        :param hotel_names: names of the hotels to rank (None for all the hotels).
+        :param cities: cities of the hotels to rank (None for all the cities).
+        :return: the rows of the hotels (None for all the hotels).
+        """
+
+        hotel_indices = None
+        if hotel_names is not None:
+            unknown_hotels = [hotel_name for hotel_name in hotel_names if hotel_name not in self.hotel_indices]
+            if unknown_hotels:
+                raise ValueError(f"Unknown hotels: {', '.join(unknown_hotels)}")
+            hotel_indices = np.array([self.hotel_indices[hotel_name] for hotel_name in hotel_names], dtype=np.int64)
+
+        if cities is not None:
+            self.check_cities(cities)
+            city_indices = np.flatnonzero(np.isin(self.hotel_cities, cities))
+            hotel_indices = city_indices if hotel_indices is None else np.intersect1d(hotel_indices, city_indices)
+
+        return hotel_indices
+
+    @staticmethod
+    def get_weights(user_rankings: list[dict[str, int]]) -> np.ndarray:
+        """
+        Normalises the user rankings of the topics to weights, as `calculate_weighted_scores` does.
+        :param user_rankings: the topic scores between 0 and 5 of each user.
+        :return: weights matrix of shape (num_users x num_topics), whose rows sum to 1.
+        """
+
+        for user_ranking in user_rankings:
+            missing_topics = [topic for topic in TOPICS if topic not in user_ranking]
+            if missing_topics:
+                raise ValueError(f"Missing rankings of topics: {', '.join(missing_topics)}")
+
+        weights = np.array([[user_ranking[topic] for topic in TOPICS] for user_ranking in user_rankings],
+                           dtype=np.float64).reshape(len(user_rankings), len(TOPICS))
+        if ((weights < 0) | (weights > 5)).any():
+            raise ValueError("Rankings of the topics must be between 0 and 5.")
+        weights_sums = weights.sum(axis=1, keepdims=True)
+        if (weights_sums == 0).any():
+            raise ValueError("At least one topic must have a positive ranking.")
+        return weights / weights_sums
+
+    def top_k_batch(
+            self,
+            user_rankings: list[dict[str, int]],
+            k: int = DEFAULT_TOP_K,
+            hotel_names: list[str] | None = None,
+            cities: list[str] | None = None,
+            use_index: bool = False
+    ) -> list[list[tuple[str, float]]]:
+        """
+        Ranks the hotels for a batch of users at once: the weighted scores of all the (hotel, user) pairs are a single
+        matrix product, and the top-k hotels of each user are selected with a partial sort.
+        :param user_rankings: the topic scores between 0 and 5 of each user.
+        :param k: number of top hotels to return per user.
+        :param hotel_names: names of the hotels to rank (all the hotels by default).
+        :param cities: cities of the hotels to rank (all the cities by default).
+        :param use_index: whether to answer each user's query with the top-k index instead of scoring all the hotels.
+        :return: for each user, the top-k (hotel name, weighted score) tuples sorted by descending score.
+        """
+
+        if use_index:
+            hotel_indices = self.get_hotel_indices(hotel_names)
+            if cities is not None:
+                self.check_cities(cities)
+            return [list(zip(self.hotel_names[rows].tolist(), scores.tolist()))
+                    for rows, scores in (self.topk_index.query(weights, k, hotel_indices, cities)
+                                         for weights in self.get_weights(user_rankings))]
+
+        hotel_indices = self.get_hotel_indices(hotel_names, cities)
+        topic_scores = self.topic_scores if hotel_indices is None else self.topic_scores[hotel_indices]
+        num_hotels = topic_scores.shape[0]
+        k = min(k, num_hotels)
+        if k <= 0:
+            return [[] for _ in user_rankings]
+
+        # (num_users x num_hotels) weighted scores.
+        weighted_scores = self.get_weights(user_rankings) @ topic_scores.T
+
+        if k < num_hotels:
+            top_k_columns = np.argpartition(-weighted_scores, k - 1, axis=1)[:, :k]
+        else:
+            top_k_columns = np.broadcast_to(np.arange(num_hotels), weighted_scores.shape)
+        top_k_scores = np.take_along_axis(weighted_scores, top_k_columns, axis=1)
+        order = np.argsort(-top_k_scores, axis=1, kind='stable')
+        top_k_columns = np.take_along_axis(top_k_columns, order, axis=1)
+        top_k_scores = np.take_along_axis(top_k_scores, order, axis=1)
+
+        top_k_rows = top_k_columns if hotel_indices is None else hotel_indices[top_k_columns]
+        return [list(zip(self.hotel_names[rows].tolist(), scores.tolist()))
+                for rows, scores in zip(top_k_rows, top_k_scores)]
+
+    def top_k(
+            self,
+            user_ranking: dict[str, int],
+            k: int = DEFAULT_TOP_K,
+            hotel_names: list[str] | None = None,
+            cities: list[str] | None = None,
+            use_index: bool = False
+    ) -> list[tuple[str, float]]:
+        """
+        Ranks the hotels for a single user.
+        :param user_ranking: the topic scores between 0 and 5 of the user.
+        :param k: number of top hotels to return.
+        :param hotel_names: names of the hotels to rank (all the hotels by default).
+        :param cities: cities of the hotels to rank (all the cities by default).
+        :param use_index: whether to answer the query with the top-k index instead of scoring all the hotels.
+        :return: the top-k (hotel name, weighted score) tuples sorted by descending score.
+        """
+
+        return self.top_k_batch([user_ranking], k, hotel_names, cities, use_index)[0]
+
+
+def create_ranking_handler(service: HotelRankingService) -> type[BaseHTTPRequestHandler]:
+    """
+    Creates the HTTP request handler of the ranking endpoint: POST /rank with a JSON body
+    {"rankings": [{<topic>: <0-5>, ...}, ...], "k": 3, "hotels": [<hotel name>, ...], "cities": [<city>, ...],
+    "use_index": false, "near": {"latitude": <degrees>, "longitude": <degrees>, "radius_km": <km>}} (all but the
+    rankings are optional), answered with {"results": [[{"hotel": <hotel name>, "score": <weighted score>}, ...], ...]},
+    one list per ranking.
+    :param service: the ranking service answering the queries.
+    :return: the request handler class.
+    """
+
+    class RankingRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/rank':
+                self.send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                hotel_names = request.get('hotels')
+                if 'near' in request:
+                    near_hotels = service.hotels_near(float(request['near']['latitude']),
+                                                      float(request['near']['longitude']),
+                                                      float(request['near']['radius_km']))
+                    if hotel_names is None:
+                        hotel_names = near_hotels
+                    else:
+                        requested_hotel_names = set(hotel_names)
+                        hotel_names = [hotel_name for hotel_name in near_hotels if hotel_name in requested_hotel_names]
+                results = service.top_k_batch(request['rankings'], int(request.get('k', DEFAULT_TOP_K)),
+                                              hotel_names, request.get('cities'),
+                                              bool(request.get('use_index', False)))
+            except (KeyError, TypeError, ValueError) as e:
+                self.send_json(400, {'error': str(e)})
+                return
+
+            self.send_json(200, {'results': [[{'hotel': hotel_name, 'score': score} for hotel_name, score in result]
+                                             for result in results]})
+
+        def send_json(self, status: int, body: dict) -> None:
+            encoded_body = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(encoded_body)))
+            self.end_headers()
+            self.wfile.write(encoded_body)
+
+        def log_message(self, format, *args):
+            # Keep the hot path free of per-request logging.
+            pass
+
+    return RankingRequestHandler
+
+
+def serve(service: HotelRankingService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """
+    Serves the ranking endpoint until interrupted.
+    :param service: the ranking service answering the queries.
+    :param host: host to listen on.
+    :param port: port to listen on.
+    """
+
+    with ThreadingHTTPServer((host, port), create_ranking_handler(service)) as server:
+        print(f"Serving hotel rankings on http://{host}:{port}/rank")
+        server.serve_forever()
+
+
+def generate_synthetic_sentiment_data(num_hotels: int, num_cities: int = 0, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates random sentiment ratios in [-1, 1] for a catalog of synthetic hotels. As in the real data, the topics
+    are correlated: each hotel has an overall quality that all its sentiment ratios lean towards.
+    :param num_hotels: number of hotels.
+    :param num_cities: number of cities the hotels are spread over (0 for no city column).
+    :param seed: seed of the random generator.
+    :return: sentiment ratio per hotel, in the format of the sentiment ratio per hotel file.
+    """
+
+    rng = np.random.default_rng(seed)
+    hotel_quality = rng.uniform(-1, 1, size=(num_hotels, 1))
+    sentiment_ratios = np.clip(0.6 * hotel_quality + 0.4 * rng.uniform(-1, 1, size=(num_hotels, len(TOPICS))), -1, 1)
+    sentiment_data = pd.DataFrame(sentiment_ratios, columns=TOPICS)
+    sentiment_data.insert(0, HOTEL_NAME_COLUMN, [f"Hotel_{i}" for i in range(num_hotels)])
+    if num_cities:
+        sentiment_data[CITY_COLUMN] = [f"City_{i}" for i in rng.integers(0, num_cities, size=num_hotels)]
+    return sentiment_data
+
+
+def generate_random_user_rankings(num_users: int, seed: int = 0) -> list[dict[str, int]]:
+    """
+    Generates random user rankings of the topics.
+    :param num_users: number of users.
+    :param seed: seed of the random generator.
+    :return: the topic scores between 0 and 5 of each user (with at least one positive score).
+    """
+
+    rng = np.random.default_rng(seed)
+    rankings = rng.integers(0, 6, size=(num_users, len(TOPICS)))
+    rankings[rankings.sum(axis=1) == 0, 0] = 1
+    return [dict(zip(TOPICS, ranking.tolist())) for ranking in rankings]
+
+
+def benchmark_ranking_latency(
+        num_hotels: int = 5000,
+        num_queries: int = 2000,
+        k: int = DEFAULT_TOP_K,
+        batch_size: int = 256
+) -> dict[str, float]:
+    """
+    Measures the latency of single-user queries and the throughput of batched queries on a synthetic catalog.
+    :param num_hotels: number of hotels in the catalog.
+    :param num_queries: number of queries.
+    :param k: number of top hotels per query.
+    :param batch_size: number of users per batched query.
+    :return: the p50 and p99 latencies of single-user queries (in ms), and the queries per second of the single-user
+     and batched queries.
+    """
+
+    service = HotelRankingService(generate_synthetic_sentiment_data(num_hotels))
+    user_rankings = generate_random_user_rankings(num_queries)
+
+    latencies = np.empty(num_queries)
+    for i, user_ranking in enumerate(user_rankings):
+        start_time = time.perf_counter()
+        service.top_k(user_ranking, k)
+        latencies[i] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for batch_start in range(0, num_queries, batch_size):
+        service.top_k_batch(user_rankings[batch_start:batch_start + batch_size], k)
+    batched_seconds = time.perf_counter() - start_time
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'single_queries_per_sec': num_queries / latencies.sum(),
+        'batched_queries_per_sec': num_queries / batched_seconds
+    }
+
+
+def benchmark_topk_index(
+        num_hotels: int = 100000,
+        num_queries: int = 500,
+        k: int = 10,
+        num_cities: int = 50
+) -> dict[str, dict[str, float]]:
+    """
+    Compares the top-k index with the brute-force path on a synthetic catalog, for unfiltered and city-filtered
+    queries, and checks that both return the same top-k scores.
+    :param num_hotels: number of hotels in the catalog.
+    :param num_queries: number of queries.
+    :param k: number of top hotels per query.
+    :param num_cities: number of cities the hotels are spread over.
+    :return: for each of 'brute force', 'index', 'brute force (city)' and 'index (city)', the p50 and p99 latencies
+     (in ms).
+    """
+
+    sentiment_data = generate_synthetic_sentiment_data(num_hotels, num_cities)
+    service = HotelRankingService(sentiment_data)
+    user_rankings = generate_random_user_rankings(num_queries)
+    cities = sentiment_data[CITY_COLUMN].unique()[:1].tolist()
+
+    latencies = {}
+    for label, cities_filter in (('', None), (' (city)', cities)):
+        brute_force_latencies, index_latencies = np.empty(num_queries), np.empty(num_queries)
+        for i, user_ranking in enumerate(user_rankings):
+            start_time = time.perf_counter()
+            brute_force_top_k = service.top_k(user_ranking, k, cities=cities_filter)
+            brute_force_latencies[i] = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            index_top_k = service.top_k(user_ranking, k, cities=cities_filter, use_index=True)
+            index_latencies[i] = time.perf_counter() - start_time
+
+            if not np.allclose([score for _, score in brute_force_top_k], [score for _, score in index_top_k]):
+                raise AssertionError(f"The index and the brute force disagree on {user_ranking}")
+
+        for path, path_latencies in (('brute force', brute_force_latencies), ('index', index_latencies)):
+            latencies[path + label] = {'p50_ms': float(np.percentile(path_latencies, 50) * 1000),
+                                       'p99_ms': float(np.percentile(path_latencies, 99) * 1000)}
+    return latencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless hotel ranking service.')
+    parser.add_argument('--sentiment-data', default=SENTIMENT_DATA_PATH, help='sentiment ratio per hotel .csv file')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='host to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='measure the query latency on synthetic catalogs instead of serving')
+    parser.add_argument('--hotel-metadata-folder', default=HOTEL_METADATA_FOLDER,
+                        help='folder of hotel data files to build the hotel metadata table from, to filter the hotels '
+                             'by city and distance (the data files of the ranked hotels by default)')
+    parser.add_argument('--benchmark-index', action='store_true',
+                        help='compare the top-k index with the brute force on a large synthetic catalog')
+    parser.add_argument('--build-catalog', action='store_true',
+                        help='check that every hotel of the sentiment data is located, and save the catalog of the '
+                             'ranked hotels (with their cities) instead of serving')
+    parser.add_argument('--catalog-path', default=RANKING_CATALOG_PATH, help='path of the catalog to build')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for num_hotels in (1000, 5000, 20000):
+            results = benchmark_ranking_latency(num_hotels)
+            print(f"{num_hotels} hotels: p50 = {results['p50_ms']:.3f} ms, p99 = {results['p99_ms']:.3f} ms, "
+                  f"{results['single_queries_per_sec']:.0f} queries/sec single, "
+                  f"{results['batched_queries_per_sec']:.0f} queries/sec batched")
+    elif args.benchmark_index:
+        for path, results in benchmark_topk_index().items():
+            print(f"{path}: p50 = {results['p50_ms']:.3f} ms, p99 = {results['p99_ms']:.3f} ms")
+    elif args.build_catalog:
+        service = HotelRankingService.from_csv(args.sentiment_data, build_hotel_metadata(args.hotel_metadata_folder))
+        service.save_catalog(args.catalog_path)
+        print(f"Saved the catalog of {len(service.hotel_names)} hotels to {args.catalog_path}")
+    else:
+        hotel_metadata = build_hotel_metadata(args.hotel_metadata_folder)
+        serve(HotelRankingService.from_csv(args.sentiment_data, hotel_metadata), args.host, args.port)
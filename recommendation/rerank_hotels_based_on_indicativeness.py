@@ -118,6 +118,7 @@ class HotelRecommendationApp:
             widget.destroy()
 
 
-root = tk.Tk()
-app = HotelRecommendationApp(root)
-root.mainloop()
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = HotelRecommendationApp(root)
+    root.mainloop()
@@ -0,0 +1,124 @@
+import numpy as np
+
+INITIAL_BLOCK_SIZE = 32
+BRUTE_FORCE_SUBSET_FRACTION = 0.05
+
+
+def select_top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Selects the k highest scores (with a partial sort) and sorts them in descending order.
+    :param rows: rows of the scored hotels.
+    :param scores: score of each hotel.
+    :param k: number of top hotels to select.
+    :return: the rows and scores of the top-k hotels, sorted by descending score.
+    """
+
+    if len(scores) > k:
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[top_k], scores[top_k]
+    order = np.argsort(-scores, kind='stable')
+    return rows[order], scores[order]
+
+
+class ThresholdTopKIndex:
+    """
+    Exact top-k retrieval of the hotels maximising a non-negatively weighted sum of their topic scores, with the
+    threshold algorithm: the hotels are kept sorted by each topic score, the lists of the topics with a positive weight
+    are read in parallel, block by block, and every hotel met is scored exactly. The search stops as soon as the k-th
+    best score reaches the threshold, the weighted sum of the topic scores at the current depth of the lists, which
+    bounds the score of every hotel not met yet. Hotels of the same city also get an index of their own, so that
+    city-filtered queries never read the lists of other cities.
+    """
+
+    def __init__(self, topic_scores: np.ndarray, hotel_cities: np.ndarray | None = None, index_cities: bool = True):
+        self.topic_scores = np.ascontiguousarray(topic_scores, dtype=np.float64)
+        self.num_hotels = self.topic_scores.shape[0]
+
+        # sorted_rows[d, t] is the row of the hotel with the (d + 1)-th highest score of topic t.
+        self.sorted_rows = np.ascontiguousarray(np.argsort(-self.topic_scores, axis=0, kind='stable'))
+        self.sorted_scores = np.take_along_axis(self.topic_scores, self.sorted_rows, axis=0)
+
+        self.city_indices = {}
+        if hotel_cities is not None and index_cities:
+            hotel_cities = np.asarray(hotel_cities)
+            for city in np.unique(hotel_cities):
+                city_rows = np.flatnonzero(hotel_cities == city)
+                self.city_indices[city] = (city_rows,
+                                           ThresholdTopKIndex(self.topic_scores[city_rows], index_cities=False))
+
+    def query(
+            self,
+            weights: np.ndarray,
+            k: int,
+            hotel_rows: np.ndarray | None = None,
+            cities: list[str] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the exact top-k hotels for the given weights.
+        :param weights: non-negative weight of each topic.
+        :param k: number of top hotels to return.
+        :param hotel_rows: rows of the hotels to rank (all the hotels by default). Small subsets are scored directly.
+        :param cities: cities of the hotels to rank (all the cities by default).
+        :return: the rows and weighted scores of the top-k hotels, sorted by descending score.
+        """
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if (weights < 0).any():
+            raise ValueError("The threshold algorithm requires non-negative weights.")
+
+        if cities is not None:
+            # Query each city's own index, then merge the per-city top-k (a city without hotels matches nothing).
+            cities_rows, cities_scores = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+            for city in set(cities) & self.city_indices.keys():
+                city_rows, city_index = self.city_indices[city]
+                city_hotel_rows = None
+                if hotel_rows is not None:
+                    city_hotel_rows = np.flatnonzero(np.isin(city_rows, hotel_rows))
+                rows, scores = city_index.query(weights, k, city_hotel_rows)
+                cities_rows.append(city_rows[rows])
+                cities_scores.append(scores)
+            return select_top_k(np.concatenate(cities_rows), np.concatenate(cities_scores), k)
+
+        if hotel_rows is not None:
+            if len(hotel_rows) <= BRUTE_FORCE_SUBSET_FRACTION * self.num_hotels:
+                return select_top_k(hotel_rows, self.topic_scores[hotel_rows] @ weights, k)
+            candidate_mask = np.zeros(self.num_hotels, dtype=bool)
+            candidate_mask[hotel_rows] = True
+            k = min(k, len(hotel_rows))
+        else:
+            candidate_mask = None
+            k = min(k, self.num_hotels)
+
+        active_topics = np.flatnonzero(weights > 0)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if len(active_topics) == 0:
+            # Every hotel scores 0.
+            rows = np.arange(self.num_hotels) if candidate_mask is None else np.flatnonzero(candidate_mask)
+            return rows[:k], np.zeros(min(k, len(rows)))
+
+        seen = np.zeros(self.num_hotels, dtype=bool)
+        top_rows, top_scores = np.empty(0, dtype=np.int64), np.empty(0)
+        depth, block_size = 0, max(INITIAL_BLOCK_SIZE, k)
+
+        while depth < self.num_hotels:
+            next_depth = min(self.num_hotels, depth + block_size)
+            rows = np.sort(self.sorted_rows[depth:next_depth, active_topics], axis=None)
+            rows = rows[~seen[rows]]
+            # A hotel can appear in several lists of the block: keep it once.
+            first_occurrences = np.ones(len(rows), dtype=bool)
+            first_occurrences[1:] = rows[1:] != rows[:-1]
+            rows = rows[first_occurrences]
+            seen[rows] = True
+            if candidate_mask is not None:
+                rows = rows[candidate_mask[rows]]
+
+            top_rows, top_scores = select_top_k(np.concatenate([top_rows, rows]),
+                                                np.concatenate([top_scores, self.topic_scores[rows] @ weights]), k)
+
+            threshold = self.sorted_scores[next_depth - 1, active_topics] @ weights[active_topics]
+            if len(top_scores) == k and top_scores[-1] >= threshold:
+                break
+            depth, block_size = next_depth, block_size * 2
+
+        return top_rows, top_scores
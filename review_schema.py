@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+REVIEW_DATE_COLUMN = 'Review Date'
+STAY_DATE_COLUMN = 'Stay Date'
+NIGHTS_COLUMN = 'Number of Nights'
+RATING_COLUMN = 'Rating'
+OVERALL_RATING_COLUMN = 'Overall Average Rating'
+REVIEW_DATE_FORMATS = ('%B %d, %Y', '%d %B %Y')
+STAY_DATE_FORMATS = ('%B %Y',)
+DATE_COLUMNS_FORMATS = {REVIEW_DATE_COLUMN: REVIEW_DATE_FORMATS, STAY_DATE_COLUMN: STAY_DATE_FORMATS}
+NUMERIC_COLUMNS_DTYPES = {NIGHTS_COLUMN: 'Int16', RATING_COLUMN: 'float32', OVERALL_RATING_COLUMN: 'float32'}
+TRAVELER_TYPE_COLUMN = 'Traveler Type'
+CATEGORICAL_REVIEW_COLUMNS = ['Room Type', TRAVELER_TYPE_COLUMN]
+# Older data files use British spellings of the traveler type column and of its values.
+COLUMN_NAME_ALIASES = {'Traveller Type': TRAVELER_TYPE_COLUMN}
+TRAVELER_TYPE_ALIASES = {'Solo traveller': 'Solo traveler'}
+SCHEMA_COLUMNS = [*DATE_COLUMNS_FORMATS, *NUMERIC_COLUMNS_DTYPES, *CATEGORICAL_REVIEW_COLUMNS]
+
+
+def normalize_review_spellings(reviews_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes the British spellings of older data files to the spellings of the newer ones: the 'Traveller Type'
+    column is renamed to 'Traveler Type', and its 'Solo traveller' values to 'Solo traveler'.
+    :param reviews_df: reviews, as read from hotel data files.
+    :return: the reviews with normalized column names and traveler types.
+    """
+
+    reviews_df = reviews_df.rename(columns=COLUMN_NAME_ALIASES)
+    if TRAVELER_TYPE_COLUMN in reviews_df.columns:
+        reviews_df[TRAVELER_TYPE_COLUMN] = reviews_df[TRAVELER_TYPE_COLUMN].replace(TRAVELER_TYPE_ALIASES)
+    return reviews_df
+
+
+def parse_dates(values: pd.Series, date_formats: tuple[str, ...] = REVIEW_DATE_FORMATS) -> pd.Series:
+    """
+    Parses date strings, trying each format in turn. Each distinct string is parsed once, since a hotel has far fewer
+    distinct dates than reviews. Already parsed dates are returned as they are.
+    :param values: date strings, e.g. 'August 7, 2024'.
+    :param date_formats: formats of the dates, in the order they are tried.
+    :return: the dates as datetime64 (NaT where missing or unparsable).
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    categories = values.astype('category')
+    distinct_values = pd.Series(categories.cat.categories.astype(str))
+    parsed_dates = pd.to_datetime(distinct_values, format=date_formats[0], errors='coerce')
+    for date_format in date_formats[1:]:
+        parsed_dates = parsed_dates.fillna(pd.to_datetime(distinct_values, format=date_format, errors='coerce'))
+
+    # Missing values have code -1, which picks the NaT appended after the distinct dates.
+    parsed_dates = np.append(parsed_dates.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(parsed_dates[categories.cat.codes.to_numpy()], index=values.index, name=values.name)
+
+
+def parse_numbers(values: pd.Series, dtype: str) -> pd.Series:
+    """
+    Parses numbers into a compact dtype. Values that are not numbers, or that do not fit the dtype (e.g. fractional
+    values of an integer dtype), become missing values.
+    :param values: numbers or number strings.
+    :param dtype: target dtype, e.g. 'float32' or 'Int16' (a nullable integer dtype, for columns with missing values).
+    :return: the parsed numbers.
+    """
+
+    numbers = pd.to_numeric(values, errors='coerce')
+    if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype)):
+        dtype_info = np.iinfo(pd.api.types.pandas_dtype(dtype).numpy_dtype)
+        numbers = numbers.where((numbers == numbers.round()) & numbers.between(dtype_info.min, dtype_info.max))
+    return numbers.astype(dtype)
+
+
+def count_parse_errors(values: pd.Series, parsed_values: pd.Series) -> int:
+    """
+    Counts the values that were given but could not be parsed.
+    :param values: raw values.
+    :param parsed_values: parsed values.
+    :return: number of non-empty values that were parsed into missing values.
+    """
+
+    given_values = values.notna()
+    if not pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_datetime64_any_dtype(values):
+        given_values &= values.astype(str).str.strip() != ''
+    return int((given_values & parsed_values.isna()).sum())
+
+
+def apply_review_schema(
+        reviews_df: pd.DataFrame,
+        columns: list[str] | None = None
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """
+    Parses the typed columns of the reviews into compact dtypes: datetime64 review and stay dates, Int16 numbers of
+    nights, float32 ratings, and categorical room and traveler types. Columns missing from the reviews are skipped.
+    :param reviews_df: reviews, as read from hotel data files.
+    :param columns: schema columns to parse (all of them by default).
+    :return: the reviews with parsed columns; and mapping between each parsed column and its number of unparsable
+     values.
+    """
+
+    reviews_df = reviews_df.copy()
+    parse_errors = {}
+    for column in SCHEMA_COLUMNS if columns is None else columns:
+        if column not in reviews_df.columns:
+            continue
+        values = reviews_df[column]
+        if column in DATE_COLUMNS_FORMATS:
+            reviews_df[column] = parse_dates(values, DATE_COLUMNS_FORMATS[column])
+        elif column in NUMERIC_COLUMNS_DTYPES:
+            reviews_df[column] = parse_numbers(values, NUMERIC_COLUMNS_DTYPES[column])
+        else:
+            reviews_df[column] = values.astype('category')
+        parse_errors[column] = count_parse_errors(values, reviews_df[column])
+    return reviews_df, parse_errors
+
+
+def calculate_column_footprints(reviews_df: pd.DataFrame) -> dict[str, list]:
+    """
+    Measures the dtype and memory footprint of each schema column of the reviews.
+    :param reviews_df: reviews, either as read from hotel data files or parsed with `apply_review_schema`.
+    :return: mapping between each schema column of the reviews and its [dtype, bytes].
+    """
+
+    columns = [column for column in SCHEMA_COLUMNS if column in reviews_df.columns]
+    column_bytes = reviews_df[columns].memory_usage(index=False, deep=True)
+    return {column: [str(reviews_df[column].dtype), int(column_bytes[column])] for column in columns}
+
+
+def calculate_memory_footprint_report(
+        raw_column_footprints: list[dict[str, list]],
+        typed_reviews_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Compares the memory footprint of the reviews before and after parsing them with `apply_review_schema`.
+    :param raw_column_footprints: footprints of the schema columns of each data file as read, before parsing (see
+     `calculate_column_footprints`).
+    :param typed_reviews_df: the parsed reviews of the same data files.
+    :return: dataframe with the dtype and bytes of each schema column before and after parsing, and a total row.
+    """
+
+    columns = [column for column in SCHEMA_COLUMNS if column in typed_reviews_df.columns]
+    report_df = pd.DataFrame({
+        'raw dtype': [' / '.join(sorted({footprints[column][0] for footprints in raw_column_footprints
+                                         if column in footprints})) for column in columns],
+        'raw bytes': [sum(footprints[column][1] for footprints in raw_column_footprints if column in footprints)
+                      for column in columns],
+        'typed dtype': typed_reviews_df[columns].dtypes.astype(str).to_numpy(),
+        'typed bytes': typed_reviews_df[columns].memory_usage(index=False, deep=True).to_numpy()
+    }, index=columns)
+    report_df.loc['Total'] = ['', report_df['raw bytes'].sum(), '', report_df['typed bytes'].sum()]
+    report_df = report_df.astype({'raw bytes': np.int64, 'typed bytes': np.int64})
+    report_df['saving'] = 1 - report_df['typed bytes'] / report_df['raw bytes']
+    return report_df
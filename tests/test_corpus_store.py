@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+import corpus_store  # noqa: E402
+from corpus_store import (HOTEL_NAME_COLUMN, SOURCE_FILE_COLUMN, get_corpus_cache_paths,  # noqa: E402
+                          iter_hotel_reviews, load_corpus_manifest, load_corpus_parse_errors, load_reviews_corpus)
+from synthetic_corpus import generate_hotel_reviews  # noqa: E402
+
+
+@pytest.fixture
+def data_folder(tmp_path):
+    folder = tmp_path / 'data_topic_classified'
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for hotel_index in range(3):
+        generate_hotel_reviews(rng, 20).to_csv(folder / f"processed_reviews_Hotel_{hotel_index}.csv", index=False)
+    return folder
+
+
+@pytest.fixture
+def cache_folder(tmp_path):
+    return str(tmp_path / 'corpus_cache')
+
+
+@pytest.fixture
+def parsed_files(monkeypatch):
+    """
+    Records the data files parsed by the corpus store (rather than read back from the store).
+    """
+
+    parsed_file_names = []
+    read_hotel_reviews_file = corpus_store.read_hotel_reviews_file
+
+    def recording_read_hotel_reviews_file(folder_path, file_name):
+        parsed_file_names.append(file_name)
+        return read_hotel_reviews_file(folder_path, file_name)
+
+    monkeypatch.setattr(corpus_store, 'read_hotel_reviews_file', recording_read_hotel_reviews_file)
+    return parsed_file_names
+
+
+def load_uncached_corpus(data_folder, tmp_path) -> pd.DataFrame:
+    """
+    Loads the corpus through a fresh store, as a reference for the incrementally updated one.
+    """
+
+    return load_reviews_corpus(str(data_folder), cache_folder=str(tmp_path / 'fresh_corpus_cache'))
+
+
+def append_review(file_path) -> None:
+    """
+    Appends a copy of the first review of a data file to it.
+    """
+
+    hotel_reviews_df = pd.read_csv(file_path)
+    hotel_reviews_df.iloc[:1].to_csv(file_path, mode='a', header=False, index=False)
+
+
+def test_store_is_reused_while_the_files_are_unchanged(data_folder, cache_folder, parsed_files):
+    corpus_df = load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    assert len(parsed_files) == 3
+    assert len(corpus_df) == 60
+    assert list(corpus_df[HOTEL_NAME_COLUMN].unique()) == ['Hotel_0', 'Hotel_1', 'Hotel_2']
+
+    cached_corpus_df = load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    assert len(parsed_files) == 3
+    pd.testing.assert_frame_equal(cached_corpus_df, corpus_df)
+
+
+def test_only_modified_files_are_parsed_again(data_folder, cache_folder, parsed_files, tmp_path):
+    load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    append_review(data_folder / 'processed_reviews_Hotel_1.csv')
+
+    corpus_df = load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+
+    assert parsed_files[3:] == ['processed_reviews_Hotel_1.csv']
+    assert len(corpus_df) == 61
+    pd.testing.assert_frame_equal(corpus_df, load_uncached_corpus(data_folder, tmp_path))
+
+
+def test_added_and_deleted_files_update_the_store(data_folder, cache_folder, parsed_files, tmp_path):
+    load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    os.remove(data_folder / 'processed_reviews_Hotel_0.csv')
+    generate_hotel_reviews(np.random.default_rng(1), 5).to_csv(data_folder / 'processed_reviews_Hotel_3.csv',
+                                                               index=False)
+
+    corpus_df = load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+
+    assert parsed_files[3:] == ['processed_reviews_Hotel_3.csv']
+    assert list(corpus_df[HOTEL_NAME_COLUMN].unique()) == ['Hotel_1', 'Hotel_2', 'Hotel_3']
+    assert len(corpus_df) == 45
+    pd.testing.assert_frame_equal(corpus_df, load_uncached_corpus(data_folder, tmp_path))
+
+
+def test_store_of_another_version_is_rebuilt(data_folder, cache_folder, parsed_files):
+    load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    manifest_path = get_corpus_cache_paths(str(data_folder), cache_folder)[1]
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump({**manifest, 'version': manifest['version'] - 1}, manifest_file)
+
+    load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+
+    assert len(parsed_files) == 6
+
+
+def test_columns_are_read_from_the_store(data_folder, cache_folder):
+    corpus_df = load_reviews_corpus(str(data_folder), columns=[HOTEL_NAME_COLUMN, 'Rating'], cache_folder=cache_folder)
+
+    assert list(corpus_df.columns) == [HOTEL_NAME_COLUMN, 'Rating']
+    assert isinstance(corpus_df[HOTEL_NAME_COLUMN].dtype, pd.CategoricalDtype)
+
+
+def test_british_spellings_are_normalized(data_folder, cache_folder):
+    file_path = data_folder / 'processed_reviews_Hotel_0.csv'
+    hotel_reviews_df = pd.read_csv(file_path)
+    hotel_reviews_df['Traveler Type'] = 'Solo traveller'
+    hotel_reviews_df.rename(columns={'Traveler Type': 'Traveller Type'}).to_csv(file_path, index=False)
+
+    corpus_df = load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+
+    assert 'Traveller Type' not in corpus_df.columns
+    hotel_0_traveler_types = corpus_df.loc[corpus_df[SOURCE_FILE_COLUMN] == file_path.name, 'Traveler Type']
+    assert (hotel_0_traveler_types == 'Solo traveler').all()
+
+
+def test_folder_without_data_files(tmp_path, cache_folder):
+    empty_folder = tmp_path / 'empty'
+    empty_folder.mkdir()
+
+    corpus_df = load_reviews_corpus(str(empty_folder), columns=[HOTEL_NAME_COLUMN, 'Rating'],
+                                    cache_folder=cache_folder)
+
+    assert corpus_df.empty
+    assert list(corpus_df.columns) == [HOTEL_NAME_COLUMN, 'Rating']
+    assert list(iter_hotel_reviews(str(empty_folder), cache_folder=cache_folder)) == []
+    assert load_corpus_manifest(str(empty_folder), cache_folder) == {'files': {}, 'parse_errors': {},
+                                                                     'raw_footprints': {}}
+    assert not os.path.exists(cache_folder)
+
+
+def test_folder_whose_data_files_were_all_deleted(data_folder, cache_folder):
+    load_reviews_corpus(str(data_folder), cache_folder=cache_folder)
+    for file_name in os.listdir(data_folder):
+        os.remove(data_folder / file_name)
+
+    assert load_reviews_corpus(str(data_folder), cache_folder=cache_folder).empty
+    assert load_corpus_parse_errors(str(data_folder), cache_folder) == {}
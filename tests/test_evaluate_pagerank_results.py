@@ -0,0 +1,87 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'pagerank_reviews'))
+from evaluate_pagerank_results import (TOPIC_SENTIMENT_COLUMNS, TOPICS, calculate_differences,  # noqa: E402
+                                       calculate_differences_vectorized, calculate_indicativeness_scores,
+                                       calculate_indicativeness_scores_of_subsets, sample_random_index_sets)
+
+
+def make_hotel_reviews_df(seed: int, num_reviews: int, topic_flag_density: float = 0.3) -> pd.DataFrame:
+    """
+    Makes the PageRank-sorted, topic-classified reviews of a hotel with random 0/1 (topic, sentiment) flags.
+    """
+
+    rng = np.random.default_rng(seed)
+    topic_flags = (rng.random((num_reviews, len(TOPIC_SENTIMENT_COLUMNS))) < topic_flag_density).astype(np.int64)
+    return pd.DataFrame(topic_flags, columns=TOPIC_SENTIMENT_COLUMNS)
+
+
+@pytest.mark.parametrize('num_reviews, sample_size', [(50, 10), (10, 10), (7, 1)])
+def test_floyd_sampling_draws_distinct_indices(num_reviews, sample_size):
+    index_sets = sample_random_index_sets(np.random.default_rng(0), num_reviews, sample_size, 1000)
+
+    assert index_sets.shape == (1000, sample_size)
+    assert index_sets.min() >= 0 and index_sets.max() < num_reviews
+    assert all(len(set(index_set)) == sample_size for index_set in index_sets.tolist())
+
+
+def test_floyd_sampling_is_uniform_over_subsets():
+    num_iterations = 30000
+    index_sets = sample_random_index_sets(np.random.default_rng(0), 6, 3, num_iterations)
+
+    subset_counts = pd.Series([tuple(sorted(index_set)) for index_set in index_sets.tolist()]).value_counts()
+
+    # 20 equally likely subsets: each count is ~ 1500 +- 38 (standard deviation).
+    assert set(subset_counts.index) == set(itertools.combinations(range(6), 3))
+    assert (subset_counts - num_iterations / 20).abs().max() < 200
+
+
+def test_floyd_sampling_is_seeded():
+    np.testing.assert_array_equal(sample_random_index_sets(np.random.default_rng(1), 40, 10, 100),
+                                  sample_random_index_sets(np.random.default_rng(1), 40, 10, 100))
+
+
+def test_subset_scores_match_loop_scores():
+    hotel_reviews_df = make_hotel_reviews_df(0, 80)
+    index_sets = sample_random_index_sets(np.random.default_rng(0), 80, 10, 50)
+
+    subsets_scores = calculate_indicativeness_scores_of_subsets(
+        hotel_reviews_df[TOPIC_SENTIMENT_COLUMNS].to_numpy(dtype=np.int8), index_sets)
+
+    for index_set, subset_scores in zip(index_sets, subsets_scores):
+        expected_scores = calculate_indicativeness_scores(hotel_reviews_df.iloc[index_set])
+        np.testing.assert_allclose(subset_scores, [expected_scores[topic] for topic in TOPICS])
+
+
+def test_vectorized_differences_match_loop_differences():
+    hotels_reviews_dfs = [make_hotel_reviews_df(seed, num_reviews) for seed, num_reviews in enumerate([30, 80, 200])]
+
+    differences_top_10, differences_random_10 = calculate_differences(hotels_reviews_dfs, num_random_iterations=500)
+    vectorized_top_10, vectorized_random_10 = calculate_differences_vectorized(
+        hotels_reviews_dfs, sample_sizes=(10,), num_random_iterations=500)[10]
+
+    for topic in TOPICS:
+        np.testing.assert_allclose(vectorized_top_10[topic], differences_top_10[topic])
+        # The random subsets differ, but the average errors agree up to the sampling noise.
+        assert len(vectorized_random_10[topic]) == len(differences_random_10[topic])
+        assert np.mean(vectorized_random_10[topic]) == pytest.approx(np.mean(differences_random_10[topic]), abs=0.05)
+
+
+def test_vectorized_differences_of_hotels_smaller_than_the_sample():
+    hotels_reviews_dfs = [make_hotel_reviews_df(0, 4), make_hotel_reviews_df(1, 30)]
+
+    differences = calculate_differences_vectorized(hotels_reviews_dfs, sample_sizes=(5, 10), num_random_iterations=20)
+
+    # The 4 reviews of the small hotel are all its reviews, so they estimate its scores exactly.
+    for sample_size in (5, 10):
+        differences_top_k, differences_random_k = differences[sample_size]
+        for topic in TOPICS:
+            assert differences_top_k[topic][0] == 0
+            np.testing.assert_array_equal(differences_random_k[topic][:20], 0)
+            assert len(differences_random_k[topic]) == 40
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'topic_indicativeness_scores'))
+import extract_topics_tfidf  # noqa: E402
+from extract_topics_tfidf import (TOPIC_MODEL_ARRAYS_FILE_NAME, WHITESPACE_TOKENIZER, WORD_TOKENIZER,  # noqa: E402
+                                  load_topic_model, save_topic_model, transform)
+
+
+def split_words(text: str) -> list[str]:
+    """
+    Stands in for `word_tokenize`, which needs the NLTK punkt data.
+    """
+
+    return text.replace('.', ' . ').split()
+
+
+def make_topic_model(tokenizer: str) -> dict[str, np.ndarray]:
+    return {'vocabulary': np.array(['great', 'staff']), 'idf': np.ones(2), 'components': np.eye(2),
+            'tokenizer': tokenizer}
+
+
+@pytest.mark.parametrize('tokenizer, expected_staff_score', [(WORD_TOKENIZER, np.sqrt(0.5)),
+                                                             (WHITESPACE_TOKENIZER, 0)])
+def test_sentences_are_tokenized_as_the_model_was_fitted(tokenizer, expected_staff_score, tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_topics_tfidf, 'word_tokenize', split_words)
+    save_topic_model(make_topic_model(tokenizer), str(tmp_path))
+
+    topic_model = load_topic_model(str(tmp_path))
+    reduced_sentences = transform(['Great staff.'], topic_model, preprocess=False)
+
+    assert topic_model['tokenizer'] == tokenizer
+    assert reduced_sentences[0, 1] == pytest.approx(expected_staff_score)
+
+
+def test_model_without_tokenizer_is_rejected(tmp_path):
+    save_topic_model(make_topic_model(WORD_TOKENIZER), str(tmp_path))
+    np.savez(os.path.join(tmp_path, TOPIC_MODEL_ARRAYS_FILE_NAME), idf=np.ones(2), components=np.eye(2))
+
+    with pytest.raises(ValueError, match='does not record its tokenizer'):
+        load_topic_model(str(tmp_path))
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'topic_indicativeness_scores'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+from indicativeness_results import (build_cumulative_topic_counts, calculate_decayed_sentiment_ratio,  # noqa: E402
+                                    calculate_sentiment_ratio, calculate_time_aware_sentiment_ratios,
+                                    calculate_windowed_sentiment_ratio, find_latest_review_date,
+                                    parse_review_dates)
+from synthetic_corpus import TOPIC_WORDS, generate_hotel_reviews  # noqa: E402
+
+TOPICS = list(TOPIC_WORDS)
+REFERENCE_DATES = ['2020-06-01', '2021-01-01', '2022-03-15', '2023-12-31', '2025-01-01']
+
+
+@pytest.fixture
+def hotel_reviews_df():
+    hotel_reviews_df = generate_hotel_reviews(np.random.default_rng(0), 400)
+    # Some hotels write their dates as '21 August 2024', and some reviews have no valid date.
+    hotel_reviews_df.loc[::7, 'Review Date'] = (parse_review_dates(hotel_reviews_df['Review Date'].iloc[::7])
+                                                .dt.strftime('%d %B %Y'))
+    hotel_reviews_df.loc[::50, 'Review Date'] = 'not a date'
+    return hotel_reviews_df
+
+
+def brute_force_windowed_sentiment_ratio(hotel_reviews_df, window_days, reference_date) -> dict[str, list[float]]:
+    """
+    Sentiment ratios of the reviews of the window, filtered by date and passed to `calculate_sentiment_ratio`.
+    """
+
+    review_dates = parse_review_dates(hotel_reviews_df['Review Date'])
+    reference_date = pd.Timestamp(reference_date)
+    in_window = (review_dates > reference_date - pd.Timedelta(days=window_days)) & (review_dates <= reference_date)
+    return calculate_sentiment_ratio(hotel_reviews_df[in_window], TOPICS)
+
+
+def brute_force_decayed_sentiment_ratio(hotel_reviews_df, half_life_days, reference_date) -> dict[str, list[float]]:
+    """
+    Sentiment ratios of the reviews up to the reference date, each weighted by 2^(-age / half-life).
+    """
+
+    review_dates = parse_review_dates(hotel_reviews_df['Review Date'])
+    ages = (pd.Timestamp(reference_date) - review_dates).dt.days.to_numpy(dtype=np.float64)
+    weights = np.where(ages >= 0, np.exp2(-ages / half_life_days), 0)
+
+    sentiment_ratios = {}
+    for topic in TOPICS:
+        positive_count = np.sum(weights * hotel_reviews_df[f"{topic} - positive"].to_numpy())
+        negative_count = np.sum(weights * hotel_reviews_df[f"{topic} - negative"].to_numpy())
+        topic_count = positive_count + negative_count
+        sentiment_ratios[topic] = [(positive_count - negative_count) / topic_count if topic_count > 0 else 0]
+    return sentiment_ratios
+
+
+def assert_sentiment_ratios_equal(sentiment_ratios, expected_sentiment_ratios) -> None:
+    assert list(sentiment_ratios) == TOPICS
+    for topic in TOPICS:
+        np.testing.assert_allclose(sentiment_ratios[topic], expected_sentiment_ratios[topic], rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('reference_date', REFERENCE_DATES)
+@pytest.mark.parametrize('window_days', [1, 30, 90, 365, 10000])
+def test_windowed_ratio_matches_brute_force(hotel_reviews_df, window_days, reference_date):
+    cumulative_topic_counts = build_cumulative_topic_counts(hotel_reviews_df, TOPICS)
+
+    sentiment_ratios = calculate_windowed_sentiment_ratio(cumulative_topic_counts, TOPICS, window_days, reference_date)
+
+    assert_sentiment_ratios_equal(sentiment_ratios,
+                                  brute_force_windowed_sentiment_ratio(hotel_reviews_df, window_days, reference_date))
+
+
+@pytest.mark.parametrize('reference_date', REFERENCE_DATES)
+@pytest.mark.parametrize('half_life_days', [7, 90, 365])
+def test_decayed_ratio_matches_brute_force(hotel_reviews_df, half_life_days, reference_date):
+    cumulative_topic_counts = build_cumulative_topic_counts(hotel_reviews_df, TOPICS, (half_life_days,))
+
+    sentiment_ratios = calculate_decayed_sentiment_ratio(cumulative_topic_counts, TOPICS, half_life_days,
+                                                         reference_date)
+
+    assert_sentiment_ratios_equal(sentiment_ratios,
+                                  brute_force_decayed_sentiment_ratio(hotel_reviews_df, half_life_days, reference_date))
+
+
+def test_window_over_all_the_reviews_matches_the_overall_ratio(hotel_reviews_df):
+    valid_reviews_df = hotel_reviews_df[parse_review_dates(hotel_reviews_df['Review Date']).notna()]
+
+    time_aware_sentiment_ratios = calculate_time_aware_sentiment_ratios(hotel_reviews_df, TOPICS, '2030-01-01',
+                                                                        windows_days=(100000,))
+
+    assert_sentiment_ratios_equal(time_aware_sentiment_ratios['last 100000 days'],
+                                  calculate_sentiment_ratio(valid_reviews_df, TOPICS))
+    assert list(time_aware_sentiment_ratios) == ['last 100000 days', 'half-life 90 days', 'half-life 365 days']
+
+
+def test_ratios_of_hotel_without_dated_reviews(hotel_reviews_df):
+    hotel_reviews_df['Review Date'] = 'not a date'
+
+    time_aware_sentiment_ratios = calculate_time_aware_sentiment_ratios(hotel_reviews_df, TOPICS, '2024-01-01')
+
+    for sentiment_ratios in time_aware_sentiment_ratios.values():
+        assert sentiment_ratios == {topic: [0.0] for topic in TOPICS}
+
+
+def test_latest_review_date_skips_hotels_without_dated_reviews(hotel_reviews_df):
+    undated_reviews_df = hotel_reviews_df.assign(**{'Review Date': 'not a date'})
+    hotels_reviews = [('Undated', undated_reviews_df), ('Dated', hotel_reviews_df),
+                      ('Also undated', undated_reviews_df)]
+
+    assert find_latest_review_date(hotels_reviews) == parse_review_dates(hotel_reviews_df['Review Date']).max()
+    with pytest.raises(ValueError, match='No review has a valid date'):
+        find_latest_review_date([('Undated', undated_reviews_df)])
@@ -0,0 +1,129 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+from ingest_scrapes import ingest_scrape_file, ingest_scrapes, load_deltas, read_reviews_as_text  # noqa: E402
+from synthetic_corpus import RAW_REVIEWS_COLUMNS, generate_hotel_reviews  # noqa: E402
+
+
+@pytest.fixture
+def scraped_reviews_df():
+    return generate_hotel_reviews(np.random.default_rng(0), 60)[RAW_REVIEWS_COLUMNS]
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """
+    Empty scrapes, data and ingestion state folders.
+    """
+
+    folders = {name: tmp_path / name for name in ('scrapes', 'data', 'state')}
+    for folder in folders.values():
+        folder.mkdir()
+    return folders
+
+
+def scrape(reviews_df: pd.DataFrame, folders, file_name: str = 'reviews_Test_Hotel.csv') -> str:
+    """
+    Writes a scraped file of the given reviews.
+    """
+
+    scrape_file_path = str(folders['scrapes'] / file_name)
+    reviews_df.to_csv(scrape_file_path, index=False)
+    return scrape_file_path
+
+
+def ingest(scrape_file_path: str, folders) -> dict[str, object]:
+    return ingest_scrape_file(scrape_file_path, str(folders['data']), str(folders['state']), classified_folder=None)
+
+
+def read_data_file(folders) -> pd.DataFrame:
+    return read_reviews_as_text(str(folders['data'] / 'reviews_Test_Hotel.csv'))
+
+
+def test_repeated_scrape_is_ingested_once(scraped_reviews_df, folders):
+    scrape_file_path = scrape(scraped_reviews_df, folders)
+
+    first_delta = ingest(scrape_file_path, folders)
+    data_file_bytes = (folders['data'] / 'reviews_Test_Hotel.csv').read_bytes()
+    second_delta = ingest(scrape_file_path, folders)
+
+    assert (first_delta['num_new_reviews'], first_delta['first_new_row']) == (60, 0)
+    assert (second_delta['num_new_reviews'], second_delta['first_new_row']) == (0, 60)
+    assert (folders['data'] / 'reviews_Test_Hotel.csv').read_bytes() == data_file_bytes
+
+
+def test_overlapping_scrape_appends_only_the_new_reviews(scraped_reviews_df, folders):
+    ingest(scrape(scraped_reviews_df.iloc[:40], folders), folders)
+
+    delta = ingest(scrape(scraped_reviews_df.iloc[20:], folders), folders)
+
+    assert (delta['num_scraped_reviews'], delta['num_new_reviews'], delta['first_new_row']) == (40, 20, 40)
+    pd.testing.assert_frame_equal(read_data_file(folders),
+                                  read_reviews_as_text(scrape(scraped_reviews_df, folders, 'all_reviews.csv')))
+    assert ingest(scrape(scraped_reviews_df.sample(frac=1, random_state=0), folders), folders)['num_new_reviews'] == 0
+
+
+def test_extra_copies_of_identical_reviews_are_new(scraped_reviews_df, folders):
+    ingest(scrape(scraped_reviews_df.iloc[[0, 1]], folders), folders)
+
+    delta = ingest(scrape(scraped_reviews_df.iloc[[0, 0, 1, 0]], folders), folders)
+
+    assert delta['num_new_reviews'] == 2
+    assert len(read_data_file(folders)) == 4
+    assert ingest(scrape(scraped_reviews_df.iloc[[0, 0, 1, 0]], folders), folders)['num_new_reviews'] == 0
+
+
+def test_reviews_added_to_the_data_file_by_hand_are_known(scraped_reviews_df, folders):
+    ingest(scrape(scraped_reviews_df.iloc[:30], folders), folders)
+    # The stored keys are stale once the data file is modified outside of the ingestion.
+    with open(folders['data'] / 'reviews_Test_Hotel.csv', 'a', newline='', encoding='utf-8') as data_file:
+        scraped_reviews_df.iloc[30:35].to_csv(data_file, index=False, header=False)
+
+    delta = ingest(scrape(scraped_reviews_df.iloc[:40], folders), folders)
+
+    assert (delta['num_new_reviews'], delta['first_new_row']) == (5, 35)
+
+
+def test_reviews_are_appended_in_the_data_file_layout(scraped_reviews_df, folders):
+    # An older data file, with the British spelling of the traveler type and without a trailing newline.
+    data_file_path = folders['data'] / 'reviews_Test_Hotel.csv'
+    old_reviews_df = scraped_reviews_df.iloc[:10].rename(columns={'Traveler Type': 'Traveller Type'})
+    data_file_path.write_text(old_reviews_df.to_csv(index=False).rstrip('\n'), encoding='utf-8')
+
+    delta = ingest(scrape(scraped_reviews_df.iloc[5:20], folders), folders)
+
+    data_df = read_data_file(folders)
+    assert delta['num_new_reviews'] == 10
+    assert list(data_df.columns) == list(old_reviews_df.columns)
+    pd.testing.assert_frame_equal(
+        data_df.rename(columns={'Traveller Type': 'Traveler Type'}),
+        read_reviews_as_text(scrape(scraped_reviews_df.iloc[:20], folders, 'all_reviews.csv')))
+
+
+def test_scrapes_folder_records_deltas_and_failures(scraped_reviews_df, folders):
+    scrape(scraped_reviews_df, folders)
+    (folders['scrapes'] / 'reviews_Empty_Hotel.csv').write_text('', encoding='utf-8')
+    deltas_path = str(folders['state'] / 'deltas.jsonl')
+
+    deltas, failures = ingest_scrapes(str(folders['scrapes']), str(folders['data']), str(folders['state']),
+                                      classified_folder=None, deltas_path=deltas_path)
+    ingest_scrapes(str(folders['scrapes']), str(folders['data']), str(folders['state']), classified_folder=None,
+                   deltas_path=deltas_path)
+
+    assert [delta['num_new_reviews'] for delta in deltas] == [60]
+    assert list(failures) == ['reviews_Empty_Hotel.csv']
+    assert [delta['num_new_reviews'] for delta in load_deltas(deltas_path, 'Test_Hotel')] == [60, 0]
+
+
+def test_missing_scrapes_folder_ingests_nothing(folders, tmp_path):
+    deltas, failures = ingest_scrapes(str(tmp_path / 'no_scrapes'), str(folders['data']), str(folders['state']),
+                                      classified_folder=None, deltas_path=str(folders['state'] / 'deltas.jsonl'))
+
+    assert (deltas, failures) == ([], {})
+    assert os.listdir(folders['data']) == []
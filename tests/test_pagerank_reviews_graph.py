@@ -0,0 +1,197 @@
+import os
+import sys
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial.distance import pdist, squareform
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'pagerank_reviews'))
+from pagerank_reviews_graph import (PAGERANK_SCORE_COLUMN_NAME, TOPICS_COLUMNS, build_reviews_graph,  # noqa: E402
+                                    build_sparse_reviews_graph, calculate_pagerank_scores_by_signature,
+                                    extract_topic_sentiment_signatures,
+                                    extract_topic_sentiment_vectors_for_single_hotel, pagerank_power_iteration,
+                                    rank_hotel_reviews_file, refresh_pagerank_state, score_reviews_by_signature)
+
+TOLERANCE = 1e-10
+
+
+def make_hotel_reviews_df(seed: int, num_reviews: int, topic_flag_density: float = 0.2) -> pd.DataFrame:
+    """
+    Makes the topic-classified reviews of a hotel with random 0/1 (topic, sentiment) flags. Some reviews discuss no
+    topic, so the graph has isolated (dangling) nodes.
+    """
+
+    rng = np.random.default_rng(seed)
+    topic_flags = (rng.random((num_reviews, len(TOPICS_COLUMNS))) < topic_flag_density).astype(np.int64)
+    return pd.DataFrame(topic_flags, columns=TOPICS_COLUMNS)
+
+
+def networkx_pagerank_scores(hotel_reviews_df: pd.DataFrame) -> np.ndarray:
+    """
+    PageRank scores of the reviews computed as the original implementation does: a dense similarity matrix, a networkx
+    graph and `nx.pagerank`.
+    """
+
+    normalized_topic_matrix = extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df)
+    similarity_matrix = np.nan_to_num(1 - squareform(pdist(normalized_topic_matrix, 'cosine')))
+    scores = nx.pagerank(build_reviews_graph(similarity_matrix), weight='weight', tol=TOLERANCE)
+    return np.array([scores[review] for review in range(len(hotel_reviews_df))])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sparse_graph_matches_networkx_graph(seed):
+    hotel_reviews_df = make_hotel_reviews_df(seed, 150)
+    normalized_topic_matrix = extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df)
+    similarity_matrix = np.nan_to_num(1 - squareform(pdist(normalized_topic_matrix, 'cosine')))
+
+    adjacency = build_sparse_reviews_graph(normalized_topic_matrix)
+    expected_adjacency = nx.to_numpy_array(build_reviews_graph(similarity_matrix), nodelist=range(150))
+
+    np.testing.assert_allclose(adjacency.toarray(), expected_adjacency, atol=1e-12)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sparse_pagerank_matches_networkx_pagerank(seed):
+    hotel_reviews_df = make_hotel_reviews_df(seed, 150)
+    adjacency = build_sparse_reviews_graph(extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df))
+
+    scores, convergence_stats = pagerank_power_iteration(adjacency, tolerance=TOLERANCE)
+
+    assert convergence_stats['converged']
+    np.testing.assert_allclose(scores, networkx_pagerank_scores(hotel_reviews_df), atol=1e-9)
+    assert scores.sum() == pytest.approx(1.0)
+
+
+def test_pagerank_of_empty_graph():
+    scores, convergence_stats = pagerank_power_iteration(
+        build_sparse_reviews_graph(np.zeros((0, len(TOPICS_COLUMNS)))))
+
+    assert scores.shape == (0,)
+    assert convergence_stats['iterations'] == 0
+
+
+def test_pagerank_raises_when_not_converged():
+    adjacency = build_sparse_reviews_graph(
+        extract_topic_sentiment_vectors_for_single_hotel(make_hotel_reviews_df(0, 50)))
+
+    with pytest.raises(nx.PowerIterationFailedConvergence):
+        pagerank_power_iteration(adjacency, tolerance=0.0, max_iterations=3)
+
+
+def full_graph_pagerank_scores(hotel_reviews_df: pd.DataFrame, **pagerank_kwargs) -> np.ndarray:
+    """
+    PageRank scores of the reviews on the full (uncollapsed) sparse reviews graph.
+    """
+
+    adjacency = build_sparse_reviews_graph(extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df))
+    return pagerank_power_iteration(adjacency, **pagerank_kwargs)[0]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_collapsed_scores_match_full_graph(seed):
+    hotel_reviews_df = make_hotel_reviews_df(seed, 300)
+
+    scores, convergence_stats = calculate_pagerank_scores_by_signature(hotel_reviews_df, tolerance=TOLERANCE)
+
+    assert convergence_stats['converged']
+    np.testing.assert_allclose(scores, full_graph_pagerank_scores(hotel_reviews_df, tolerance=TOLERANCE), atol=1e-9)
+
+
+def test_collapsed_scores_match_full_graph_at_default_tolerance():
+    # Both iterations use the same convergence threshold, so they stop after the same number of iterations.
+    hotel_reviews_df = make_hotel_reviews_df(3, 300)
+
+    scores, convergence_stats = calculate_pagerank_scores_by_signature(hotel_reviews_df)
+    adjacency = build_sparse_reviews_graph(extract_topic_sentiment_vectors_for_single_hotel(hotel_reviews_df))
+    expected_scores, expected_convergence_stats = pagerank_power_iteration(adjacency)
+
+    assert convergence_stats['iterations'] == expected_convergence_stats['iterations']
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-12)
+
+
+def test_collapsed_scores_of_duplicated_reviews():
+    # Few distinct signatures, each shared by many reviews.
+    hotel_reviews_df = pd.concat([make_hotel_reviews_df(4, 5)] * 20, ignore_index=True)
+
+    scores, _ = calculate_pagerank_scores_by_signature(hotel_reviews_df, tolerance=TOLERANCE)
+
+    np.testing.assert_allclose(scores, full_graph_pagerank_scores(hotel_reviews_df, tolerance=TOLERANCE), atol=1e-9)
+
+
+def test_collapsed_scores_of_hotel_without_reviews():
+    scores, convergence_stats = calculate_pagerank_scores_by_signature(make_hotel_reviews_df(0, 0))
+
+    assert scores.shape == (0,)
+    assert convergence_stats['converged']
+
+
+def test_incremental_refreshes_match_full_recompute():
+    hotel_reviews_df = make_hotel_reviews_df(5, 400)
+
+    pagerank_state = None
+    for start in range(0, 400, 50):
+        pagerank_state, convergence_stats = refresh_pagerank_state(pagerank_state,
+                                                                   hotel_reviews_df.iloc[start:start + 50])
+        assert convergence_stats['converged']
+    scores = score_reviews_by_signature(pagerank_state['signature_scores'], pagerank_state['signature_counts'],
+                                        extract_topic_sentiment_signatures(hotel_reviews_df))
+
+    np.testing.assert_allclose(scores, full_graph_pagerank_scores(hotel_reviews_df, tolerance=TOLERANCE), atol=1e-7)
+    assert pagerank_state['signature_counts'].sum() == 400
+
+
+def rank_hotel_reviews(hotel_reviews_df: pd.DataFrame, folder) -> tuple[pd.DataFrame, dict[str, float]]:
+    """
+    Writes the reviews of a hotel to a data file and ranks it incrementally, with a state folder.
+    :return: the saved PageRank results (in data file order) and the stats of the hotel.
+    """
+
+    hotel_reviews_df.to_csv(folder / 'data' / 'processed_reviews_Test_Hotel.csv', index=False)
+    stats = rank_hotel_reviews_file('processed_reviews_Test_Hotel.csv', str(folder / 'data'), str(folder / 'results'),
+                                    str(folder / 'state'))
+    return pd.read_csv(folder / 'results' / 'pagerank_processed_reviews_Test_Hotel.csv'), stats
+
+
+@pytest.fixture
+def pagerank_folder(tmp_path):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'results').mkdir()
+    return tmp_path
+
+
+def expected_results_scores(hotel_reviews_df: pd.DataFrame) -> np.ndarray:
+    """
+    Exact PageRank scores of the reviews, sorted as the saved results are.
+    """
+
+    return np.sort(full_graph_pagerank_scores(hotel_reviews_df, tolerance=TOLERANCE))[::-1]
+
+
+def test_appended_reviews_refresh_the_stored_state(pagerank_folder):
+    hotel_reviews_df = make_hotel_reviews_df(6, 300)
+
+    _, stats = rank_hotel_reviews(hotel_reviews_df.iloc[:200], pagerank_folder)
+    assert stats['new_reviews'] == 200
+
+    results_df, stats = rank_hotel_reviews(hotel_reviews_df, pagerank_folder)
+    assert stats['new_reviews'] == 100
+    np.testing.assert_allclose(results_df[PAGERANK_SCORE_COLUMN_NAME], expected_results_scores(hotel_reviews_df),
+                               atol=1e-7)
+
+
+@pytest.mark.parametrize('rewrite', ['shuffled', 'truncated'])
+def test_rewritten_data_file_falls_back_to_full_recompute(pagerank_folder, rewrite):
+    hotel_reviews_df = make_hotel_reviews_df(7, 300)
+    rank_hotel_reviews(hotel_reviews_df, pagerank_folder)
+
+    if rewrite == 'shuffled':
+        hotel_reviews_df = hotel_reviews_df.sample(frac=1, random_state=0).reset_index(drop=True)
+    else:
+        hotel_reviews_df = hotel_reviews_df.iloc[:250]
+    results_df, stats = rank_hotel_reviews(hotel_reviews_df, pagerank_folder)
+
+    assert stats['new_reviews'] == len(hotel_reviews_df)
+    np.testing.assert_allclose(results_df[PAGERANK_SCORE_COLUMN_NAME], expected_results_scores(hotel_reviews_df),
+                               atol=1e-7)
@@ -0,0 +1,91 @@
+from collections import Counter
+import os
+import runpy
+import sys
+
+import nltk.corpus
+import nltk.tokenize
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'topic_indicativeness_scores'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+import corpus_store  # noqa: E402
+import plot_word_clouds  # noqa: E402
+import plotting  # noqa: E402
+from synthetic_corpus import RAW_REVIEWS_COLUMNS, generate_hotel_reviews  # noqa: E402
+
+PLOT_WORD_CLOUDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                                     'topic_indicativeness_scores', 'plot_word_clouds.py')
+STOP_WORDS = ['the', 'was', 'and', 'we', 'our', 'very']
+
+
+class StubStopWords:
+    """
+    Stands in for the NLTK stop words corpus, which needs a separate download.
+    """
+
+    @staticmethod
+    def words(language: str) -> list[str]:
+        return STOP_WORDS
+
+
+def split_words(text: str) -> list[str]:
+    """
+    Stands in for `word_tokenize`, which needs the NLTK punkt data.
+    """
+
+    return text.replace('.', ' . ').split()
+
+
+@pytest.fixture(autouse=True)
+def nltk_stubs(monkeypatch):
+    monkeypatch.setattr(nltk.corpus, 'stopwords', StubStopWords)
+    monkeypatch.setattr(nltk.tokenize, 'word_tokenize', split_words)
+    monkeypatch.setattr(plot_word_clouds, 'stopwords', StubStopWords)
+    monkeypatch.setattr(plot_word_clouds, 'word_tokenize', split_words)
+    plot_word_clouds.get_stop_words.cache_clear()
+    yield
+    plot_word_clouds.get_stop_words.cache_clear()
+
+
+@pytest.fixture
+def data_folder(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for hotel_index in range(3):
+        generate_hotel_reviews(rng, 30)[RAW_REVIEWS_COLUMNS].to_csv(folder / f"reviews_Hotel_{hotel_index}.csv",
+                                                                    index=False)
+    return folder
+
+
+def test_joined_texts_match_the_streamed_word_frequencies(data_folder, tmp_path):
+    positive_text, negative_text = plot_word_clouds.join_reviews_texts(str(data_folder),
+                                                                       str(tmp_path / 'corpus_cache'))
+    word_frequencies = plot_word_clouds.calculate_word_frequencies(str(data_folder),
+                                                                   frequencies_folder=str(tmp_path / 'frequencies'))
+
+    assert Counter(positive_text.split()) == word_frequencies['positive']
+    assert Counter(negative_text.split()) == word_frequencies['negative']
+    assert 'the' not in word_frequencies['positive'] and word_frequencies['positive']
+
+
+def test_default_mode_plots_the_word_clouds(data_folder, tmp_path, monkeypatch):
+    # The script reads ../data and writes ../plots relative to its working directory.
+    (tmp_path / 'topic_indicativeness_scores').mkdir()
+    (tmp_path / 'plots' / 'topic_indicativeness_scores').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / 'topic_indicativeness_scores')
+    monkeypatch.setattr(sys, 'argv', [PLOT_WORD_CLOUDS_PATH])
+    monkeypatch.setattr(plotting, 'render_only', True)
+    store_paths = corpus_store.get_corpus_cache_paths(os.path.join(os.pardir, 'data'), corpus_store.CORPUS_CACHE_FOLDER)
+
+    try:
+        runpy.run_path(PLOT_WORD_CLOUDS_PATH, run_name='__main__')
+    finally:
+        for store_path in store_paths:
+            if os.path.exists(store_path):
+                os.remove(store_path)
+
+    assert (tmp_path / 'plots' / 'topic_indicativeness_scores' / 'reviews_word_clouds.png').exists()
@@ -0,0 +1,136 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'recommendation'))
+from ranking_service import (HotelRankingService, generate_random_user_rankings,  # noqa: E402
+                             generate_synthetic_sentiment_data)
+from topk_index import ThresholdTopKIndex  # noqa: E402
+
+NUM_HOTELS = 2000
+NUM_TOPICS = 5
+
+
+def make_topic_scores(seed: int, num_hotels: int = NUM_HOTELS) -> np.ndarray:
+    """
+    Makes random topic scores in [-1, 1], rounded so that many hotels tie.
+    """
+
+    return np.round(np.random.default_rng(seed).uniform(-1, 1, size=(num_hotels, NUM_TOPICS)), 1)
+
+
+def brute_force_top_k_scores(topic_scores: np.ndarray, weights: np.ndarray, k: int, rows=None) -> np.ndarray:
+    """
+    Scores of the top-k hotels (among the given rows), found by scoring and sorting all of them.
+    """
+
+    rows = np.arange(len(topic_scores)) if rows is None else rows
+    return np.sort(topic_scores[rows] @ weights)[::-1][:k]
+
+
+def assert_top_k_equal(topic_scores, weights, top_rows, top_scores, expected_scores, allowed_rows=None) -> None:
+    """
+    Checks the top-k scores against brute force. Ties can be broken either way, so the rows are only checked to be
+    distinct, allowed, and to score what the index says.
+    """
+
+    np.testing.assert_allclose(top_scores, expected_scores, atol=1e-12)
+    np.testing.assert_allclose(topic_scores[top_rows] @ weights, top_scores, atol=1e-12)
+    assert len(set(top_rows.tolist())) == len(top_rows)
+    if allowed_rows is not None:
+        assert np.isin(top_rows, allowed_rows).all()
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('k', [1, 3, 50, NUM_HOTELS + 10])
+def test_index_matches_brute_force(seed, k):
+    topic_scores = make_topic_scores(seed)
+    index = ThresholdTopKIndex(topic_scores)
+    rng = np.random.default_rng(seed + 100)
+
+    for weights in [rng.integers(0, 6, size=NUM_TOPICS).astype(float) for _ in range(10)] + [np.eye(NUM_TOPICS)[0]]:
+        top_rows, top_scores = index.query(weights, k)
+        assert_top_k_equal(topic_scores, weights, top_rows, top_scores,
+                           brute_force_top_k_scores(topic_scores, weights, k))
+
+
+@pytest.mark.parametrize('num_rows', [20, 1500])
+def test_index_matches_brute_force_on_hotel_subsets(num_rows):
+    # A small subset is scored directly; a large one is searched through the lists.
+    topic_scores = make_topic_scores(3)
+    index = ThresholdTopKIndex(topic_scores)
+    rows = np.sort(np.random.default_rng(3).choice(NUM_HOTELS, size=num_rows, replace=False))
+    weights = np.array([5.0, 0.0, 2.0, 1.0, 0.0])
+
+    top_rows, top_scores = index.query(weights, 10, rows)
+
+    assert_top_k_equal(topic_scores, weights, top_rows, top_scores,
+                       brute_force_top_k_scores(topic_scores, weights, 10, rows), rows)
+
+
+def test_index_matches_brute_force_by_city():
+    topic_scores = make_topic_scores(4)
+    hotel_cities = np.random.default_rng(4).choice(['London', 'Paris', 'Rome', 'Madrid'], size=NUM_HOTELS)
+    index = ThresholdTopKIndex(topic_scores, hotel_cities)
+    weights = np.array([1.0, 3.0, 0.0, 2.0, 4.0])
+    city_rows = np.flatnonzero(np.isin(hotel_cities, ['London', 'Rome']))
+
+    top_rows, top_scores = index.query(weights, 25, cities=['London', 'Rome', 'Atlantis'])
+    assert_top_k_equal(topic_scores, weights, top_rows, top_scores,
+                       brute_force_top_k_scores(topic_scores, weights, 25, city_rows), city_rows)
+
+    rows = np.arange(0, NUM_HOTELS, 3)
+    top_rows, top_scores = index.query(weights, 25, rows, cities=['London', 'Rome'])
+    allowed_rows = np.intersect1d(rows, city_rows)
+    assert_top_k_equal(topic_scores, weights, top_rows, top_scores,
+                       brute_force_top_k_scores(topic_scores, weights, 25, allowed_rows), allowed_rows)
+
+
+def test_index_with_zero_weights():
+    topic_scores = make_topic_scores(5)
+
+    top_rows, top_scores = ThresholdTopKIndex(topic_scores).query(np.zeros(NUM_TOPICS), 4)
+
+    assert len(top_rows) == 4
+    np.testing.assert_array_equal(top_scores, 0)
+
+
+def test_index_rejects_negative_weights():
+    with pytest.raises(ValueError):
+        ThresholdTopKIndex(make_topic_scores(6)).query(np.array([1.0, -1.0, 0.0, 0.0, 0.0]), 3)
+
+
+@pytest.mark.parametrize('cities', [None, ['City_0', 'City_3']])
+def test_service_index_matches_brute_force(cities):
+    service = HotelRankingService(generate_synthetic_sentiment_data(3000, num_cities=10, seed=7))
+    user_rankings = generate_random_user_rankings(20, seed=7)
+
+    brute_force_rankings = service.top_k_batch(user_rankings, k=10, cities=cities)
+    index_rankings = service.top_k_batch(user_rankings, k=10, cities=cities, use_index=True)
+
+    for brute_force_ranking, index_ranking in zip(brute_force_rankings, index_rankings):
+        np.testing.assert_allclose([score for _, score in index_ranking],
+                                   [score for _, score in brute_force_ranking], atol=1e-12)
+        assert [hotel_name for hotel_name, _ in index_ranking] == [hotel_name for hotel_name, _ in brute_force_ranking]
+
+
+def test_service_rejects_unknown_cities():
+    service = HotelRankingService(generate_synthetic_sentiment_data(100, num_cities=3))
+
+    for use_index in (False, True):
+        with pytest.raises(ValueError, match='Unknown cities: Atlantis'):
+            service.top_k(generate_random_user_rankings(1)[0], cities=['City_0', 'Atlantis'], use_index=use_index)
+
+
+def test_saved_catalog_starts_the_same_service(tmp_path):
+    service = HotelRankingService(generate_synthetic_sentiment_data(200, num_cities=4, seed=8))
+    catalog_path = str(tmp_path / 'ranking_catalog.csv')
+
+    service.save_catalog(catalog_path)
+    catalog_service = HotelRankingService.from_csv(catalog_path)
+
+    np.testing.assert_allclose(catalog_service.topic_scores, service.topic_scores, atol=1e-12)
+    np.testing.assert_array_equal(catalog_service.hotel_names, service.hotel_names)
+    np.testing.assert_array_equal(catalog_service.hotel_cities, service.hotel_cities)
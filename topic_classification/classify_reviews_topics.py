@@ -0,0 +1,245 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score
+from sklearn.model_selection import GroupShuffleSplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import (DATA_FOLDER_PATH, HOTEL_NAME_COLUMN, TOPIC_CLASSIFIED_DATA_FOLDER,  # noqa: E402
+                          TOPICS_COLUMNS, hotel_name_from_file_name, load_reviews_corpus)
+from review_schema import COLUMN_NAME_ALIASES  # noqa: E402
+
+TOPIC_CLASSIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topic_classifier.npz')
+CLASSIFIED_FILE_PREFIX = 'processed_reviews_'
+REVIEW_TEXT_COLUMNS = ['Positive Reviews', 'Negative Reviews']
+CLASSIFIER_NUM_FEATURES = 2 ** 18
+CLASSIFIER_REGULARIZATION = 4.0
+CLASSIFICATION_BATCH_SIZE = 5000
+
+
+def get_review_vectorizer(num_features: int = CLASSIFIER_NUM_FEATURES) -> HashingVectorizer:
+    """
+    Gets the (stateless) vectorizer of the review texts: unigrams and bigrams hashed into num_features buckets.
+    :param num_features: number of hash buckets.
+    :return: the hashing vectorizer.
+    """
+
+    return HashingVectorizer(n_features=num_features, ngram_range=(1, 2), alternate_sign=False, norm='l2')
+
+
+def review_texts_to_documents(df: pd.DataFrame) -> list[str]:
+    """
+    Joins the positive and negative texts of each review into a single document, where every word of the negative
+    text is marked, so that the classifier can tell 'breakfast' in a positive text from 'breakfast' in a negative one.
+    :param df: dataframe of hotel reviews.
+    :return: one document per review.
+    """
+
+    positive_texts = df['Positive Reviews'].fillna('').astype(str)
+    negative_texts = df['Negative Reviews'].fillna('').astype(str).str.lower().str.replace(
+        r'(\w+)', r'neg_\1', regex=True)
+    return (positive_texts + ' ' + negative_texts).tolist()
+
+
+def train_topic_classifier(
+        folder_path: str = TOPIC_CLASSIFIED_DATA_FOLDER,
+        holdout_fraction: float = 0.2,
+        seed: int = 0
+) -> tuple[dict[str, np.ndarray], dict[str, float]]:
+    """
+    Trains one linear (logistic regression) classifier per (topic, sentiment) column on the labelled hotel data files.
+    The classifiers are first evaluated on a held out fraction of the hotels, then refitted on all of them.
+    :param folder_path: path to folder of topic-classified hotel data files.
+    :param holdout_fraction: fraction of the hotels held out for the evaluation.
+    :param seed: seed of the hotels split.
+    :return: the classifier, as a mapping with the 'coefficients' (n_topic_columns x n_features) and 'intercepts'
+     (n_topic_columns) of the linear models; and the F1 score of each (topic, sentiment) column on the held out hotels.
+    """
+
+    corpus_df = load_reviews_corpus(folder_path, columns=[HOTEL_NAME_COLUMN, *REVIEW_TEXT_COLUMNS, *TOPICS_COLUMNS])
+    features = get_review_vectorizer().transform(review_texts_to_documents(corpus_df))
+    labels = corpus_df[TOPICS_COLUMNS].to_numpy()
+
+    splitter = GroupShuffleSplit(n_splits=1, test_size=holdout_fraction, random_state=seed)
+    train_rows, holdout_rows = next(splitter.split(features, groups=corpus_df[HOTEL_NAME_COLUMN]))
+
+    holdout_f1_scores = {}
+    coefficients = np.zeros((len(TOPICS_COLUMNS), features.shape[1]), dtype=np.float32)
+    intercepts = np.zeros(len(TOPICS_COLUMNS), dtype=np.float32)
+    for i, column in enumerate(TOPICS_COLUMNS):
+        model = LogisticRegression(C=CLASSIFIER_REGULARIZATION, solver='liblinear')
+        model.fit(features[train_rows], labels[train_rows, i])
+        holdout_f1_scores[column] = f1_score(labels[holdout_rows, i], model.predict(features[holdout_rows]))
+
+        model.fit(features, labels[:, i])
+        coefficients[i] = model.coef_[0]
+        intercepts[i] = model.intercept_[0]
+
+    return {'coefficients': coefficients, 'intercepts': intercepts}, holdout_f1_scores
+
+
+def save_topic_classifier(classifier: dict[str, np.ndarray], classifier_path: str = TOPIC_CLASSIFIER_PATH) -> None:
+    """
+    Saves the linear classifier to a .npz file.
+    :param classifier: mapping with the 'coefficients' and 'intercepts' of the linear models.
+    :param classifier_path: path of the classifier file.
+    """
+
+    np.savez_compressed(classifier_path, **classifier)
+
+
+@lru_cache(maxsize=1)
+def load_topic_classifier(classifier_path: str = TOPIC_CLASSIFIER_PATH) -> dict[str, np.ndarray]:
+    """
+    Loads the linear classifier saved by `save_topic_classifier` (once per process).
+    :param classifier_path: path of the classifier file.
+    :return: mapping with the 'coefficients' and 'intercepts' of the linear models.
+    """
+
+    with np.load(classifier_path) as classifier_arrays:
+        return {'coefficients': classifier_arrays['coefficients'], 'intercepts': classifier_arrays['intercepts']}
+
+
+def classify_reviews(
+        df: pd.DataFrame,
+        classifier: dict[str, np.ndarray],
+        batch_size: int = CLASSIFICATION_BATCH_SIZE
+) -> pd.DataFrame:
+    """
+    Tags the reviews with the (topic, sentiment) columns, in batches of reviews.
+    :param df: dataframe of hotel reviews, with positive and negative review texts.
+    :param classifier: mapping with the 'coefficients' and 'intercepts' of the linear models.
+    :param batch_size: number of reviews vectorized at a time.
+    :return: the reviews, with a 0/1 column per (topic, sentiment) appended.
+    """
+
+    vectorizer = get_review_vectorizer(classifier['coefficients'].shape[1])
+    topic_flags = np.zeros((len(df), len(TOPICS_COLUMNS)), dtype=np.int64)
+
+    for batch_start in range(0, len(df), batch_size):
+        batch_df = df.iloc[batch_start:batch_start + batch_size]
+        features = vectorizer.transform(review_texts_to_documents(batch_df))
+        decision_values = features @ classifier['coefficients'].T + classifier['intercepts']
+        topic_flags[batch_start:batch_start + len(batch_df)] = decision_values > 0
+
+    # Reviews without any text discuss no topic.
+    topic_flags[df[REVIEW_TEXT_COLUMNS].isna().all(axis=1).to_numpy()] = 0
+    return pd.concat([df, pd.DataFrame(topic_flags, columns=TOPICS_COLUMNS, index=df.index)], axis=1)
+
+
+def classify_hotel_reviews_file(
+        file_name: str,
+        input_folder: str,
+        output_folder: str,
+        classifier_path: str = TOPIC_CLASSIFIER_PATH,
+        extend_existing_output: bool = False
+) -> tuple[str, int, float]:
+    """
+    Classifies the reviews of a single raw hotel data file (the unit of work sent to each process by
+    `run_classification_batch`), and writes them to the topic-classified data folder.
+    :param file_name: name of the raw hotel data file, e.g. 'reviews_Hotel_Boss.csv'.
+    :param input_folder: path to folder of raw hotel data files.
+    :param output_folder: path to folder of topic-classified hotel data files.
+    :param classifier_path: path of the classifier file.
+    :param extend_existing_output: whether to keep the rows of an existing topic-classified file (such as a labelled
+     file), and only classify and append the raw rows beyond them. The raw file is assumed to be append-only.
+    :return: name of the hotel, number of classified reviews and seconds spent classifying them.
+    """
+
+    start_time = time.perf_counter()
+    hotel_name = hotel_name_from_file_name(file_name)
+    output_path = os.path.join(output_folder, f"{CLASSIFIED_FILE_PREFIX}{hotel_name}.csv")
+
+    df = pd.read_csv(os.path.join(input_folder, file_name))
+    if not extend_existing_output or not os.path.exists(output_path):
+        classified_df = classify_reviews(df, load_topic_classifier(classifier_path))
+        classified_df.to_csv(output_path, index=False)
+        return hotel_name, len(df), time.perf_counter() - start_time
+
+    num_classified_rows = len(pd.read_csv(output_path, usecols=[0]))
+    new_reviews_df = df.iloc[num_classified_rows:]
+    if len(new_reviews_df):
+        header = pd.read_csv(output_path, nrows=0).columns
+        # The raw and topic-classified files may spell some columns differently.
+        column_names = {column: alias for alias, column in COLUMN_NAME_ALIASES.items() if alias in header}
+        classified_df = classify_reviews(new_reviews_df, load_topic_classifier(classifier_path))
+        classified_df.rename(columns=COLUMN_NAME_ALIASES).rename(columns=column_names).reindex(columns=header).to_csv(
+            output_path, mode='a', header=False, index=False)
+    return hotel_name, len(new_reviews_df), time.perf_counter() - start_time
+
+
+def run_classification_batch(
+        input_folder: str,
+        output_folder: str,
+        num_workers: int,
+        overwrite: bool = False,
+        classifier_path: str = TOPIC_CLASSIFIER_PATH
+) -> tuple[list[tuple[str, int, float]], dict[str, str]]:
+    """
+    Classifies the raw hotel data files in parallel, one hotel per task, largest files first. By default, hotels that
+    already have a topic-classified file (such as the labelled files the classifier is trained on) are skipped.
+    A failing hotel is recorded and does not abort the batch.
+    :param input_folder: path to folder of raw hotel data files.
+    :param output_folder: path to folder of topic-classified hotel data files.
+    :param num_workers: number of worker processes.
+    :param overwrite: whether to classify again hotels that already have a topic-classified file.
+    :param classifier_path: path of the classifier file.
+    :return: (hotel name, number of reviews, seconds) of each classified hotel; and mapping between each failed file
+     and its error.
+    """
+
+    file_names = [
+        file_name for file_name in os.listdir(input_folder) if file_name.endswith('.csv') and (overwrite or not (
+            os.path.exists(os.path.join(output_folder,
+                                        f"{CLASSIFIED_FILE_PREFIX}{hotel_name_from_file_name(file_name)}.csv"))))
+    ]
+    file_names.sort(key=lambda name: os.path.getsize(os.path.join(input_folder, name)), reverse=True)
+    os.makedirs(output_folder, exist_ok=True)
+
+    hotel_stats, failures = [], {}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(classify_hotel_reviews_file, file_name, input_folder, output_folder,
+                                   classifier_path): file_name for file_name in file_names}
+        for future in as_completed(futures):
+            try:
+                hotel_stats.append(future.result())
+            except Exception as e:
+                failures[futures[future]] = repr(e)
+
+    return hotel_stats, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tags the raw hotel reviews with their (topic, sentiment) columns.')
+    parser.add_argument('--train', action='store_true',
+                        help='train the classifier on the topic-classified data files before classifying')
+    parser.add_argument('--input-folder', default=DATA_FOLDER_PATH, help='folder of raw hotel data files')
+    parser.add_argument('--output-folder', default=TOPIC_CLASSIFIED_DATA_FOLDER,
+                        help='folder of topic-classified hotel data files')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='classify again hotels that already have a topic-classified file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args()
+
+    if args.train or not os.path.exists(TOPIC_CLASSIFIER_PATH):
+        classifier, holdout_f1_scores = train_topic_classifier()
+        save_topic_classifier(classifier)
+        for column, score in holdout_f1_scores.items():
+            print(f"{column}: held out F1 = {score:.3f}")
+
+    hotel_stats, failures = run_classification_batch(args.input_folder, args.output_folder, args.workers,
+                                                     overwrite=args.overwrite)
+    num_reviews = sum(hotel_num_reviews for _, hotel_num_reviews, _ in hotel_stats)
+    worker_seconds = sum(seconds for _, _, seconds in hotel_stats)
+    print(f"Classified {num_reviews} reviews of {len(hotel_stats)} hotels "
+          f"({num_reviews / worker_seconds if worker_seconds else 0:.0f} reviews/sec per core)")
+    for file_name, error in failures.items():
+        print(f"Failed to classify {file_name}: {error}")
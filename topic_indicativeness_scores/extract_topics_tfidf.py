@@ -1,51 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+from functools import lru_cache
+import json
 import os
-import re
 import string
+import sys
+from typing import Iterable, Iterator
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from nltk import pos_tag
+from nltk import pos_tag_sents
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 from nltk.tokenize import sent_tokenize, word_tokenize
+from scipy import sparse
 from sklearn import decomposition
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import iter_hotel_reviews  # noqa: E402
+from instrumentation import (count, finish_instrumented_run, instrument_hotel, map_jobs,  # noqa: E402
+                             start_instrumented_run, time_stage)
+from plotting import enable_render_only, print_render_statuses, render_plots, show_or_close_figure  # noqa: E402
 
 DATA_FOLDER_PATH = PAGERANK_PLOTS_FOLDER = os.path.join(os.pardir, 'data')
 PLOTS_FOLDER_PATH = os.path.join(os.pardir, 'plots', 'topic_indicativeness_scores')
+POS_TAGS_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'vocabulary_pos_tags.json')
+NOUN_POS_TAGS = ['NN', 'NNS', 'NNP', 'NNPS']
+PREPROCESSED_SENTENCES_SPOOL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                                                 'preprocessed_sentences.txt')
+TOPIC_MODEL_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'topic_model')
+TOPIC_MODEL_ARRAYS_FILE_NAME = 'topic_model.npz'
+TOPIC_MODEL_VOCABULARY_FILE_NAME = 'topic_model_vocabulary.npy'
+# Tokenizers of the fitted topic models: NLTK's word tokenizer of `dimensionality_reduction`, or the whitespace
+# tokenizer of `streaming_dimensionality_reduction`.
+WORD_TOKENIZER = 'word_tokenize'
+WHITESPACE_TOKENIZER = 'whitespace'
+HASHING_NUM_FEATURES = 2 ** 20
+STREAMING_BATCH_SIZE = 20000
 
 
-def preprocess_reviews(folder_path: str) -> list[str]:
+class ReviewPreprocessor:
     """
-    Reads hotel reviews from the given path and pre-process the text.
+    Pre-processing pipeline of review sentences, whose resources are built once and reused for every sentence:
+    a translate table removing punctuation, a frozen set of stop words and a per-token cache of lemmas.
+    """
+
+    def __init__(self):
+        self.punctuation_table = str.maketrans('', '', string.punctuation)
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.lemmatizer = WordNetLemmatizer()
+        self.lemma_cache = {}
+
+    def clean_text(self, sentence: str) -> str:
+        """
+        Removes punctuations from the given text sentence and converts it to lowercase.
+        :param sentence: text sentence from hotel reviews.
+        :return: cleaned sentence.
+        """
+
+        return sentence.lower().translate(self.punctuation_table)
+
+    def remove_stop_words(self, sentence: str) -> str:
+        """
+        Removes stop word from the given sentence.
+        :param sentence: cleaned text sentence from hotel reviews.
+        :return: sentence, with stop words removed
+        """
+
+        return " ".join(w for w in sentence.split() if w.lower() not in self.stop_words)
+
+    def lemmatize(self, sentence: str) -> str:
+        """
+        Lemmatizes each token of the given sentence, looking every distinct token up in WordNet only once.
+        :param sentence: cleaned text sentence from hotel reviews, with stop words removed.
+        :return: sentence, with its words lemmatized.
+        """
+
+        lemmas = []
+        for token in sentence.split():
+            lemma = self.lemma_cache.get(token)
+            if lemma is None:
+                lemma = self.lemma_cache[token] = self.lemmatizer.lemmatize(token)
+            lemmas.append(lemma)
+        return " ".join(lemmas)
+
+    def preprocess_sentence(self, sentence: str) -> str:
+        """
+        Cleans the given sentence, removes its stop words and lemmatizes its words.
+        :param sentence: text sentence from hotel reviews.
+        :return: pre-processed sentence.
+        """
+
+        return self.lemmatize(self.remove_stop_words(self.clean_text(sentence)))
+
+    def iter_preprocessed_sentences(self, reviews: Iterable[str]) -> Iterator[str]:
+        """
+        Tokenizes the given reviews into sentences and pre-processes them one at a time.
+        :param reviews: positive or negative hotel reviews.
+        :return: generator of the pre-processed sentences of the reviews.
+        """
+
+        for review in reviews:
+            for sentence in sent_tokenize(review):
+                yield self.preprocess_sentence(sentence)
+
+
+@lru_cache(maxsize=1)
+def get_review_preprocessor() -> ReviewPreprocessor:
+    """
+    Gets the pre-processing pipeline shared by the functions of this module (one per process).
+    :return: the review pre-processor.
+    """
+
+    return ReviewPreprocessor()
+
+
+def preprocess_hotel_reviews(hotel_name: str, reviews: list[str]) -> list[str]:
+    """
+    Pre-processes the reviews of a single hotel (the unit of work sent to each process by `preprocess_reviews`).
+    :param hotel_name: name of the hotel.
+    :param reviews: positive & negative reviews of the hotel.
+    :return: the pre-processed sentences of the reviews.
+    """
+
+    with instrument_hotel(hotel_name), time_stage('preprocess_sentences'):
+        sentences = list(get_review_preprocessor().iter_preprocessed_sentences(reviews))
+        count('rows_processed', len(reviews))
+        count('sentences', len(sentences))
+    return sentences
+
+
+def iter_hotels_reviews_texts(folder_path: str) -> Iterator[tuple[str, list[str]]]:
+    """
+    Reads hotel reviews from the given path, one hotel at a time.
     :param folder_path: path to folder of hotel data files.
-    :return: positive & negative hotel reviews, tokenized into sentences, with stop words removed and words lemmatized.
+    :return: generator of the name and the positive & negative reviews of each hotel.
     """
 
-    reviews = []
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(folder_path, filename)
-            df = pd.read_csv(file_path)
-            positive_reviews = df['Positive Reviews'].dropna().tolist()
-            negative_reviews = df['Negative Reviews'].dropna().tolist()
-            reviews.extend(positive_reviews)
-            reviews.extend(negative_reviews)
+    for hotel_name, df in iter_hotel_reviews(folder_path, columns=['Positive Reviews', 'Negative Reviews']):
+        positive_reviews = df['Positive Reviews'].dropna().tolist()
+        negative_reviews = df['Negative Reviews'].dropna().tolist()
+        yield hotel_name, positive_reviews + negative_reviews
 
-    # Tokenization to sentences.
-    sent_tokenized_reviews = [sentence for review in reviews for sentence in sent_tokenize(review)]
 
-    # Clean text.
-    cleaned_reviews = [clean_text(review) for review in sent_tokenized_reviews]
+def preprocess_reviews(folder_path: str, num_workers: int = 1) -> list[str]:
+    """
+    Reads hotel reviews from the given path and pre-process the text.
+    :param folder_path: path to folder of hotel data files.
+    :param num_workers: number of processes to shard the hotels across (1 to pre-process in the current process).
+    :return: positive & negative hotel reviews, tokenized into sentences, with stop words removed and words lemmatized.
+    """
 
-    # Remove stop words
-    cleaned_reviews_without_stop_words = [remove_stop_words(review) for review in cleaned_reviews]
+    if num_workers == 1:
+        return [sentence for hotel_reviews in iter_hotels_reviews_texts(folder_path)
+                for sentence in preprocess_hotel_reviews(*hotel_reviews)]
 
-    # Lemmatization
-    lemmatizer = WordNetLemmatizer()
-    lemmatized_tokens = [lemmatizer.lemmatize(w) for w in cleaned_reviews_without_stop_words]
-    return lemmatized_tokens
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return [sentence for hotel_sentences in map_jobs(executor, preprocess_hotel_reviews,
+                                                         iter_hotels_reviews_texts(folder_path),
+                                                         max_pending_jobs=2 * num_workers)
+                for sentence in hotel_sentences]
 
 
 def clean_text(sentence: str) -> str:
@@ -55,9 +171,7 @@ def clean_text(sentence: str) -> str:
     :return: cleaned sentence.
     """
 
-    sentence = sentence.lower()
-    sentence = re.sub(f'[{re.escape(string.punctuation)}]', '', sentence)
-    return sentence
+    return get_review_preprocessor().clean_text(sentence)
 
 
 def remove_stop_words(sentence: str) -> str:
@@ -67,20 +181,22 @@ def remove_stop_words(sentence: str) -> str:
     :return: sentence, with stop words removed
     """
 
-    stop_words = set(stopwords.words('english'))
-    sentence = sentence.split()
-    sentence = [w for w in sentence if not w.lower() in stop_words]
-    sentence = " ".join(sentence)
-    return sentence
+    return get_review_preprocessor().remove_stop_words(sentence)
 
 
-def dimensionality_reduction(tokens: list[str], n_components=2) -> tuple[list[tuple[str, float]], list[list[float]]]:
+def dimensionality_reduction(
+        tokens: list[str],
+        n_components=2,
+        model_folder: str | None = None
+) -> tuple[list[tuple[str, float]], list[list[float]]]:
     """
     Encodes each word from the reviews using its TF-IDF scores with respect to all review sentences.
     The function then applies Singular Value Decomposition (SVD) to reduce the dimensionality of
     the TF-IDF matrix, which helps in identifying the most significant features.
     :param tokens: list of sentence-tokenized, pre-processed hotel reviews.
     :param n_components: lumber of components for SVD dimensionality reduction.
+    :param model_folder: if given, the fitted vocabulary, IDF weights and SVD components are saved to this folder
+     (see `save_topic_model`).
     :return: list of tuples containing words and their corresponding TF-IDF scores sorted in descending order;
     and the reduced-dimensionality SVD matrix of shape (num_sentences x n_components).
     """
@@ -90,6 +206,10 @@ def dimensionality_reduction(tokens: list[str], n_components=2) -> tuple[list[tu
 
     svd = decomposition.TruncatedSVD(n_components=n_components)
     corpus_svd = svd.fit_transform(corpus_transformed)
+    if model_folder is not None:
+        save_topic_model({'vocabulary': tfv.get_feature_names_out().astype(str), 'idf': tfv.idf_,
+                          'components': svd.components_, 'tokenizer': WORD_TOKENIZER}, model_folder)
+
     feature_scores = dict(
         zip(
             tfv.get_feature_names_out(),
@@ -101,6 +221,317 @@ def dimensionality_reduction(tokens: list[str], n_components=2) -> tuple[list[tu
     return sorted_feature_scores, corpus_svd
 
 
+def spool_preprocessed_sentences(
+        folder_path: str,
+        spool_path: str = PREPROCESSED_SENTENCES_SPOOL_PATH,
+        num_workers: int = 1
+) -> int:
+    """
+    Pre-processes the hotel reviews from the given path hotel by hotel, and writes the sentences to a text file (one
+    sentence per line), so that the passes of `streaming_dimensionality_reduction` stream them from disk instead of
+    holding the corpus in memory or pre-processing it again.
+    :param folder_path: path to folder of hotel data files.
+    :param spool_path: path of the text file of pre-processed sentences.
+    :param num_workers: number of processes to shard the hotels across (1 to pre-process in the current process).
+    :return: number of sentences written.
+    """
+
+    os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+    num_sentences = 0
+
+    with open(spool_path, 'w', encoding='utf-8') as spool_file:
+        if num_workers == 1:
+            hotels_sentences = (preprocess_hotel_reviews(*hotel_reviews)
+                                for hotel_reviews in iter_hotels_reviews_texts(folder_path))
+            for hotel_sentences in hotels_sentences:
+                spool_file.writelines(f"{sentence}\n" for sentence in hotel_sentences)
+                num_sentences += len(hotel_sentences)
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                for hotel_sentences in map_jobs(executor, preprocess_hotel_reviews,
+                                                iter_hotels_reviews_texts(folder_path),
+                                                max_pending_jobs=2 * num_workers):
+                    spool_file.writelines(f"{sentence}\n" for sentence in hotel_sentences)
+                    num_sentences += len(hotel_sentences)
+
+    return num_sentences
+
+
+def iter_spooled_sentence_batches(
+        spool_path: str = PREPROCESSED_SENTENCES_SPOOL_PATH,
+        batch_size: int = STREAMING_BATCH_SIZE
+) -> Iterator[list[str]]:
+    """
+    Streams the pre-processed sentences written by `spool_preprocessed_sentences`.
+    :param spool_path: path of the text file of pre-processed sentences.
+    :param batch_size: number of sentences in each batch.
+    :return: generator of batches of pre-processed sentences.
+    """
+
+    with open(spool_path, encoding='utf-8') as spool_file:
+        batch = []
+        for line in spool_file:
+            batch.append(line.rstrip('\n'))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def streaming_dimensionality_reduction(
+        spool_path: str = PREPROCESSED_SENTENCES_SPOOL_PATH,
+        n_components: int = 2,
+        n_features: int = HASHING_NUM_FEATURES,
+        batch_size: int = STREAMING_BATCH_SIZE,
+        n_oversamples: int = 10,
+        n_power_iterations: int = 4,
+        corpus_svd_path: str | None = None,
+        model_folder: str | None = None,
+        random_state: int = 0
+) -> tuple[list[tuple[str, float]], np.ndarray]:
+    """
+    Out-of-core version of `dimensionality_reduction`, over the sentences spooled by `spool_preprocessed_sentences`.
+    The sentences are never held in memory together: every step is a pass over the spooled sentences, batch by batch.
+    - Words are hashed into n_features buckets by a `HashingVectorizer` (with whitespace tokenization, as the sentences
+      are already cleaned), and the document frequencies and the vocabulary of each bucket are counted in a first pass.
+    - The TF-IDF weighting matches `TfidfVectorizer` (smoothed IDF, L2-normalised rows).
+    - The SVD is a randomized SVD whose range finder and power iterations each take one pass over the batches; only
+      the (num_sentences x (n_components + n_oversamples)) range basis is kept in memory.
+    :param spool_path: path of the text file of pre-processed sentences.
+    :param n_components: number of components for SVD dimensionality reduction.
+    :param n_features: number of hash buckets of the vectorizer.
+    :param batch_size: number of sentences vectorized at a time.
+    :param n_oversamples: number of extra random directions of the randomized SVD.
+    :param n_power_iterations: number of power iterations of the randomized SVD.
+    :param corpus_svd_path: if given, the reduced-dimensionality matrix is written to this memory-mapped .npy file
+     instead of being held in RAM.
+    :param model_folder: if given, the vocabulary, IDF weights and SVD components are saved to this folder (see
+     `save_topic_model`). Words sharing a hash bucket share its IDF weight and components.
+    :param random_state: seed of the random projections.
+    :return: list of tuples containing words and their corresponding TF-IDF scores sorted in descending order;
+    and the reduced-dimensionality SVD matrix of shape (num_sentences x n_components).
+    """
+
+    vectorizer = HashingVectorizer(n_features=n_features, tokenizer=str.split, token_pattern=None, lowercase=False,
+                                   alternate_sign=False, norm=None)
+
+    # Pass 1: document frequencies and vocabulary.
+    num_sentences = 0
+    document_frequencies = np.zeros(n_features, dtype=np.int64)
+    vocabulary = set()
+    for batch in iter_spooled_sentence_batches(spool_path, batch_size):
+        num_sentences += len(batch)
+        document_frequencies += np.bincount(vectorizer.transform(batch).indices, minlength=n_features)
+        vocabulary.update(word for sentence in batch for word in sentence.split())
+
+    # Only the buckets of words that occur in the corpus are kept as features.
+    used_buckets = np.flatnonzero(document_frequencies)
+    idf = np.log((1 + num_sentences) / (1 + document_frequencies[used_buckets])) + 1
+
+    def iter_tfidf_batches():
+        for sentences_batch in iter_spooled_sentence_batches(spool_path, batch_size):
+            term_frequencies = vectorizer.transform(sentences_batch)[:, used_buckets]
+            yield normalize(term_frequencies.multiply(idf).tocsr(), norm='l2')
+
+    # Randomized range finder, one pass per multiplication by the TF-IDF matrix (or its transpose).
+    rng = np.random.default_rng(random_state)
+    num_random_directions = n_components + n_oversamples
+    directions = rng.standard_normal((len(used_buckets), num_random_directions))
+
+    for power_iteration in range(n_power_iterations + 1):
+        range_basis = np.vstack([tfidf_batch @ directions for tfidf_batch in iter_tfidf_batches()])
+        range_basis, _ = np.linalg.qr(range_basis)
+        directions = np.zeros((len(used_buckets), num_random_directions))
+        batch_start = 0
+        for tfidf_batch in iter_tfidf_batches():
+            directions += tfidf_batch.T @ range_basis[batch_start:batch_start + tfidf_batch.shape[0]]
+            batch_start += tfidf_batch.shape[0]
+        if power_iteration < n_power_iterations:
+            directions, _ = np.linalg.qr(directions)
+
+    # The last `directions` is B^T = X^T Q, whose SVD gives the right singular vectors of X.
+    _, _, components = np.linalg.svd(directions.T, full_matrices=False)
+    components = components[:n_components]
+
+    # Same sign convention as TruncatedSVD: the largest absolute entry of each component is positive.
+    max_abs_entries = components[np.arange(n_components), np.argmax(np.abs(components), axis=1)]
+    components *= np.sign(max_abs_entries)[:, None]
+
+    # Final pass: project the sentences onto the components.
+    if corpus_svd_path is None:
+        corpus_svd = np.empty((num_sentences, n_components))
+    else:
+        corpus_svd = np.lib.format.open_memmap(corpus_svd_path, mode='w+', dtype=np.float64,
+                                               shape=(num_sentences, n_components))
+    batch_start = 0
+    for tfidf_batch in iter_tfidf_batches():
+        corpus_svd[batch_start:batch_start + tfidf_batch.shape[0]] = tfidf_batch @ components.T
+        batch_start += tfidf_batch.shape[0]
+    if corpus_svd_path is not None:
+        corpus_svd.flush()
+
+    # Map every word of the vocabulary to the score of its bucket.
+    words = sorted(vocabulary)
+    word_buckets = np.searchsorted(used_buckets, vectorizer.transform(words).indices)
+    feature_scores = dict(zip(words, components[0][word_buckets].tolist()))
+    if model_folder is not None:
+        save_topic_model({'vocabulary': np.array(words, dtype=str), 'idf': idf[word_buckets],
+                          'components': components[:, word_buckets], 'tokenizer': WHITESPACE_TOKENIZER}, model_folder)
+
+    sorted_feature_scores = sorted(feature_scores.items(), key=lambda item: item[1], reverse=True)
+    return sorted_feature_scores, corpus_svd
+
+
+def save_topic_model(topic_model: dict[str, np.ndarray], model_folder: str = TOPIC_MODEL_FOLDER) -> None:
+    """
+    Saves a fitted topic model: its IDF weights and SVD components to a .npz file, and its sorted vocabulary to a
+    fixed-width .npy file, which `load_topic_model` memory-maps.
+    :param topic_model: mapping with the sorted 'vocabulary' (n_words), the 'idf' weights (n_words), the SVD
+     'components' (n_components x n_words) and the 'tokenizer' the model was fitted with (WORD_TOKENIZER or
+     WHITESPACE_TOKENIZER).
+    :param model_folder: path of the folder of the topic model files.
+    """
+
+    os.makedirs(model_folder, exist_ok=True)
+    np.savez(os.path.join(model_folder, TOPIC_MODEL_ARRAYS_FILE_NAME),
+             idf=topic_model['idf'], components=topic_model['components'], tokenizer=topic_model['tokenizer'])
+    np.save(os.path.join(model_folder, TOPIC_MODEL_VOCABULARY_FILE_NAME), topic_model['vocabulary'])
+
+
+def load_topic_model(model_folder: str = TOPIC_MODEL_FOLDER) -> dict[str, np.ndarray]:
+    """
+    Loads a topic model saved by `save_topic_model`, without refitting anything. The vocabulary is memory-mapped,
+    so only the pages touched by the lookups of `transform` are read.
+    :param model_folder: path of the folder of the topic model files.
+    :return: mapping with the sorted 'vocabulary', the 'idf' weights, the SVD 'components' and the 'tokenizer'.
+    :raises ValueError: if the model was saved without its tokenizer.
+    """
+
+    model_arrays_path = os.path.join(model_folder, TOPIC_MODEL_ARRAYS_FILE_NAME)
+    with np.load(model_arrays_path) as model_arrays:
+        # The tokenizer of an older model is unknown: either fit would have saved it without the tokenizer.
+        if 'tokenizer' not in model_arrays:
+            raise ValueError(f"The topic model {model_arrays_path} does not record its tokenizer, fit it again")
+        topic_model = {'idf': model_arrays['idf'], 'components': model_arrays['components'],
+                       'tokenizer': str(model_arrays['tokenizer'])}
+    topic_model['vocabulary'] = np.load(os.path.join(model_folder, TOPIC_MODEL_VOCABULARY_FILE_NAME), mmap_mode='r')
+    return topic_model
+
+
+def transform(sentences: list[str], topic_model: dict[str, np.ndarray], preprocess: bool = True) -> np.ndarray:
+    """
+    Projects new review sentences onto the SVD components of a fitted topic model, weighting their words with the
+    stored IDF weights (as the fitted TF-IDF vectorizer would). The sentences are tokenized with the tokenizer the
+    model was fitted with, and words out of the model vocabulary are ignored.
+    :param sentences: review sentences to score.
+    :param topic_model: topic model, as returned by `load_topic_model`.
+    :param preprocess: whether to pre-process the sentences first with the review pre-processor (pass False for
+     sentences that are already pre-processed, to skip loading the NLTK resources).
+    :return: the reduced-dimensionality matrix of the sentences, of shape (num_sentences x n_components).
+    """
+
+    if preprocess:
+        preprocessor = get_review_preprocessor()
+        sentences = [preprocessor.preprocess_sentence(sentence) for sentence in sentences]
+
+    tokenize = word_tokenize if topic_model['tokenizer'] == WORD_TOKENIZER else str.split
+    # The fitted TfidfVectorizer lowercases the sentences before tokenizing them.
+    sentences_words = [tokenize(sentence.lower()) for sentence in sentences]
+    words = np.array([word for sentence_words in sentences_words for word in sentence_words], dtype=str)
+    sentence_ids = np.repeat(np.arange(len(sentences)), [len(sentence_words) for sentence_words in sentences_words])
+
+    vocabulary = topic_model['vocabulary']
+    word_ids = np.minimum(np.searchsorted(vocabulary, words), len(vocabulary) - 1)
+    in_vocabulary = vocabulary[word_ids] == words
+
+    # Duplicate (sentence, word) entries are summed into term frequencies by the sparse constructor.
+    tfidf = sparse.csr_matrix((topic_model['idf'][word_ids[in_vocabulary]],
+                               (sentence_ids[in_vocabulary], word_ids[in_vocabulary])),
+                              shape=(len(sentences), len(vocabulary)))
+    return normalize(tfidf, norm='l2') @ topic_model['components'].T
+
+
+def load_pos_tags_cache(cache_path: str = POS_TAGS_CACHE_PATH) -> dict[str, str]:
+    """
+    Loads the on-disk cache of the part-of-speech tags of vocabulary words.
+    :param cache_path: path of the JSON cache file.
+    :return: mapping between each cached word and its POS tag (empty if there is no cache yet).
+    """
+
+    if not os.path.exists(cache_path):
+        return {}
+
+    with open(cache_path, encoding='utf-8') as cache_file:
+        return json.load(cache_file)
+
+
+def save_pos_tags_cache(pos_tags: dict[str, str], cache_path: str = POS_TAGS_CACHE_PATH) -> None:
+    """
+    Saves the cache of the part-of-speech tags of vocabulary words.
+    :param pos_tags: mapping between each word and its POS tag.
+    :param cache_path: path of the JSON cache file.
+    """
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as cache_file:
+        json.dump(pos_tags, cache_file)
+
+
+def get_pos_tags(words: list[str], pos_tags_cache: dict[str, str]) -> list[str]:
+    """
+    Gets the part-of-speech tag of each given word, tagged on its own (as `pos_tag([word])` does). Words missing from
+    the cache are tagged in a single call to the tagger and added to the cache.
+    :param words: vocabulary words.
+    :param pos_tags_cache: mapping between each known word and its POS tag; updated in place.
+    :return: POS tag of each word.
+    """
+
+    untagged_words = list(dict.fromkeys(word for word in words if word not in pos_tags_cache))
+    if untagged_words:
+        tagged_words = pos_tag_sents([[word] for word in untagged_words])
+        pos_tags_cache.update((word, tag) for [(word, tag)] in tagged_words)
+
+    return [pos_tags_cache[word] for word in words]
+
+
+def select_top_nouns(
+        sorted_feature_scores: list[tuple[str, float]],
+        top_n: int,
+        batch_size: int = 256,
+        cache_path: str = POS_TAGS_CACHE_PATH
+) -> list[tuple[str, float]]:
+    """
+    Selects the top-scoring nouns from the sorted feature scores. Words are POS-tagged lazily, in batches, from the
+    top of the list, and tagging stops as soon as top_n nouns are found. The tags are persisted in an on-disk cache,
+    so repeated runs (and other scripts using `get_pos_tags`) only tag words they have never seen.
+    :param sorted_feature_scores: A sorted list of tuples where each tuple contains a word (str),
+     and its corresponding score (float).
+    :param top_n: number of top-scored nouns to select.
+    :param batch_size: number of words tagged at a time.
+    :param cache_path: path of the JSON cache file of POS tags.
+    :return: the top_n top-scoring (noun, score) tuples, sorted by score.
+    """
+
+    pos_tags_cache = load_pos_tags_cache(cache_path)
+    num_cached_words = len(pos_tags_cache)
+
+    top_noun_scores = []
+    for batch_start in range(0, len(sorted_feature_scores), batch_size):
+        batch = sorted_feature_scores[batch_start:batch_start + batch_size]
+        batch_pos_tags = get_pos_tags([word for word, _ in batch], pos_tags_cache)
+
+        top_noun_scores.extend((word, score) for (word, score), tag in zip(batch, batch_pos_tags)
+                               if tag in NOUN_POS_TAGS)
+        if len(top_noun_scores) >= top_n:
+            break
+
+    if len(pos_tags_cache) > num_cached_words:
+        save_pos_tags_cache(pos_tags_cache, cache_path)
+
+    return top_noun_scores[:top_n]
+
+
 def plot_top_scored_nouns(sorted_feature_scores: list[tuple[str, float]], top_n: int) -> None:
     """
     Plots the top-scoring nouns and their corresponding scores on a logarithmic scale.
@@ -110,12 +541,7 @@ def plot_top_scored_nouns(sorted_feature_scores: list[tuple[str, float]], top_n:
     """
 
     # Filter only nouns from the sorted feature scores.
-    noun_scores = [
-        (word, score) for word, score in sorted_feature_scores
-        if pos_tag([word])[0][1] in ['NN', 'NNS', 'NNP', 'NNPS']
-    ]
-
-    top_noun_scores = noun_scores[:top_n]
+    top_noun_scores = select_top_nouns(sorted_feature_scores, top_n)
     topics = [item[0] for item in top_noun_scores]
     scores = [item[1] for item in top_noun_scores]
 
@@ -127,11 +553,48 @@ def plot_top_scored_nouns(sorted_feature_scores: list[tuple[str, float]], top_n:
     plt.tight_layout()
 
     plt.savefig(os.path.join(PLOTS_FOLDER_PATH, 'extract_topics_tfidf_top_nouns_scores_log_scale.png'))
-    plt.show()
+    show_or_close_figure()
 
 
 if __name__ == '__main__':
-    lemmatized_tokens: list[str] = preprocess_reviews(DATA_FOLDER_PATH)
-    sorted_feature_scores, corpus_svd = dimensionality_reduction(lemmatized_tokens)
+    parser = argparse.ArgumentParser(description='Extracts the top-scored topics of the reviews with TF-IDF and SVD.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='stream the pre-processed sentences from disk with a hashing vectorizer and a '
+                             'randomized SVD, instead of fitting on the whole corpus in memory')
+    parser.add_argument('--corpus-svd-path', default=None,
+                        help='in streaming mode, write the reduced-dimensionality matrix to this .npy file')
+    parser.add_argument('--model-folder', default=TOPIC_MODEL_FOLDER,
+                        help='folder to save the fitted topic model to, for scoring new sentences with `transform`')
+    parser.add_argument('--render-only', action='store_true',
+                        help='render the plot headless, skipping it if its data is unchanged')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time the stages of each hotel, count the rows, sentences and bytes read, and save a '
+                             'run report')
+    parser.add_argument('--profile', action='store_true',
+                        help='instrument the run and also dump a cProfile profile of the main and worker processes')
+    args = parser.parse_args()
+    start_instrumented_run(args.instrument, args.profile)
+    if args.render_only:
+        enable_render_only()
+
+    if args.streaming:
+        with time_stage('preprocess_reviews'):
+            spool_preprocessed_sentences(DATA_FOLDER_PATH, num_workers=os.cpu_count())
+        with time_stage('dimensionality_reduction'):
+            sorted_feature_scores, corpus_svd = streaming_dimensionality_reduction(
+                corpus_svd_path=args.corpus_svd_path, model_folder=args.model_folder)
+    else:
+        with time_stage('preprocess_reviews'):
+            lemmatized_tokens: list[str] = preprocess_reviews(DATA_FOLDER_PATH, num_workers=os.cpu_count())
+        with time_stage('dimensionality_reduction'):
+            sorted_feature_scores, corpus_svd = dimensionality_reduction(lemmatized_tokens,
+                                                                         model_folder=args.model_folder)
 
-    plot_top_scored_nouns(sorted_feature_scores, top_n=25)
+    with time_stage('plotting'):
+        if args.render_only:
+            print_render_statuses(render_plots([('extract_topics_tfidf_top_nouns_scores_log_scale',
+                                                 plot_top_scored_nouns,
+                                                 (select_top_nouns(sorted_feature_scores, 25), 25))]))
+        else:
+            plot_top_scored_nouns(sorted_feature_scores, top_n=25)
+    finish_instrumented_run('extract_topics_tfidf')
@@ -1,14 +1,28 @@
+import argparse
 import csv
 import os
+import sys
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from scipy.stats import pearsonr
 import seaborn as sns
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import HOTEL_NAME_COLUMN, iter_hotel_reviews, load_reviews_corpus  # noqa: E402
+from instrumentation import (count, finish_instrumented_run, instrument_hotel, start_instrumented_run,  # noqa: E402
+                             time_stage)
+from plotting import enable_render_only, print_render_statuses, render_plots, show_or_close_figure  # noqa: E402
+from review_schema import OVERALL_RATING_COLUMN, REVIEW_DATE_COLUMN, REVIEW_DATE_FORMATS, parse_dates  # noqa: E402
+
 CLASSIFIED_DATA_FOLDER = os.path.join(os.pardir, 'data_topic_classified')
 PLOTS_FOLDER_PATH = os.path.join(os.pardir, 'plots', 'topic_indicativeness_scores')
 OUTPUT_RESULTS_PATH = os.path.join('results', 'result.csv')
+REVIEW_PROPORTION_MEASURE = 'Review Proportion'
+SENTIMENT_RATIO_MEASURE = 'Sentiment Ratio'
+SENTIMENT_RATIO_WINDOWS_DAYS = (30, 90, 365)
+SENTIMENT_RATIO_DECAY_HALF_LIVES_DAYS = (90, 365)
 
 
 def calculate_proportion_of_reviews(df: pd.DataFrame, topics: list[str]) -> dict[str, list[float]]:
@@ -56,7 +70,7 @@ def plot_review_proportions(review_proportions: dict[str, list[float]], topics:
 
         plt.tight_layout()
         plt.savefig(os.path.join(PLOTS_FOLDER_PATH, f'review_topic_proportions_{topic}.png'))
-        plt.show()
+        show_or_close_figure()
 
 
 def calculate_sentiment_ratio(df: pd.DataFrame, topics: list[str]) -> dict[str, list[float]]:
@@ -87,6 +101,233 @@ def calculate_sentiment_ratio(df: pd.DataFrame, topics: list[str]) -> dict[str,
     return sentiment_ratios
 
 
+def calculate_indicativeness_matrix(corpus_df: pd.DataFrame, topics: list[str]) -> pd.DataFrame:
+    """
+    Calculates the proportion of reviews discussing each topic and the sentiment ratio of each topic, for all the
+    hotels at once, with a single groupby reduction over the reviews of all the hotels (instead of calling
+    `calculate_proportion_of_reviews` and `calculate_sentiment_ratio` hotel by hotel).
+    :param corpus_df: reviews of all the hotels, with a hotel name column (as loaded from the corpus store).
+    :param topics: list of reviews topics.
+    :return: hotel x topic matrix, indexed by the hotel names (in corpus order), whose columns are
+     (REVIEW_PROPORTION_MEASURE, topic) and (SENTIMENT_RATIO_MEASURE, topic) for each topic, and the mean overall
+     average rating of the hotel (OVERALL_RATING_COLUMN). The ratios follow `calculate_sentiment_ratio`, and are 0
+     for a topic no review discusses.
+    """
+
+    positive_columns = [f"{topic} - positive" for topic in topics]
+    negative_columns = [f"{topic} - negative" for topic in topics]
+
+    hotel_groups = corpus_df.assign(
+        **{'Review Texts': corpus_df[["Positive Reviews", "Negative Reviews"]].notna().sum(axis=1)}
+    ).groupby(HOTEL_NAME_COLUMN, sort=False, observed=True)
+    hotel_counts = hotel_groups[['Review Texts', *positive_columns, *negative_columns]].sum()
+
+    total_reviews = hotel_counts['Review Texts'].to_numpy(dtype=np.float64)[:, None]
+    positive_counts = hotel_counts[positive_columns].to_numpy(dtype=np.float64)
+    negative_counts = hotel_counts[negative_columns].to_numpy(dtype=np.float64)
+    topic_counts = positive_counts + negative_counts
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        review_proportions = np.where(total_reviews > 0, topic_counts / total_reviews, 0)
+        sentiment_ratios = np.where(topic_counts > 0, (positive_counts - negative_counts) / topic_counts, 0)
+
+    indicativeness_matrix = pd.concat({
+        REVIEW_PROPORTION_MEASURE: pd.DataFrame(review_proportions, index=hotel_counts.index, columns=topics),
+        SENTIMENT_RATIO_MEASURE: pd.DataFrame(sentiment_ratios, index=hotel_counts.index, columns=topics)
+    }, axis=1)
+    indicativeness_matrix[OVERALL_RATING_COLUMN] = hotel_groups[OVERALL_RATING_COLUMN].mean()
+    indicativeness_matrix.index = indicativeness_matrix.index.astype(str)
+    return indicativeness_matrix
+
+
+def parse_review_dates(review_dates: pd.Series) -> pd.Series:
+    """
+    Parses the review dates of the scraped reviews, which are written either as 'August 21, 2024' or as
+    '21 August 2024' depending on the hotel. Dates read from the corpus store are already parsed, and returned as they
+    are.
+    :param review_dates: review dates column.
+    :return: the review dates as datetime64, NaT where no format matches.
+    """
+
+    return parse_dates(review_dates, REVIEW_DATE_FORMATS)
+
+
+def find_latest_review_date(hotels_reviews: list[tuple[str, pd.DataFrame]]) -> pd.Timestamp:
+    """
+    Finds the latest review date of the corpus, the default date the time-aware sentiment ratios are calculated at.
+    Hotels without any valid review date are skipped.
+    :param hotels_reviews: pairs of hotel name and reviews dataframe (with the review date column).
+    :return: the latest valid review date.
+    :raises ValueError: if no review of any hotel has a valid date.
+    """
+
+    latest_review_date = pd.Series([parse_review_dates(df[REVIEW_DATE_COLUMN]).max() for _, df in hotels_reviews],
+                                   dtype='datetime64[ns]').max()
+    if pd.isna(latest_review_date):
+        raise ValueError("No review has a valid date, pass the reference date with --reference-date")
+    return latest_review_date
+
+
+def build_cumulative_topic_counts(
+        df: pd.DataFrame,
+        topics: list[str],
+        decay_half_lives_days: tuple[int, ...] = SENTIMENT_RATIO_DECAY_HALF_LIVES_DAYS
+) -> dict[str, np.ndarray | dict[int, np.ndarray]]:
+    """
+    Precomputes the cumulative positive and negative counts of each topic over the reviews of a hotel, ordered by
+    review date, so that `calculate_windowed_sentiment_ratio` and `calculate_decayed_sentiment_ratio` answer any
+    query with a binary search instead of rescanning the reviews. Reviews without a valid review date are ignored.
+    For each decay half-life, the counts are also accumulated with the weight 2^((date - last date) / half-life),
+    which is at most 1 (the weights of a query are rescaled to its reference date).
+    :param df: dataframe of hotel reviews.
+    :param topics: list of reviews topics.
+    :param decay_half_lives_days: half-lives (in days) of the decayed counts to precompute.
+    :return: mapping with the sorted 'days' of the reviews (days since epoch), the 'positive' and 'negative'
+     cumulative counts of shape (num_reviews + 1 x num_topics), starting with a row of zeros, and the
+     'decayed_positive' and 'decayed_negative' cumulative counts of each half-life.
+    """
+
+    review_days = parse_review_dates(df[REVIEW_DATE_COLUMN]).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    valid_reviews = review_days != np.datetime64('NaT').astype('datetime64[D]').astype(np.int64)
+    order = np.argsort(review_days[valid_reviews], kind='stable')
+    review_days = review_days[valid_reviews][order]
+
+    def cumulative_counts(flags: np.ndarray) -> np.ndarray:
+        return np.vstack([np.zeros((1, flags.shape[1])), np.cumsum(flags, axis=0)])
+
+    positive_flags = df[[f"{topic} - positive" for topic in topics]].to_numpy(dtype=np.float64)[valid_reviews][order]
+    negative_flags = df[[f"{topic} - negative" for topic in topics]].to_numpy(dtype=np.float64)[valid_reviews][order]
+
+    cumulative_topic_counts = {
+        'days': review_days,
+        'positive': cumulative_counts(positive_flags),
+        'negative': cumulative_counts(negative_flags),
+        'decayed_positive': {},
+        'decayed_negative': {}
+    }
+    last_day = review_days[-1] if len(review_days) else 0
+    for half_life_days in decay_half_lives_days:
+        weights = np.exp2((review_days - last_day) / half_life_days)[:, None]
+        cumulative_topic_counts['decayed_positive'][half_life_days] = cumulative_counts(positive_flags * weights)
+        cumulative_topic_counts['decayed_negative'][half_life_days] = cumulative_counts(negative_flags * weights)
+
+    return cumulative_topic_counts
+
+
+def sentiment_ratios_from_counts(
+        positive_counts: np.ndarray,
+        negative_counts: np.ndarray,
+        topics: list[str]
+) -> dict[str, list[float]]:
+    """
+    Maps the positive and negative (possibly weighted) counts of each topic to sentiment ratios, as in
+    `calculate_sentiment_ratio`.
+    :param positive_counts: positive count of each topic.
+    :param negative_counts: negative count of each topic.
+    :param topics: list of reviews topics.
+    :return: dictionary mapping between each topic and its sentiment ratio, in the format of
+     `calculate_sentiment_ratio`.
+    """
+
+    topic_counts = positive_counts + negative_counts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(topic_counts > 0, (positive_counts - negative_counts) / topic_counts, 0)
+    return {topic: [float(ratio)] for topic, ratio in zip(topics, ratios)}
+
+
+def to_epoch_day(reference_date: str | pd.Timestamp) -> int:
+    """
+    Converts a date to the number of days since epoch, as used by `build_cumulative_topic_counts`.
+    :param reference_date: date (a timestamp, or a string such as '2024-08-21').
+    :return: number of days since epoch.
+    """
+
+    return int(np.datetime64(pd.Timestamp(reference_date).date(), 'D').astype(np.int64))
+
+
+def calculate_windowed_sentiment_ratio(
+        cumulative_topic_counts: dict[str, np.ndarray | dict[int, np.ndarray]],
+        topics: list[str],
+        window_days: int,
+        reference_date: str | pd.Timestamp
+) -> dict[str, list[float]]:
+    """
+    Calculates the sentiment ratio of each topic over the reviews written in the window_days days up to (and
+    including) the reference date.
+    :param cumulative_topic_counts: cumulative counts of the hotel, as built by `build_cumulative_topic_counts`.
+    :param topics: list of reviews topics (in the order used to build the cumulative counts).
+    :param window_days: length of the window in days.
+    :param reference_date: last day of the window.
+    :return: dictionary mapping between each topic and its sentiment ratio over the window, in the format of
+     `calculate_sentiment_ratio` (0 for a topic no review of the window discusses).
+    """
+
+    reference_day = to_epoch_day(reference_date)
+    window_start, window_end = np.searchsorted(cumulative_topic_counts['days'],
+                                               [reference_day - window_days, reference_day], side='right')
+
+    positive_counts = cumulative_topic_counts['positive'][window_end] - cumulative_topic_counts['positive'][window_start]
+    negative_counts = cumulative_topic_counts['negative'][window_end] - cumulative_topic_counts['negative'][window_start]
+    return sentiment_ratios_from_counts(positive_counts, negative_counts, topics)
+
+
+def calculate_decayed_sentiment_ratio(
+        cumulative_topic_counts: dict[str, np.ndarray | dict[int, np.ndarray]],
+        topics: list[str],
+        half_life_days: int,
+        reference_date: str | pd.Timestamp
+) -> dict[str, list[float]]:
+    """
+    Calculates the sentiment ratio of each topic over the reviews written up to the reference date, where each review
+    is weighted by 2^(-age / half_life_days), its age being the number of days between its review date and the
+    reference date.
+    :param cumulative_topic_counts: cumulative counts of the hotel, as built by `build_cumulative_topic_counts`
+     (with half_life_days among its decay half-lives).
+    :param topics: list of reviews topics (in the order used to build the cumulative counts).
+    :param half_life_days: half-life of the decay in days.
+    :param reference_date: date the ages of the reviews are measured from.
+    :return: dictionary mapping between each topic and its decayed sentiment ratio, in the format of
+     `calculate_sentiment_ratio`.
+    """
+
+    end = np.searchsorted(cumulative_topic_counts['days'], to_epoch_day(reference_date), side='right')
+
+    # The rescaling of the weights to the reference date is common to all the topics, so it cancels in the ratios.
+    positive_counts = cumulative_topic_counts['decayed_positive'][half_life_days][end]
+    negative_counts = cumulative_topic_counts['decayed_negative'][half_life_days][end]
+    return sentiment_ratios_from_counts(positive_counts, negative_counts, topics)
+
+
+def calculate_time_aware_sentiment_ratios(
+        df: pd.DataFrame,
+        topics: list[str],
+        reference_date: str | pd.Timestamp,
+        windows_days: tuple[int, ...] = SENTIMENT_RATIO_WINDOWS_DAYS,
+        decay_half_lives_days: tuple[int, ...] = SENTIMENT_RATIO_DECAY_HALF_LIVES_DAYS
+) -> dict[str, dict[str, list[float]]]:
+    """
+    Calculates the windowed and decayed sentiment ratios of a hotel.
+    :param df: dataframe of hotel reviews.
+    :param topics: list of reviews topics.
+    :param reference_date: date the windows end at and the ages of the reviews are measured from.
+    :param windows_days: lengths of the windows in days.
+    :param decay_half_lives_days: half-lives of the decays in days.
+    :return: dictionary mapping between the label of each window / decay (e.g. 'last 30 days', 'half-life 90 days')
+     and the sentiment ratios of the topics, in the format of `calculate_sentiment_ratio`.
+    """
+
+    cumulative_topic_counts = build_cumulative_topic_counts(df, topics, decay_half_lives_days)
+
+    time_aware_sentiment_ratios = {}
+    for window_days in windows_days:
+        time_aware_sentiment_ratios[f"last {window_days} days"] = calculate_windowed_sentiment_ratio(
+            cumulative_topic_counts, topics, window_days, reference_date)
+    for half_life_days in decay_half_lives_days:
+        time_aware_sentiment_ratios[f"half-life {half_life_days} days"] = calculate_decayed_sentiment_ratio(
+            cumulative_topic_counts, topics, half_life_days, reference_date)
+    return time_aware_sentiment_ratios
+
+
 def plot_sentiment_ratios(sentiment_ratios: dict[str, list[float]], topics: list[str]) -> None:
     """
     Plots the ratio between positive and negative reviews discussing each topic.
@@ -109,7 +350,7 @@ def plot_sentiment_ratios(sentiment_ratios: dict[str, list[float]], topics: list
 
         plt.tight_layout()
         plt.savefig(os.path.join(PLOTS_FOLDER_PATH, f'sentiment_ratios_{topic}.png'))
-        plt.show()
+        show_or_close_figure()
 
 
 def plot_sentiment_vs_rating_with_correlation(
@@ -133,18 +374,34 @@ def plot_sentiment_vs_rating_with_correlation(
 
         plt.tight_layout()
         plt.savefig(os.path.join(PLOTS_FOLDER_PATH, f'sentiment_vs_rating_with_correlation_{topic}.png'))
-        plt.show()
+        show_or_close_figure()
 
 
-def save_sentiment_ratio_per_hotel(all_hotels_sentiment_ratios: dict[str, dict[str, list[float]]]) -> None:
+def save_sentiment_ratio_per_hotel(
+        all_hotels_sentiment_ratios: dict[str, dict[str, list[float]]] | pd.DataFrame,
+        all_hotels_time_aware_sentiment_ratios: dict[str, dict[str, dict[str, list[float]]]] | None = None
+) -> None:
     """
     Saves the sentiment ratio per hotel in an output .csv file.
     :param all_hotels_sentiment_ratios: dictionary mapping between each hotel name and the sentiment ratios
-    of each topic.
+    of each topic; or hotel x topic matrix of sentiment ratios (e.g. the SENTIMENT_RATIO_MEASURE columns of
+    `calculate_indicativeness_matrix`).
+    :param all_hotels_time_aware_sentiment_ratios: optional dictionary mapping between each hotel name and its
+    windowed and decayed sentiment ratios (as returned by `calculate_time_aware_sentiment_ratios`), saved as extra
+    '<topic> (<window / decay label>)' columns.
     """
 
+    if isinstance(all_hotels_sentiment_ratios, pd.DataFrame):
+        all_hotels_sentiment_ratios = {
+            hotel_name: {topic: [ratio] for topic, ratio in hotel_ratios.items()}
+            for hotel_name, hotel_ratios in all_hotels_sentiment_ratios.to_dict('index').items()
+        }
+
     with open(OUTPUT_RESULTS_PATH, 'w', newline='', encoding='utf-8') as csvfile:
         fieldnames = ['Hotel Name', 'Room amenities', 'Hotel amenities', 'Staff', 'Food and beverages', 'Location']
+        if all_hotels_time_aware_sentiment_ratios:
+            time_aware_labels = next(iter(all_hotels_time_aware_sentiment_ratios.values())).keys()
+            fieldnames.extend(f"{topic} ({label})" for label in time_aware_labels for topic in fieldnames[1:6])
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
@@ -157,37 +414,93 @@ def save_sentiment_ratio_per_hotel(all_hotels_sentiment_ratios: dict[str, dict[s
                 'Food and beverages': ratings['Food and beverages'][0],
                 'Location': ratings['Location'][0]
             }
+            if all_hotels_time_aware_sentiment_ratios:
+                for label, time_aware_ratings in all_hotels_time_aware_sentiment_ratios[hotel_name].items():
+                    row.update({f"{topic} ({label})": topic_ratings[0]
+                                for topic, topic_ratings in time_aware_ratings.items()})
             writer.writerow(row)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calculates the topic indicativeness scores of the hotels.')
+    parser.add_argument('--per-hotel', action='store_true',
+                        help='calculate the scores hotel by hotel, instead of with a single reduction over the '
+                             'reviews of all the hotels')
+    parser.add_argument('--reference-date', default=None,
+                        help='date the windowed and decayed sentiment ratios are calculated at (the latest review '
+                             'date of the corpus by default)')
+    parser.add_argument('--render-only', action='store_true',
+                        help='render the plots headless, in parallel, skipping plots whose data is unchanged')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of processes rendering plots')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time the stages of each hotel, count the rows and bytes read, and save a run report')
+    parser.add_argument('--profile', action='store_true', help='instrument the run and also dump a cProfile profile')
+    args = parser.parse_args()
+    start_instrumented_run(args.instrument, args.profile)
+    if args.render_only:
+        enable_render_only()
 
-    files = [os.path.join(CLASSIFIED_DATA_FOLDER, file) for file in os.listdir(CLASSIFIED_DATA_FOLDER) if file.endswith(".csv")]
     topics = ["Room amenities", "Hotel amenities", "Staff", "Food and beverages", "Location"]
 
-    all_review_proportions = {topic: [] for topic in topics}
-    all_sentiment_ratios = {topic: [] for topic in topics}
-    overall_ratings = []
-
-    all_hotels_sentiment_ratios = dict()
-    for file_path in files:
-        df = pd.read_csv(file_path)
-        hotel_name = os.path.basename(file_path).replace("processed_reviews_", "").replace(".csv", "")
-
-        review_proportions = calculate_proportion_of_reviews(df, topics)
+    if args.per_hotel:
+        all_review_proportions = {topic: [] for topic in topics}
+        all_sentiment_ratios = {topic: [] for topic in topics}
+        overall_ratings = []
+
+        all_hotels_sentiment_ratios = dict()
+        for hotel_name, df in iter_hotel_reviews(CLASSIFIED_DATA_FOLDER):
+            with instrument_hotel(hotel_name):
+                count('rows_processed', len(df))
+                with time_stage('review_proportions'):
+                    review_proportions = calculate_proportion_of_reviews(df, topics)
+                for topic in topics:
+                    all_review_proportions[topic].extend(review_proportions[topic])
+
+                with time_stage('sentiment_ratios'):
+                    sentiment_ratios = calculate_sentiment_ratio(df, topics)
+                all_hotels_sentiment_ratios[hotel_name] = sentiment_ratios
+                for topic in topics:
+                    all_sentiment_ratios[topic].extend(sentiment_ratios[topic])
+
+                overall_rating = df['Overall Average Rating'].mean()
+                overall_ratings.append(overall_rating)
+    else:
+        corpus_df = load_reviews_corpus(CLASSIFIED_DATA_FOLDER)
+        count('rows_processed', len(corpus_df))
+        with time_stage('indicativeness_matrix'):
+            indicativeness_matrix = calculate_indicativeness_matrix(corpus_df, topics)
+        all_review_proportions = indicativeness_matrix[REVIEW_PROPORTION_MEASURE]
+        all_sentiment_ratios = all_hotels_sentiment_ratios = indicativeness_matrix[SENTIMENT_RATIO_MEASURE]
+        overall_ratings = indicativeness_matrix[OVERALL_RATING_COLUMN]
+
+    if args.render_only:
+        plot_jobs = []
         for topic in topics:
-            all_review_proportions[topic].extend(review_proportions[topic])
-
-        sentiment_ratios = calculate_sentiment_ratio(df, topics)
-        all_hotels_sentiment_ratios[hotel_name] = sentiment_ratios
-        for topic in topics:
-            all_sentiment_ratios[topic].extend(sentiment_ratios[topic])
-
-        overall_rating = df['Overall Average Rating'].mean()
-        overall_ratings.append(overall_rating)
-
-    plot_review_proportions(all_review_proportions, topics)
-    plot_sentiment_ratios(all_sentiment_ratios, topics)
-    plot_sentiment_vs_rating_with_correlation(all_sentiment_ratios, overall_ratings, topics)
-
-    save_sentiment_ratio_per_hotel(all_hotels_sentiment_ratios)
+            topic_review_proportions = {topic: list(all_review_proportions[topic])}
+            topic_sentiment_ratios = {topic: list(all_sentiment_ratios[topic])}
+            plot_jobs.extend([
+                (f'review_topic_proportions_{topic}', plot_review_proportions, (topic_review_proportions, [topic])),
+                (f'sentiment_ratios_{topic}', plot_sentiment_ratios, (topic_sentiment_ratios, [topic])),
+                (f'sentiment_vs_rating_with_correlation_{topic}', plot_sentiment_vs_rating_with_correlation,
+                 (topic_sentiment_ratios, list(overall_ratings), [topic]))
+            ])
+        with time_stage('plotting'):
+            print_render_statuses(render_plots(plot_jobs, num_workers=args.workers))
+    else:
+        with time_stage('plotting'):
+            plot_review_proportions(all_review_proportions, topics)
+            plot_sentiment_ratios(all_sentiment_ratios, topics)
+            plot_sentiment_vs_rating_with_correlation(all_sentiment_ratios, overall_ratings, topics)
+
+    topic_columns = [f"{topic} - {sentiment}" for topic in topics for sentiment in ("positive", "negative")]
+    hotels_reviews = list(iter_hotel_reviews(CLASSIFIED_DATA_FOLDER, columns=[REVIEW_DATE_COLUMN, *topic_columns]))
+    reference_date = args.reference_date or find_latest_review_date(hotels_reviews)
+    all_hotels_time_aware_sentiment_ratios = {}
+    for hotel_name, df in hotels_reviews:
+        with instrument_hotel(hotel_name), time_stage('time_aware_sentiment_ratios'):
+            all_hotels_time_aware_sentiment_ratios[hotel_name] = calculate_time_aware_sentiment_ratios(
+                df, topics, reference_date)
+
+    with time_stage('save_results'):
+        save_sentiment_ratio_per_hotel(all_hotels_sentiment_ratios, all_hotels_time_aware_sentiment_ratios)
+    finish_instrumented_run('indicativeness_results')
@@ -1,4 +1,11 @@
+import argparse
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+import json
 import os
+import sys
+from typing import Iterable
 
 import matplotlib.pyplot as plt
 from nltk.corpus import stopwords
@@ -6,8 +13,27 @@ from nltk.tokenize import word_tokenize
 import pandas as pd
 from wordcloud import WordCloud
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from corpus_store import (CORPUS_CACHE_FOLDER, hotel_name_from_file_name, iter_hotel_reviews,  # noqa: E402
+                          list_data_files)
+from plotting import enable_render_only, print_render_statuses, render_plots, show_or_close_figure  # noqa: E402
+
 DATA_FOLDER_PATH = os.path.join(os.pardir, 'data')
 PLOTS_FOLDER_PATH = os.path.join(os.pardir, 'plots', 'topic_indicativeness_scores')
+WORD_FREQUENCIES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'word_frequencies')
+SENTIMENTS = ('positive', 'negative')
+REVIEWS_COLUMNS = {'positive': 'Positive Reviews', 'negative': 'Negative Reviews'}
+REVIEWS_CHUNK_SIZE = 1000
+
+
+@lru_cache(maxsize=1)
+def get_stop_words() -> frozenset[str]:
+    """
+    Gets the English stop words (loaded once per process).
+    :return: the set of stop words.
+    """
+
+    return frozenset(stopwords.words('english'))
 
 
 def preprocess_text(review_text: str) -> str:
@@ -17,52 +43,237 @@ def preprocess_text(review_text: str) -> str:
     :return: Preprocessed review.
     """
 
-    stop_words = set(stopwords.words('english'))
+    stop_words = get_stop_words()
     words = word_tokenize(review_text.lower())
     filtered_words = [word for word in words if word.isalnum() and word not in stop_words]
     return " ".join(filtered_words)
 
 
-def generate_word_cloud(positive_text: str, negative_text: str) -> None:
+def count_words(reviews: Iterable[str]) -> Counter:
+    """
+    Counts the words of the given reviews, pre-processed as in `preprocess_text`.
+    :param reviews: positive or negative reviews.
+    :return: frequency of each word.
+    """
+
+    word_frequencies = Counter()
+    for review in reviews:
+        word_frequencies.update(preprocess_text(review).split())
+    return word_frequencies
+
+
+def count_hotel_words(
+        hotel_name: str,
+        file_path: str,
+        chunk_size: int = REVIEWS_CHUNK_SIZE
+) -> tuple[str, dict[str, Counter]]:
+    """
+    Counts the words of the positive and negative reviews of a single hotel (the unit of work sent to each process by
+    `calculate_word_frequencies`). The data file is read in chunks of reviews, only its review columns, and each chunk
+    is folded into the hotel's word frequencies, so that at most one chunk of reviews is in memory.
+    :param hotel_name: name of the hotel.
+    :param file_path: path of the hotel data file.
+    :param chunk_size: number of reviews to read at a time.
+    :return: name of the hotel, and mapping between each sentiment and its word frequencies.
+    """
+
+    hotel_word_frequencies = {sentiment: Counter() for sentiment in SENTIMENTS}
+    for reviews_chunk in pd.read_csv(file_path, usecols=list(REVIEWS_COLUMNS.values()), chunksize=chunk_size):
+        for sentiment, column in REVIEWS_COLUMNS.items():
+            hotel_word_frequencies[sentiment].update(count_words(reviews_chunk[column].dropna()))
+    return hotel_name, hotel_word_frequencies
+
+
+def get_word_frequencies_path(hotel_name: str, frequencies_folder: str) -> str:
+    """
+    Gets the path of the persisted word frequencies of a hotel.
+    :param hotel_name: name of the hotel.
+    :param frequencies_folder: path to folder of the persisted word frequencies.
+    :return: path of the JSON file of the hotel.
+    """
+
+    return os.path.join(frequencies_folder, f"{hotel_name}.json")
+
+
+def load_hotel_word_frequencies(
+        hotel_name: str,
+        source_file_stat: tuple[int, int],
+        frequencies_folder: str = WORD_FREQUENCIES_FOLDER
+) -> dict[str, Counter] | None:
+    """
+    Loads the persisted word frequencies of a hotel, if they were counted from the current version of its data file.
+    :param hotel_name: name of the hotel.
+    :param source_file_stat: (mtime in ns, size in bytes) of the hotel data file.
+    :param frequencies_folder: path to folder of the persisted word frequencies.
+    :return: mapping between each sentiment and its word frequencies; None if missing or stale.
+    """
+
+    frequencies_path = get_word_frequencies_path(hotel_name, frequencies_folder)
+    if not os.path.exists(frequencies_path):
+        return None
+    with open(frequencies_path, encoding='utf-8') as frequencies_file:
+        hotel_word_frequencies = json.load(frequencies_file)
+    if tuple(hotel_word_frequencies['source']) != tuple(source_file_stat):
+        return None
+    return {sentiment: Counter(hotel_word_frequencies[sentiment]) for sentiment in SENTIMENTS}
+
+
+def save_hotel_word_frequencies(
+        hotel_name: str,
+        source_file_stat: tuple[int, int],
+        hotel_word_frequencies: dict[str, Counter],
+        frequencies_folder: str = WORD_FREQUENCIES_FOLDER
+) -> None:
+    """
+    Persists the word frequencies of a hotel, with the version of the data file they were counted from.
+    :param hotel_name: name of the hotel.
+    :param source_file_stat: (mtime in ns, size in bytes) of the hotel data file.
+    :param hotel_word_frequencies: mapping between each sentiment and its word frequencies.
+    :param frequencies_folder: path to folder of the persisted word frequencies.
+    """
+
+    os.makedirs(frequencies_folder, exist_ok=True)
+    with open(get_word_frequencies_path(hotel_name, frequencies_folder), 'w', encoding='utf-8') as frequencies_file:
+        json.dump({'source': list(source_file_stat), **hotel_word_frequencies}, frequencies_file, ensure_ascii=False)
+
+
+def calculate_word_frequencies(
+        folder_path: str,
+        num_workers: int = 1,
+        frequencies_folder: str = WORD_FREQUENCIES_FOLDER
+) -> dict[str, Counter]:
+    """
+    Counts the words of the positive and negative reviews of all the hotels, one hotel at a time and one chunk of its
+    data file at a time, without keeping the reviews in memory: only the frequency tables are merged. The word
+    frequencies of each hotel are persisted, and reused as long as its data file is unchanged. Hotels are counted
+    across worker processes, with at most two hotels per worker in flight.
+    :param folder_path: path to folder of hotel data files.
+    :param num_workers: number of processes to count the hotels with (1 to count them in the current process).
+    :param frequencies_folder: path to folder of the persisted word frequencies.
+    :return: mapping between each sentiment and the word frequencies of all the hotels.
+    """
+
+    data_files = list_data_files(folder_path)
+    source_file_names = {hotel_name_from_file_name(file_name): file_name for file_name in data_files}
+    source_file_stats = {hotel_name: data_files[file_name] for hotel_name, file_name in source_file_names.items()}
+    word_frequencies = {sentiment: Counter() for sentiment in SENTIMENTS}
+
+    def merge(hotel_word_frequencies: dict[str, Counter]) -> None:
+        for sentiment in SENTIMENTS:
+            word_frequencies[sentiment].update(hotel_word_frequencies[sentiment])
+
+    stale_hotels = []
+    for hotel_name, file_stat in source_file_stats.items():
+        hotel_word_frequencies = load_hotel_word_frequencies(hotel_name, file_stat, frequencies_folder)
+        if hotel_word_frequencies is None:
+            stale_hotels.append(hotel_name)
+        else:
+            merge(hotel_word_frequencies)
+
+    def count_and_persist(hotel_name: str, hotel_word_frequencies: dict[str, Counter]) -> None:
+        save_hotel_word_frequencies(hotel_name, source_file_stats[hotel_name], hotel_word_frequencies,
+                                    frequencies_folder)
+        merge(hotel_word_frequencies)
+
+    hotels_files = [(hotel_name, os.path.join(folder_path, source_file_names[hotel_name]))
+                    for hotel_name in stale_hotels]
+    if num_workers == 1:
+        for hotel_file in hotels_files:
+            count_and_persist(*count_hotel_words(*hotel_file))
+        return word_frequencies
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = set()
+        for hotel_file in hotels_files:
+            if len(pending) >= 2 * num_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    count_and_persist(*future.result())
+            pending.add(executor.submit(count_hotel_words, *hotel_file))
+        for future in pending:
+            count_and_persist(*future.result())
+
+    return word_frequencies
+
+
+def join_reviews_texts(folder_path: str, cache_folder: str = CORPUS_CACHE_FOLDER) -> tuple[str, str]:
+    """
+    Joins the pre-processed positive and negative reviews of all the hotels into two strings, to plot the word clouds
+    from (the default mode; `calculate_word_frequencies` counts the words without keeping the reviews in memory).
+    :param folder_path: path to folder of hotel data files.
+    :param cache_folder: path to folder of cached corpus stores.
+    :return: the positive reviews text and the negative reviews text.
+    """
+
+    positive_reviews = []
+    negative_reviews = []
+
+    for _, hotel_reviews_df in iter_hotel_reviews(folder_path, columns=list(REVIEWS_COLUMNS.values()),
+                                                  cache_folder=cache_folder):
+        positive_reviews.extend(hotel_reviews_df[REVIEWS_COLUMNS['positive']].dropna().apply(preprocess_text))
+        negative_reviews.extend(hotel_reviews_df[REVIEWS_COLUMNS['negative']].dropna().apply(preprocess_text))
+
+    return " ".join(positive_reviews), " ".join(negative_reviews)
+
+
+def generate_word_cloud(positive_text: str | dict[str, int], negative_text: str | dict[str, int]) -> None:
     """
     Generates word clouds for the positive and negative reviews.
-    :param positive_text: one string containing all preprocessed positive reviews, without stop-words.
-    :param negative_text:  one string containing all preprocessed negative reviews, without stop-words.
+    :param positive_text: one string containing all preprocessed positive reviews, without stop-words; or the word
+     frequencies of the positive reviews.
+    :param negative_text:  one string containing all preprocessed negative reviews, without stop-words; or the word
+     frequencies of the negative reviews.
     """
 
     fig, axes = plt.subplots(1, 2, figsize=(20, 10))
 
     # Negative Reviews Word Cloud
-    wordcloud_neg = WordCloud(width=800, height=400, background_color='white').generate(negative_text)
+    wordcloud_neg = WordCloud(width=800, height=400, background_color='white')
+    if isinstance(negative_text, str):
+        wordcloud_neg.generate(negative_text)
+    else:
+        wordcloud_neg.generate_from_frequencies(negative_text)
     axes[0].imshow(wordcloud_neg, interpolation='bilinear')
     axes[0].set_title("Negative Reviews Word Cloud", fontsize=20)
     axes[0].axis('off')
 
     # Positive Reviews Word Cloud
-    wordcloud_pos = WordCloud(width=800, height=400, background_color='white').generate(positive_text)
+    wordcloud_pos = WordCloud(width=800, height=400, background_color='white')
+    if isinstance(positive_text, str):
+        wordcloud_pos.generate(positive_text)
+    else:
+        wordcloud_pos.generate_from_frequencies(positive_text)
     axes[1].imshow(wordcloud_pos, interpolation='bilinear')
     axes[1].set_title("Positive Reviews Word Cloud", fontsize=20)
     axes[1].axis('off')
     plt.tight_layout()
 
     plt.savefig(os.path.join(PLOTS_FOLDER_PATH, 'reviews_word_clouds.png'))
-    plt.show()
+    show_or_close_figure(fig)
 
 
 if __name__ == "__main__":
-    positive_reviews = []
-    negative_reviews = []
-
-    for file in os.listdir(DATA_FOLDER_PATH):
-        if file.endswith('.csv'):
-            file_path = os.path.join(DATA_FOLDER_PATH, file)
-            hotel_reviews_df = pd.read_csv(file_path)
-
-            positive_reviews.extend(hotel_reviews_df['Positive Reviews'].dropna().apply(preprocess_text))
-            negative_reviews.extend(hotel_reviews_df['Negative Reviews'].dropna().apply(preprocess_text))
+    parser = argparse.ArgumentParser(description='Plots the word clouds of the positive and negative reviews.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='count the words hotel by hotel across processes, and plot the word clouds from the '
+                             'word frequencies instead of joining all the reviews into two strings')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--render-only', action='store_true',
+                        help='render the plot headless, skipping it if its data is unchanged')
+    args = parser.parse_args()
+    if args.render_only:
+        enable_render_only()
 
-    positive_text = " ".join(positive_reviews)
-    negative_text = " ".join(negative_reviews)
+    if args.streaming:
+        word_frequencies = calculate_word_frequencies(DATA_FOLDER_PATH, num_workers=args.workers)
+        # Sorted tables, so that the input hash of the plot does not depend on the order the hotels were merged in.
+        positive_text, negative_text = (dict(sorted(word_frequencies[sentiment].items())) for sentiment in SENTIMENTS)
+    else:
+        positive_text, negative_text = join_reviews_texts(DATA_FOLDER_PATH)
 
     # Plot word clouds.
-    generate_word_cloud(positive_text, negative_text)
+    if args.render_only:
+        print_render_statuses(render_plots([('reviews_word_clouds', generate_word_cloud,
+                                             (positive_text, negative_text))]))
+    else:
+        generate_word_cloud(positive_text, negative_text)